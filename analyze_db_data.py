@@ -6,11 +6,19 @@
 """
 
 import os
-import json
 import logging
-from collections import defaultdict, Counter
+import argparse
 from pymongo import MongoClient
 
+from unifi_scraper.accumulators import (
+    FieldValuesAccumulator, TagsAccumulator, ProductLinePatternsAccumulator,
+    VersionDistributionAccumulator, ProductLineCandidatesAccumulator,
+    default_accumulators, projection_for, run_accumulators
+)
+from unifi_scraper.analytics import ReleaseAnalytics
+from unifi_scraper.bson_dump import BsonDumpDatabase
+from unifi_scraper.mongo_monitor import COMMAND_MONITOR
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -21,18 +29,43 @@ logger = logging.getLogger(__name__)
 class DataAnalyzer:
     """数据分析器"""
     
-    def __init__(self):
-        """初始化连接"""
+    def __init__(self, pushdown=True, dump_dir=None, storage=None):
+        """
+        初始化连接
+        
+        Args:
+            pushdown: 是否把计数下推到MongoDB聚合管道执行
+            dump_dir: mongodump备份目录，指定时直接流式读取备份文件而不连接MongoDB
+            storage: 存储后端（如MemoryStorage），指定时从中读取数据，由调用方负责关闭
+        """
+        self.dump_dir = dump_dir
+        self.storage = storage
         self.mongo_uri = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
         self.mongo_db = os.getenv('MONGO_DATABASE', 'unifi_releases')
         self.collection_name = 'unifi_releases'
         self.client = None
         self.db = None
+        # 离线备份和内存存储无法使用聚合管道
+        self.pushdown = pushdown and not dump_dir and (storage is None or storage.supports_aggregation)
+        # 游标每批读取的文档数
+        self.batch_size = 1000
     
     def connect_db(self):
         """连接到MongoDB"""
+        if self.storage is not None:
+            if self.storage.db is None and not self.storage.connect():
+                return False
+            self.db = self.storage.db
+            logger.info(f"使用存储后端: {type(self.storage).__name__}")
+            return True
+        
+        if self.dump_dir:
+            self.db = BsonDumpDatabase(self.dump_dir, self.mongo_db)
+            logger.info(f"使用离线备份: {self.db.dump_dir}")
+            return True
+        
         try:
-            self.client = MongoClient(self.mongo_uri)
+            self.client = MongoClient(self.mongo_uri, **COMMAND_MONITOR.client_options())
             self.db = self.client[self.mongo_db]
             logger.info(f"已连接到MongoDB: {self.mongo_uri}")
             return True
@@ -46,156 +79,69 @@ class DataAnalyzer:
             self.client.close()
             logger.info("已关闭MongoDB连接")
     
-    def get_all_releases(self):
-        """获取所有产品发布数据"""
+    def iter_releases(self, projection=None):
+        """
+        流式遍历产品发布数据，只读取投影字段
+        
+        Args:
+            projection: MongoDB投影，None表示读取全部字段
+        """
         if self.db is None:
             logger.error("未连接到数据库，无法获取数据")
-            return []
+            return iter(())
         
-        try:
-            # 获取所有数据
-            releases = list(self.db[self.collection_name].find())
-            logger.info(f"已获取 {len(releases)} 条产品发布数据")
-            return releases
-        except Exception as e:
-            logger.error(f"获取数据失败: {e}")
-            return []
+        return self.db[self.collection_name].find({}, projection, batch_size=self.batch_size)
+    
+    def _run_single(self, accumulator, releases):
+        """对给定的发布列表运行单个累加器"""
+        run_accumulators(releases, [accumulator])
+        return accumulator.result()
     
     def analyze_field_values(self, releases, field_name):
         """分析字段值的分布"""
-        value_counts = Counter()
-        
-        for release in releases:
-            value = release.get(field_name, None)
-            if value is not None:
-                value_counts[str(value)] += 1
-        
-        return value_counts
+        return self._run_single(FieldValuesAccumulator(field_name), releases)
     
     def analyze_tags(self, releases):
         """分析tags字段"""
-        all_tags = []
-        tag_counts = Counter()
-        tags_per_release = Counter()
-        
-        for release in releases:
-            tags_str = release.get('tags', '[]')
-            try:
-                tags = json.loads(tags_str)
-                if isinstance(tags, list):
-                    tags_per_release[len(tags)] += 1
-                    for tag in tags:
-                        all_tags.append(tag)
-                        tag_counts[tag] += 1
-            except json.JSONDecodeError:
-                logger.warning(f"无法解析tags: {tags_str}")
-        
-        return {
-            'unique_tags': len(tag_counts),
-            'total_tags': len(all_tags),
-            'tags_per_release': dict(tags_per_release),
-            'most_common_tags': tag_counts.most_common(50)
-        }
+        return self._run_single(TagsAccumulator(), releases)
     
     def identify_product_line_patterns(self, releases):
         """识别可能的产品线模式"""
-        # 分析tags字段中的常见前缀
-        tag_prefixes = Counter()
-        product_name_prefixes = Counter()
-        
-        for release in releases:
-            # 分析tags字段
-            tags_str = release.get('tags', '[]')
-            try:
-                tags = json.loads(tags_str)
-                if isinstance(tags, list):
-                    for tag in tags:
-                        # 获取前两个单词作为可能的前缀
-                        words = str(tag).split()
-                        if len(words) >= 2:
-                            prefix = ' '.join(words[:2])
-                            tag_prefixes[prefix] += 1
-                        elif len(words) == 1:
-                            tag_prefixes[words[0]] += 1
-            except json.JSONDecodeError:
-                pass
-            
-            # 分析product_name字段
-            product_name = release.get('product_name', '')
-            if product_name:
-                words = product_name.split()
-                if len(words) >= 2:
-                    prefix = ' '.join(words[:2])
-                    product_name_prefixes[prefix] += 1
-                elif len(words) == 1:
-                    product_name_prefixes[words[0]] += 1
-        
-        return {
-            'tag_prefixes': tag_prefixes.most_common(20),
-            'product_name_prefixes': product_name_prefixes.most_common(20)
-        }
+        return self._run_single(ProductLinePatternsAccumulator(), releases)
     
     def analyze_version_distribution(self, releases):
         """分析版本号分布"""
-        version_counts = Counter()
-        version_patterns = Counter()
-        
-        for release in releases:
-            version = release.get('version', '')
-            if version:
-                version_counts[version] += 1
-                
-                # 识别版本模式 (x.y.z, vx.y 等)
-                pattern = ''
-                for char in version:
-                    if char.isdigit():
-                        pattern += 'n'
-                    else:
-                        pattern += char
-                version_patterns[pattern] += 1
-        
-        return {
-            'unique_versions': len(version_counts),
-            'most_common_versions': version_counts.most_common(20),
-            'version_patterns': version_patterns.most_common(10)
-        }
+        return self._run_single(VersionDistributionAccumulator(), releases)
     
     def analyze_product_line_candidates(self, releases):
         """分析可能的产品线字段"""
-        product_lines = defaultdict(Counter)
+        return self._run_single(ProductLineCandidatesAccumulator(), releases)
+    
+    def collect_results(self, releases, accumulators):
+        """
+        运行全部累加器并汇总结果
         
-        # 分析常见的产品线字段
-        fields_to_check = ['product_name', 'firmware_type', 'stage']
+        Args:
+            releases: 发布文档迭代器，None表示使用聚合管道在数据库中计算
+            accumulators: 累加器列表
         
-        for release in releases:
-            for field in fields_to_check:
-                value = release.get(field, '')
-                if value:
-                    product_lines[field][value] += 1
+        Returns:
+            (分析结果字典, 遍历的文档数量)
+        """
+        if releases is None:
+            # 在MongoDB中分组计数，只传回分组结果
+            count = ReleaseAnalytics(self.db[self.collection_name]).run_accumulators(accumulators)
+        else:
+            count = run_accumulators(releases, accumulators)
         
-        # 分析tags字段中的可能产品线
-        for release in releases:
-            tags_str = release.get('tags', '[]')
-            try:
-                tags = json.loads(tags_str)
-                if isinstance(tags, list) and len(tags) > 0:
-                    # 假设第一个标签可能是产品线
-                    product_lines['first_tag'][tags[0]] += 1
-                    
-                    # 检查包含特定关键词的标签
-                    for tag in tags:
-                        if any(keyword in tag.lower() for keyword in ['unifi', 'edgemax', 'airmax', 'amplifi']):
-                            product_lines['keyword_in_tag'][tag] += 1
-            except json.JSONDecodeError:
-                pass
+        results = {'field_distributions': {}}
+        for accumulator in accumulators:
+            if isinstance(accumulator, FieldValuesAccumulator):
+                results['field_distributions'][accumulator.name] = accumulator.result()
+            else:
+                results[accumulator.name] = accumulator.result()
         
-        return {
-            field: {
-                'unique_values': len(counter),
-                'most_common': counter.most_common(20)
-            }
-            for field, counter in product_lines.items()
-        }
+        return results, count
     
     def print_analysis_results(self, results):
         """打印分析结果"""
@@ -300,32 +246,24 @@ class DataAnalyzer:
             return False
         
         try:
-            releases = self.get_all_releases()
-            if not releases:
-                logger.error("未获取到数据，无法进行分析")
-                return False
-            
-            results = {}
+            accumulators = default_accumulators()
             
-            # 分析每个字段的值分布
-            field_distributions = {}
-            common_fields = ['product_name', 'version', 'firmware_type', 'stage', 'is_beta']
-            for field in common_fields:
-                field_distributions[field] = self.analyze_field_values(releases, field)
-            
-            results['field_distributions'] = field_distributions
-            
-            # 分析tags字段
-            results['tags_analysis'] = self.analyze_tags(releases)
-            
-            # 识别产品线模式
-            results['product_line_patterns'] = self.identify_product_line_patterns(releases)
+            try:
+                if self.pushdown:
+                    releases = None
+                else:
+                    # 单次流式遍历，只读取分析需要的字段
+                    releases = self.iter_releases(projection_for(accumulators))
+                results, count = self.collect_results(releases, accumulators)
+            except Exception as e:
+                logger.error(f"获取数据失败: {e}")
+                return False
             
-            # 分析版本分布
-            results['version_distribution'] = self.analyze_version_distribution(releases)
+            if count == 0:
+                logger.error("未获取到数据，无法进行分析")
+                return False
             
-            # 分析可能的产品线字段
-            results['product_line_candidates'] = self.analyze_product_line_candidates(releases)
+            logger.info(f"已分析 {count} 条产品发布数据")
             
             # 打印分析结果
             self.print_analysis_results(results)
@@ -338,9 +276,23 @@ class DataAnalyzer:
             self.close_db()
 
 
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='分析MongoDB中的产品发布数据')
+    parser.add_argument('--no-pushdown', action='store_true', help='不使用聚合管道，在本地单次流式遍历计算')
+    parser.add_argument('--dump', type=str, default=None, help='从mongodump备份目录读取数据（支持gzip），无需运行MongoDB')
+    parser.add_argument('--mongo-monitor', action='store_true', help='记录每条MongoDB命令的耗时、返回文档数和字节数，结束时按查询形状输出汇总')
+    parser.add_argument('--slow-ms', type=float, default=float(os.getenv('MONGO_SLOW_MS', '100')), help='慢操作阈值（毫秒），超过时记录查询形状')
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    analyzer = DataAnalyzer()
+    args = parse_args()
+    if args.mongo_monitor:
+        COMMAND_MONITOR.enable(args.slow_ms)
+    analyzer = DataAnalyzer(pushdown=not args.no_pushdown, dump_dir=args.dump)
     success = analyzer.run()
+    COMMAND_MONITOR.log_summary()
     
     if not success:
         print("数据分析失败，请检查日志获取详细信息。") 
\ No newline at end of file
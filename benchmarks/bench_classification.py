@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+发布分类与入库准备微基准测试
+用合成发布测量determine_product_line、determine_version_type、classify_release的速度，
+以及MemoryStorage.save_release（与MongoStorage相同的to_dict和时间轴分类，不访问数据库）的速度
+"""
+
+import os
+import sys
+import logging
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_models import timed
+from benchmarks.synthetic_corpus import make_documents
+from unifi_scraper import classification
+from unifi_scraper.memory_storage import MemoryStorage
+from unifi_scraper.models import UnifiRelease
+
+
+def run(count=20000, seed=0):
+    """
+    运行基准测试
+
+    Args:
+        count: 发布数量
+        seed: 合成数据的随机数种子
+
+    Returns:
+        指标字典
+    """
+    documents = make_documents(count, seed)
+    releases = [UnifiRelease.from_dict(document) for document in documents]
+
+    _, product_line_time = timed(lambda: [classification.determine_product_line(doc) for doc in documents])
+    _, version_type_time = timed(lambda: [classification.determine_version_type(doc) for doc in documents])
+    _, classify_time = timed(lambda: [classification.classify_release(doc) for doc in documents])
+    storage = MemoryStorage()
+    _, save_time = timed(lambda: [storage.save_release(release) for release in releases])
+
+    return {
+        'count': count,
+        'determine_product_line_per_sec': count / product_line_time,
+        'determine_version_type_per_sec': count / version_type_time,
+        'classify_release_per_sec': count / classify_time,
+        'save_release_memory_per_sec': count / save_time,
+    }
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='发布分类与入库准备微基准测试')
+    parser.add_argument('--count', type=int, default=20000, help='发布数量')
+    parser.add_argument('--seed', type=int, default=0, help='合成数据的随机数种子')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    results = run(args.count, args.seed)
+
+    print(f"发布数量: {results['count']}")
+    print(f"determine_product_line: {results['determine_product_line_per_sec']:>12,.0f} 次/秒")
+    print(f"determine_version_type: {results['determine_version_type_per_sec']:>12,.0f} 次/秒")
+    print(f"classify_release:       {results['classify_release_per_sec']:>12,.0f} 次/秒")
+    print(f"save_release（内存）:   {results['save_release_memory_per_sec']:>12,.0f} 次/秒")
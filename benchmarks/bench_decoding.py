@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+GraphQL响应解码基准测试
+对比原有路径（json.loads解码完整响应后逐层get）与各解码后端的单次解码耗时和内存分配
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from unifi_scraper.decoding import ResponseDecoder, BACKENDS
+
+
+def _user(index):
+    """生成GraphQL User片段"""
+    return {
+        'id': f"user-{index}", 'username': f"ui-user-{index}", 'title': 'Ubiquiti', 'slug': f"ui-user-{index}",
+        'avatar': {'color': '#0559C9', 'content': 'UI', 'image': None, '__typename': 'Avatar'},
+        'isEmployee': True, 'registeredAt': '2019-01-01T00:00:00.000Z', 'lastOnlineAt': '2024-05-01T00:00:00.000Z',
+        'groups': ['EMPLOYEE'], 'showOfficialBadge': True, 'canBeMentioned': True, 'canViewProfile': True,
+        'canStartConversationWith': False, '__typename': 'User'
+    }
+
+
+def make_list_response(count=50):
+    """生成releases列表查询的响应字节"""
+    items = [
+        {
+            'id': f"release-{i}", 'slug': f"unifi-switch-7-{i}", 'title': f"UniFi Switch {i}",
+            'version': f"7.0.{i}", 'stage': 'GA', 'createdAt': '2024-05-01T00:00:00.000Z',
+            'lastActivityAt': '2024-05-02T00:00:00.000Z', 'updatedAt': '2024-05-02T00:00:00.000Z',
+            'tags': ['unifi-switch', 'firmware'], 'type': 'FIRMWARE',
+            'stats': {'comments': i, 'views': i * 100, '__typename': 'ReleaseStats'},
+            'publishedAs': {'id': 'user-1', 'username': 'UI-Glenn', 'title': 'Ubiquiti', 'slug': 'ui-glenn', '__typename': 'User'},
+            '__typename': 'Release'
+        }
+        for i in range(count)
+    ]
+    return json.dumps({'data': {'releases': {'items': items, '__typename': 'Releases'}}}).encode()
+
+
+def make_detail_response():
+    """生成GetRelease详情查询的响应字节"""
+    text = lambda body: {'type': 'TEXT', 'content': body, '__typename': 'TextContent'}
+    images = {'type': 'IMAGES', 'grid': {'images': [{'src': 'https://img/1.png', 'caption': '', '__typename': 'Image'}] * 4, '__typename': 'Grid'}, '__typename': 'ImagesContent'}
+    notes = '<ul>' + ''.join(f"<li>Improved stability of feature {i}.</li>" for i in range(80)) + '</ul>'
+    release = {
+        'id': 'release-1', 'slug': 'unifi-switch-7-0-1', 'type': 'FIRMWARE', 'title': 'UniFi Switch',
+        'version': '7.0.1', 'stage': 'GA', 'tags': ['unifi-switch'], 'betas': [], 'alphas': [],
+        'isFeatured': False, 'isLocked': False, 'hasUiEngagement': True,
+        'stats': {'comments': 12, 'views': 3400, '__typename': 'ReleaseStats'},
+        'createdAt': '2024-05-01T00:00:00.000Z', 'lastActivityAt': '2024-05-02T00:00:00.000Z', 'updatedAt': '2024-05-02T00:00:00.000Z',
+        'userStatus': {'isFollowing': False, 'lastViewedAt': None, 'reported': False, 'vote': None, 'lastViewedId': None, '__typename': 'UserStatus'},
+        'author': dict(_user(1), stats={'questions': 1, 'answers': 2, 'solutions': 3, 'comments': 4, 'stories': 5, 'score': 6, '__typename': 'UserStats'}),
+        'publishedAs': _user(2),
+        'groupId': 'group-1',
+        'content': [text(notes), images],
+        'newFeatures': [text(notes)], 'improvements': [text(notes)], 'bugfixes': [text(notes)],
+        'knownIssues': [text(notes)], 'importantNotes': [text(notes)], 'instructions': [text(notes)],
+        'links': [{'url': f"https://dl.ui.com/firmware/{i}.bin", 'title': f"USW model {i}", 'checksums': {'md5': 'a' * 32, 'sha256': 'b' * 64, '__typename': 'Checksums'}, '__typename': 'Link'} for i in range(20)],
+        'editor': _user(3), 'status': 'PUBLISHED', '__typename': 'Release'
+    }
+    return json.dumps({'data': {'release': release}}).encode()
+
+
+def legacy_decode_releases(content):
+    """原有路径：完整解码后逐层get"""
+    data = json.loads(content)
+    if "errors" in data:
+        return [], data["errors"]
+    return data.get("data", {}).get("releases", {}).get("items", []), None
+
+
+def legacy_decode_release_detail(content):
+    """原有路径：完整解码后逐层get"""
+    data = json.loads(content)
+    if "errors" in data:
+        return None, data["errors"]
+    return data.get("data", {}).get("release"), None
+
+
+def measure(func, content, repeat):
+    """返回(单次耗时微秒, 单次内存分配字节, 分配次数)"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func(content)
+    elapsed = (time.perf_counter() - start) / repeat * 1e6
+    del result
+
+    # 测量单次解码结果所持有的内存
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    snapshot_before = tracemalloc.take_snapshot()
+    result = func(content)
+    after, _ = tracemalloc.get_traced_memory()
+    snapshot_after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in snapshot_after.compare_to(snapshot_before, 'filename') if stat.count_diff > 0)
+    del result
+    return elapsed, after - before, blocks
+
+
+def run(repeat=2000):
+    """
+    运行基准测试
+
+    Args:
+        repeat: 每种解码方式重复的次数
+
+    Returns:
+        {解码方式: {响应类型: 指标}}
+    """
+    responses = {'list': make_list_response(), 'detail': make_detail_response()}
+    paths = {'legacy': (legacy_decode_releases, legacy_decode_release_detail)}
+    for backend in BACKENDS:
+        decoder = ResponseDecoder(backend)
+        paths[backend] = (decoder.decode_releases, decoder.decode_release_detail)
+
+    results = {}
+    for name, (decode_list, decode_detail) in paths.items():
+        results[name] = {}
+        for kind, func in (('list', decode_list), ('detail', decode_detail)):
+            elapsed, allocated, blocks = measure(func, responses[kind], repeat)
+            results[name][kind] = {'us_per_response': elapsed, 'bytes_retained': allocated, 'blocks': blocks}
+    results['response_bytes'] = {kind: len(content) for kind, content in responses.items()}
+    return results
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='GraphQL响应解码基准测试')
+    parser.add_argument('--repeat', type=int, default=2000, help='每种解码方式重复的次数')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = run(args.repeat)
+    sizes = results.pop('response_bytes')
+
+    print(f"响应大小: 列表 {sizes['list']} 字节，详情 {sizes['detail']} 字节\n")
+    print(f"{'解码方式':<10}{'响应':<8}{'耗时(μs)':>12}{'保留内存(B)':>14}{'分配块数':>10}")
+    for name, kinds in results.items():
+        for kind, metrics in kinds.items():
+            print(f"{name:<12}{kind:<8}{metrics['us_per_response']:>12.1f}{metrics['bytes_retained']:>14,}{metrics['blocks']:>10,}")
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+UnifiRelease模型微基准测试
+测量构造、to_dict、from_dict的耗时，以及一批from_dict结果（相当于MongoStorage.get_all_releases返回值）的内存占用
+"""
+
+import gc
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from unifi_scraper.models import UnifiRelease
+
+
+def make_documents(count):
+    """生成与数据库中结构一致的发布文档"""
+    now = datetime.now()
+    return [
+        {
+            'product_name': f"UniFi Switch {i % 50}",
+            'version': f"7.{i % 10}.{i % 100}",
+            'release_date': '2024-05-01T12:00:00.000Z',
+            'release_id': f"release-{i}",
+            'download_url': f"https://community.ui.com/releases/r-{i}",
+            'release_notes': '== 改进内容 ==\n\nImproved stability.',
+            'firmware_type': 'FIRMWARE',
+            'is_beta': i % 7 == 0,
+            'created_at': now,
+            'stage': 'GA',
+            'slug': f"r-{i}",
+            'tags': json.dumps(['unifi-switch', 'firmware']),
+            'download_links': json.dumps([f"USW: https://dl.ui.com/{i}.bin"]),
+            'group_id': f"group-{i // 5}",
+            'last_updated': now
+        }
+        for i in range(count)
+    ]
+
+
+def timed(func):
+    """执行函数并返回(结果, 耗时秒数)，计时期间关闭GC以减少抖动（与timeit一致）"""
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        result = func()
+        return result, time.perf_counter() - start
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def run(count=100000):
+    """
+    运行基准测试
+
+    Args:
+        count: 发布数量
+
+    Returns:
+        指标字典
+    """
+    documents = make_documents(count)
+
+    _, construct_time = timed(lambda: [UnifiRelease() for _ in range(count)])
+    releases, from_dict_time = timed(lambda: [UnifiRelease.from_dict(doc) for doc in documents])
+    _, to_dict_time = timed(lambda: [release.to_dict() for release in releases])
+    del releases
+
+    # 测量from_dict结果列表的内存占用
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    releases = [UnifiRelease.from_dict(doc) for doc in documents]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del releases
+
+    return {
+        'count': count,
+        'construct_per_sec': count / construct_time,
+        'from_dict_per_sec': count / from_dict_time,
+        'to_dict_per_sec': count / to_dict_time,
+        'bytes_per_release': (current - baseline) / count,
+    }
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='UnifiRelease模型微基准测试')
+    parser.add_argument('--count', type=int, default=100000, help='发布数量')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = run(args.count)
+
+    print(f"发布数量: {results['count']}")
+    print(f"构造:      {results['construct_per_sec']:>12,.0f} 次/秒")
+    print(f"from_dict: {results['from_dict_per_sec']:>12,.0f} 次/秒")
+    print(f"to_dict:   {results['to_dict_per_sec']:>12,.0f} 次/秒")
+    print(f"内存占用:  {results['bytes_per_release']:>12,.0f} 字节/条（from_dict结果，不含共享字符串）")
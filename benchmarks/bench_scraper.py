@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+爬虫吞吐量基准测试
+在子进程中启动本地GraphQL模拟服务，测量GraphQLScraper在不同分页大小下的列表获取速度，
+以及不同并发数下的详情获取速度、请求延迟分位数和内存占用；完整爬取流程写入内存存储，不需要数据库
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+import threading
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.mock_graphql_server import serve_in_process
+from unifi_scraper.graphql_scraper import GraphQLScraper
+from unifi_scraper.memory_storage import MemoryStorage
+from unifi_scraper.memprofile import peak_rss_mb
+
+
+def percentile(values, q):
+    """分位数（毫秒列表）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def make_scraper(url, checkpoint_dir, retry_backoff):
+    """创建指向模拟服务、写入内存存储的爬虫，记录每个请求的客户端延迟"""
+    scraper = GraphQLScraper(checkpoint_file=os.path.join(checkpoint_dir, 'checkpoint.pkl'), storage=MemoryStorage())
+    scraper.api_url = url
+    scraper.retry_backoff = retry_backoff
+    latencies = {'list': [], 'detail': []}
+    lock = threading.Lock()
+    post = scraper._post
+
+    def timed_post(payload, endpoint):
+        start = time.perf_counter()
+        try:
+            return post(payload, endpoint)
+        finally:
+            with lock:
+                latencies[endpoint].append((time.perf_counter() - start) * 1000)
+
+    scraper._post = timed_post
+    return scraper, latencies
+
+
+def measure(func, trace_memory):
+    """执行函数，返回(结果, 耗时秒数, tracemalloc峰值MB或None)"""
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = func()
+    finally:
+        elapsed = time.perf_counter() - start
+        peak = None
+        if trace_memory:
+            peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+            tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def run(count=2000, detail_count=500, batch_sizes=(20, 50, 100), workers=(1, 4, 8, 16),
+        latency='lognormal:20:0.5', error_rate=0.0, throttle_every=0, throttle_length=0,
+        seed_file=None, trace_memory=False, pipeline_count=200):
+    """
+    运行基准测试
+
+    Args:
+        count: 模拟服务中的发布数量
+        detail_count: 每种并发设置获取详情的发布数量
+        batch_sizes: 列表分页大小
+        workers: 详情获取并发数
+        latency: 模拟服务的延迟分布
+        error_rate: 模拟服务返回500的比例
+        throttle_every: 每隔多少个请求出现一次429突发
+        throttle_length: 每次突发的429请求数
+        seed_file: 模拟服务的缓存响应模板
+        trace_memory: 是否用tracemalloc测量内存峰值（明显变慢）
+        pipeline_count: 完整爬取流程（列表、逐个获取详情、写入内存存储、检查点）处理的发布数量，0表示不测量
+
+    Returns:
+        {'list': {分页大小: 指标}, 'detail': {并发数: 指标}, 'pipeline': 指标}
+    """
+    url, server = serve_in_process(
+        count=count, seed_file=seed_file, latency=latency, error_rate=error_rate,
+        throttle_every=throttle_every, throttle_length=throttle_length
+    )
+    results = {'list': {}, 'detail': {}}
+    items = []
+    try:
+        for batch_size in batch_sizes:
+            with tempfile.TemporaryDirectory() as checkpoint_dir:
+                scraper, latencies = make_scraper(url, checkpoint_dir, retry_backoff=0.05)
+                items, elapsed, peak = measure(
+                    lambda: scraper.fetch_all_releases(batch_size=batch_size), trace_memory
+                )
+                scraper.close()
+            results['list'][batch_size] = {
+                'releases': len(items),
+                'releases_per_sec': len(items) / elapsed if elapsed else 0.0,
+                'requests': len(latencies['list']),
+                'p50_ms': percentile(latencies['list'], 0.5),
+                'p99_ms': percentile(latencies['list'], 0.99),
+                'traced_peak_mb': peak,
+            }
+
+        sample = items[:detail_count]
+        for worker_count in workers:
+            with tempfile.TemporaryDirectory() as checkpoint_dir:
+                scraper, latencies = make_scraper(url, checkpoint_dir, retry_backoff=0.05)
+                outcomes, elapsed, peak = measure(
+                    lambda: list(scraper.build_releases_concurrently(sample, worker_count)), trace_memory
+                )
+                scraper.close()
+            built = sum(1 for _, release, _ in outcomes if release is not None)
+            results['detail'][worker_count] = {
+                'releases': built,
+                'failed': len(outcomes) - built,
+                'releases_per_sec': built / elapsed if elapsed else 0.0,
+                'p50_ms': percentile(latencies['detail'], 0.5),
+                'p99_ms': percentile(latencies['detail'], 0.99),
+                'traced_peak_mb': peak,
+            }
+
+        if pipeline_count:
+            with tempfile.TemporaryDirectory() as checkpoint_dir:
+                scraper, _ = make_scraper(url, checkpoint_dir, retry_backoff=0.05)
+                processed, elapsed, peak = measure(
+                    lambda: scraper.process_releases(limit=pipeline_count, reverify_limit=0), trace_memory
+                )
+                stored = len(scraper.storage.releases)
+                scraper.close()
+            results['pipeline'] = {
+                'releases': processed,
+                'stored': stored,
+                'releases_per_sec': processed / elapsed if elapsed else 0.0,
+                'traced_peak_mb': peak,
+            }
+    finally:
+        server.terminate()
+        server.join()
+
+    results['peak_rss_mb'] = peak_rss_mb()
+    return results
+
+
+def _int_list(value):
+    return tuple(int(part) for part in value.split(',') if part)
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='爬虫吞吐量基准测试（本地模拟GraphQL服务）')
+    parser.add_argument('--count', type=int, default=2000, help='模拟服务中的发布数量')
+    parser.add_argument('--detail-count', type=int, default=500, help='每种并发设置获取详情的发布数量')
+    parser.add_argument('--batch-sizes', type=_int_list, default=(20, 50, 100), help='列表分页大小，逗号分隔')
+    parser.add_argument('--workers', type=_int_list, default=(1, 4, 8, 16), help='详情获取并发数，逗号分隔')
+    parser.add_argument('--latency', default='lognormal:20:0.5', help='模拟服务延迟分布（见mock_graphql_server.py）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='模拟服务返回500的比例')
+    parser.add_argument('--throttle-every', type=int, default=0, help='每隔多少个请求出现一次429突发')
+    parser.add_argument('--throttle-length', type=int, default=0, help='每次突发的429请求数')
+    parser.add_argument('--seed-file', default=None, help='缓存的真实响应，作为合成发布的模板')
+    parser.add_argument('--pipeline-count', type=int, default=200, help='完整爬取流程（写入内存存储）处理的发布数量，0表示不测量')
+    parser.add_argument('--memory', action='store_true', help='用tracemalloc测量每项的内存峰值')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    results = run(
+        count=args.count, detail_count=args.detail_count, batch_sizes=args.batch_sizes, workers=args.workers,
+        latency=args.latency, error_rate=args.error_rate, throttle_every=args.throttle_every,
+        throttle_length=args.throttle_length, seed_file=args.seed_file, trace_memory=args.memory,
+        pipeline_count=args.pipeline_count
+    )
+
+    def memory(value):
+        return f"{value:>9.1f}" if value is not None else f"{'-':>9}"
+
+    print(f"延迟分布: {args.latency}，错误率: {args.error_rate}，429突发: 每{args.throttle_every}个请求{args.throttle_length}个")
+    print(f"\n{'分页大小':<8}{'发布数':>8}{'发布/秒':>10}{'请求数':>8}{'p50(ms)':>9}{'p99(ms)':>9}{'峰值(MB)':>10}")
+    for batch_size, row in results['list'].items():
+        print(f"{batch_size:<12}{row['releases']:>8}{row['releases_per_sec']:>11.1f}{row['requests']:>9}"
+              f"{row['p50_ms']:>9.1f}{row['p99_ms']:>9.1f}{memory(row['traced_peak_mb'])}")
+    print(f"\n{'并发数':<8}{'成功':>8}{'失败':>6}{'发布/秒':>10}{'p50(ms)':>9}{'p99(ms)':>9}{'峰值(MB)':>10}")
+    for worker_count, row in results['detail'].items():
+        print(f"{worker_count:<11}{row['releases']:>8}{row['failed']:>8}{row['releases_per_sec']:>11.1f}"
+              f"{row['p50_ms']:>9.1f}{row['p99_ms']:>9.1f}{memory(row['traced_peak_mb'])}")
+    if 'pipeline' in results:
+        row = results['pipeline']
+        print(f"\n完整流程（写入内存存储）: 处理 {row['releases']} 个，入库 {row['stored']} 个，"
+              f"{row['releases_per_sec']:.1f} 发布/秒，峰值(MB): {memory(row['traced_peak_mb']).strip()}")
+    print(f"\n进程峰值RSS: {results['peak_rss_mb']:.1f} MB" if results['peak_rss_mb'] is not None else '')
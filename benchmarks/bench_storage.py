@@ -0,0 +1,371 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+存储基准测试
+在临时目录中启动一个一次性的本地mongod（或使用--mongo-uri指定的服务中的临时数据库），用合成发布测量：
+- 写入：当前的save_release逐条路径、单条upsert、批量upsert（bulk_write）和insert_many，分别测量插入和更新
+- 查询：按发布ID、分组ID查询和按日期取最新发布，在有索引和删除索引后各测一次
+- 时间轴读取：读取全部字段与只读取时间轴/统计所需字段的投影读取
+结果包括每秒操作数和p50/p99延迟
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import logging
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pymongo
+from pymongo import UpdateOne
+
+from benchmarks.bench_scraper import percentile
+from benchmarks.mock_graphql_server import free_port
+from benchmarks.synthetic_corpus import make_documents
+from unifi_scraper.analytics import TIMELINE_FIELDS
+from unifi_scraper.models import UnifiRelease
+from unifi_scraper.storage import MongoStorage, classify_document
+
+
+# 时间轴生成实际用到的字段（不含浏览量、时间戳等）
+TIMELINE_READ_FIELDS = TIMELINE_FIELDS + ('release_id', 'release_date', 'release_notes', 'download_links')
+
+# 时间轴读取的投影方式
+PROJECTIONS = {
+    'full': None,
+    'timeline': {field: 1 for field in TIMELINE_READ_FIELDS},
+    'stats': {field: 1 for field in TIMELINE_FIELDS + ('release_date',)},
+}
+
+
+class LocalMongod:
+    """在临时目录中运行一次性mongod，退出时停止进程并删除数据目录"""
+
+    def __init__(self, binary='mongod', startup_timeout=30):
+        """
+        Args:
+            binary: mongod可执行文件名或路径
+            startup_timeout: 等待mongod可连接的秒数
+        """
+        self.binary = binary
+        self.startup_timeout = startup_timeout
+        self.process = None
+        self.dbpath = None
+        self.uri = None
+
+    def __enter__(self):
+        binary = shutil.which(self.binary)
+        if binary is None:
+            raise RuntimeError(f"未找到mongod（{self.binary}），请安装MongoDB、用--mongod指定路径，或用--mongo-uri使用已有的服务")
+
+        self.dbpath = tempfile.mkdtemp(prefix='bench-mongod-')
+        port = free_port()
+        self.process = subprocess.Popen(
+            [binary, '--dbpath', self.dbpath, '--port', str(port), '--bind_ip', '127.0.0.1',
+             '--nounixsocket', '--quiet', '--wiredTigerCacheSizeGB', '0.5'],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        self.uri = f"mongodb://127.0.0.1:{port}/"
+
+        deadline = time.time() + self.startup_timeout
+        while True:
+            if self.process.poll() is not None:
+                self._cleanup()
+                raise RuntimeError(f"mongod启动失败，退出码: {self.process.returncode}")
+            try:
+                client = pymongo.MongoClient(self.uri, serverSelectionTimeoutMS=500)
+                client.admin.command('ping')
+                client.close()
+                return self
+            except pymongo.errors.PyMongoError:
+                if time.time() > deadline:
+                    self.__exit__(None, None, None)
+                    raise RuntimeError(f"mongod在 {self.startup_timeout} 秒内未就绪")
+                time.sleep(0.2)
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self._cleanup()
+
+    def _cleanup(self):
+        if self.dbpath:
+            shutil.rmtree(self.dbpath, ignore_errors=True)
+            self.dbpath = None
+
+
+def summarize(latencies, operations, elapsed):
+    """
+    汇总一项测量
+
+    Args:
+        latencies: 每次调用的延迟（毫秒）
+        operations: 处理的文档或查询数量
+        elapsed: 总耗时（秒）
+    """
+    return {
+        'operations': operations,
+        'ops_per_sec': operations / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 0.5),
+        'p99_ms': percentile(latencies, 0.99),
+    }
+
+
+def timed_calls(calls):
+    """依次执行调用，返回(每次调用的延迟毫秒列表, 总耗时秒数)"""
+    latencies = []
+    start = time.perf_counter()
+    for call in calls:
+        call_start = time.perf_counter()
+        call()
+        latencies.append((time.perf_counter() - call_start) * 1000)
+    return latencies, time.perf_counter() - start
+
+
+def _document(release):
+    """与save_release相同的待写入文档（包含时间轴分类）"""
+    document = release.to_dict()
+    document['timeline'] = classify_document(document)
+    return document
+
+
+def _upsert(document):
+    """与save_release相同的upsert更新：创建时间只在首次插入时写入"""
+    document = dict(document)
+    created_at = document.pop('created_at', None)
+    return {'$set': document, '$setOnInsert': {'created_at': created_at}}
+
+
+def _batches(items, size):
+    return [items[index:index + size] for index in range(0, len(items), size)]
+
+
+def write_save_release(storage, releases, batch_size):
+    """当前路径：逐条save_release（单条upsert，包含日志和错误处理）"""
+    return [lambda release=release: storage.save_release(release) for release in releases], len(releases)
+
+
+def write_upsert(storage, releases, batch_size):
+    """逐条upsert：一次往返完成插入或更新，不经过save_release"""
+    collection = storage.db[storage.collection_name]
+
+    def upsert(release):
+        document = _document(release)
+        collection.update_one({'release_id': document['release_id']}, _upsert(document), upsert=True)
+
+    return [lambda release=release: upsert(release) for release in releases], len(releases)
+
+
+def write_bulk_upsert(storage, releases, batch_size):
+    """批量upsert：每批一次bulk_write"""
+    collection = storage.db[storage.collection_name]
+
+    def bulk(batch):
+        collection.bulk_write([
+            UpdateOne({'release_id': document['release_id']}, _upsert(document), upsert=True)
+            for document in map(_document, batch)
+        ], ordered=False)
+
+    return [lambda batch=batch: bulk(batch) for batch in _batches(releases, batch_size)], len(releases)
+
+
+def write_insert_many(storage, releases, batch_size):
+    """批量插入：每批一次insert_many，只适用于全新数据"""
+    collection = storage.db[storage.collection_name]
+
+    def insert(batch):
+        collection.insert_many([_document(release) for release in batch], ordered=False)
+
+    return [lambda batch=batch: insert(batch) for batch in _batches(releases, batch_size)], len(releases)
+
+
+# 写入策略：(函数, 是否可用于更新已存在的文档)
+WRITE_STRATEGIES = {
+    'save_release': (write_save_release, True),
+    'upsert': (write_upsert, True),
+    'bulk_upsert': (write_bulk_upsert, True),
+    'insert_many': (write_insert_many, False),
+}
+
+
+def open_storage(uri, database):
+    """连接到基准测试使用的空数据库（建立索引和统计文档）"""
+    client = pymongo.MongoClient(uri)
+    client.drop_database(database)
+    client.close()
+
+    storage = MongoStorage()
+    storage.mongo_uri = uri
+    storage.mongo_db = database
+    if not storage.connect():
+        raise RuntimeError(f"无法连接到MongoDB: {uri}")
+    return storage
+
+
+def bench_writes(uri, database, releases, batch_size, strategies):
+    """每种写入策略在空数据库中先插入全部发布，再用同一策略更新一遍"""
+    results = {}
+    for name in strategies:
+        build, supports_update = WRITE_STRATEGIES[name]
+        storage = open_storage(uri, database)
+        try:
+            results[name] = {}
+            phases = ('insert', 'update') if supports_update else ('insert',)
+            for phase in phases:
+                calls, operations = build(storage, releases, batch_size)
+                latencies, elapsed = timed_calls(calls)
+                results[name][phase] = summarize(latencies, operations, elapsed)
+        finally:
+            storage.close()
+    return results
+
+
+def bench_lookups(storage, releases, lookups, seed):
+    """按发布ID、分组ID查询和按日期取最新发布"""
+    rng = random.Random(seed)
+    collection = storage.db[storage.collection_name]
+    release_ids = [rng.choice(releases).release_id for _ in range(lookups)]
+    group_ids = [rng.choice(releases).group_id or '' for _ in range(lookups)]
+    latest_queries = max(1, lookups // 20)
+
+    queries = {
+        'release_id': [lambda release_id=release_id: storage.get_release(release_id) for release_id in release_ids],
+        'group_id': [lambda group_id=group_id: list(collection.find({'group_id': group_id}, {'_id': 1}))
+                     for group_id in group_ids],
+        'latest': [lambda: list(collection.find({}, {'release_notes': 0}).sort('release_date', pymongo.DESCENDING).limit(100))
+                   for _ in range(latest_queries)],
+    }
+    results = {}
+    for name, calls in queries.items():
+        latencies, elapsed = timed_calls(calls)
+        results[name] = summarize(latencies, len(calls), elapsed)
+    return results
+
+
+def bench_timeline_reads(storage, repeats):
+    """按时间轴的方式读取全部发布（按日期倒序），比较不同投影"""
+    collection = storage.db[storage.collection_name]
+    results = {}
+    for name, projection in PROJECTIONS.items():
+        documents = 0
+
+        def read(projection=projection):
+            nonlocal documents
+            documents += len(list(collection.find({}, projection).sort('release_date', pymongo.DESCENDING)))
+
+        latencies, elapsed = timed_calls([read] * repeats)
+        results[name] = summarize(latencies, documents, elapsed)
+    return results
+
+
+def run(count=5000, lookups=2000, batch_size=500, timeline_repeats=3, seed=0,
+        strategies=tuple(WRITE_STRATEGIES), mongod='mongod', mongo_uri=None, database='unifi_bench'):
+    """
+    运行基准测试
+
+    Args:
+        count: 合成发布数量
+        lookups: 每种查询的次数
+        batch_size: 批量写入的每批文档数
+        timeline_repeats: 每种投影读取全部发布的次数
+        seed: 合成数据和查询抽样的随机数种子
+        strategies: 要测量的写入策略
+        mongod: mongod可执行文件名或路径（未指定mongo_uri时启动）
+        mongo_uri: 使用已有的MongoDB服务，测试结束后删除database
+        database: 使用的临时数据库名
+
+    Returns:
+        {'write': {策略: {'insert'/'update': 指标}}, 'lookup': {'indexed'/'unindexed': {查询: 指标}},
+         'timeline': {投影: 指标}}，每秒操作数按文档或查询计算
+    """
+    releases = [UnifiRelease.from_dict(document) for document in make_documents(count, seed)]
+
+    server = None
+    if mongo_uri is None:
+        server = LocalMongod(mongod).__enter__()
+        mongo_uri = server.uri
+    try:
+        results = {'write': bench_writes(mongo_uri, database, releases, batch_size, strategies)}
+
+        storage = open_storage(mongo_uri, database)
+        try:
+            calls, _ = write_bulk_upsert(storage, releases, batch_size)
+            timed_calls(calls)
+            collection = storage.db[storage.collection_name]
+            results['lookup'] = {'indexed': bench_lookups(storage, releases, lookups, seed)}
+            collection.drop_indexes()
+            results['lookup']['unindexed'] = bench_lookups(storage, releases, lookups, seed)
+            storage.ensure_indexes()
+            results['timeline'] = bench_timeline_reads(storage, timeline_repeats)
+            storage.client.drop_database(database)
+        finally:
+            storage.close()
+    finally:
+        if server is not None:
+            server.__exit__(None, None, None)
+    return results
+
+
+def _str_list(value):
+    return tuple(part for part in value.split(',') if part)
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='存储基准测试（一次性本地mongod）')
+    parser.add_argument('--count', type=int, default=5000, help='合成发布数量')
+    parser.add_argument('--lookups', type=int, default=2000, help='每种查询的次数')
+    parser.add_argument('--batch-size', type=int, default=500, help='批量写入的每批文档数')
+    parser.add_argument('--timeline-repeats', type=int, default=3, help='每种投影读取全部发布的次数')
+    parser.add_argument('--seed', type=int, default=0, help='随机数种子')
+    parser.add_argument('--strategies', type=_str_list, default=tuple(WRITE_STRATEGIES),
+                        help=f"写入策略，逗号分隔（{','.join(WRITE_STRATEGIES)}）")
+    parser.add_argument('--mongod', default='mongod', help='mongod可执行文件名或路径')
+    parser.add_argument('--mongo-uri', default=None, help='使用已有的MongoDB服务（不启动mongod），测试后删除临时数据库')
+    parser.add_argument('--database', default='unifi_bench', help='临时数据库名')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    unknown = set(args.strategies) - set(WRITE_STRATEGIES)
+    if unknown:
+        sys.exit(f"未知的写入策略: {', '.join(sorted(unknown))}")
+    try:
+        results = run(
+            count=args.count, lookups=args.lookups, batch_size=args.batch_size,
+            timeline_repeats=args.timeline_repeats, seed=args.seed, strategies=args.strategies,
+            mongod=args.mongod, mongo_uri=args.mongo_uri, database=args.database
+        )
+    except RuntimeError as e:
+        sys.exit(str(e))
+
+    def row(label, metrics):
+        print(f"{label:<28}{metrics['operations']:>10}{metrics['ops_per_sec']:>12,.0f}"
+              f"{metrics['p50_ms']:>10.2f}{metrics['p99_ms']:>10.2f}")
+
+    header = f"{'操作数':>8}{'每秒操作':>9}{'p50(ms)':>10}{'p99(ms)':>10}"
+    print(f"写入（{args.count} 个发布，批量 {args.batch_size}；批量策略的延迟为每批）")
+    print(f"{'策略':<26}{header}")
+    for name, phases in results['write'].items():
+        for phase, metrics in phases.items():
+            row(f"{name} {phase}", metrics)
+    print(f"\n{'查询':<26}{header}")
+    for indexed, queries in results['lookup'].items():
+        for name, metrics in queries.items():
+            row(f"{name} ({indexed})", metrics)
+    print(f"\n{'时间轴读取（每秒文档）':<21}{header}")
+    for name, metrics in results['timeline'].items():
+        row(name, metrics)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+时间轴生成基准测试
+用合成发布数据在不同规模下分别测量ImprovedTimelineGenerator从内存存储读取、分类、处理（整理、合并、
+组织排序三个阶段）、打乱后重新排序、渲染耗时以及生成的HTML大小
+"""
+
+import gc
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic_corpus import make_documents
+from generate_timeline import ImprovedTimelineGenerator
+from unifi_scraper import classification
+from unifi_scraper.memory_storage import MemoryStorage
+
+
+def timed(func):
+    """执行函数并返回(结果, 耗时秒数)，计时期间关闭GC以减少抖动"""
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        result = func()
+        return result, time.perf_counter() - start
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def shuffled_copy(organized_data, seed=0):
+    """复制组织好的时间轴数据并打乱每个年份下的发布顺序，避免对已排好序的列表计时"""
+    rng = random.Random(seed)
+    return {
+        product_line: {
+            version_type: {year: rng.sample(releases, len(releases)) for year, releases in years.items()}
+            for version_type, years in version_types.items()
+        }
+        for product_line, version_types in organized_data.items()
+    }
+
+
+def sort_organized(generator, organized_data):
+    """按时间轴的排序规则排序每个年份下的发布（与organize_releases中的排序一致）"""
+    for version_types in organized_data.values():
+        for years in version_types.values():
+            for releases in years.values():
+                releases.sort(key=lambda x: (x['raw_date'], generator.version_to_sortable(x['version'])), reverse=True)
+
+
+def run_scale(generator, count, seed=0, trace_memory=False):
+    """
+    测量一种规模
+
+    Args:
+        generator: 时间轴生成器
+        count: 发布数量
+        seed: 合成数据的随机数种子
+        trace_memory: 是否测量处理和渲染期间的tracemalloc峰值
+
+    Returns:
+        指标字典
+    """
+    # 与CLI相同的读取路径（按日期倒序读取全部发布），数据来自内存存储
+    generator.storage = MemoryStorage(make_documents(count, seed))
+    generator.connect_db()
+    documents, load_time = timed(generator.get_all_releases)
+
+    _, classify_time = timed(lambda: [classification.classify_release(doc) for doc in documents])
+
+    if trace_memory:
+        tracemalloc.start()
+    # 与process_releases相同的三个阶段，分别计时
+    entries, prepare_time = timed(lambda: generator.prepare_releases(documents))
+    (merged_releases, stats, product_line_stats), merge_time = timed(lambda: generator.merge_releases(entries, len(documents)))
+    organized_data, organize_time = timed(lambda: generator.organize_releases(merged_releases))
+    process_time = prepare_time + merge_time + organize_time
+    shuffled = shuffled_copy(organized_data, seed)
+    _, sort_time = timed(lambda: sort_organized(generator, shuffled))
+    latest = generator.latest_update(documents)
+    html, render_time = timed(lambda: generator.render_html(organized_data, stats, product_line_stats, latest))
+    peak = None
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        tracemalloc.stop()
+
+    entries = sum(
+        len(releases)
+        for version_types in organized_data.values()
+        for years in version_types.values()
+        for releases in years.values()
+    )
+    return {
+        'count': count,
+        'load_seconds': load_time,
+        'classify_per_sec': count / classify_time,
+        'prepare_seconds': prepare_time,
+        'merge_seconds': merge_time,
+        'organize_seconds': organize_time,
+        'process_seconds': process_time,
+        'process_per_sec': count / process_time,
+        'sort_seconds': sort_time,
+        'render_seconds': render_time,
+        'timeline_entries': entries,
+        'merged_ratio': 1 - entries / count if count else 0.0,
+        'html_bytes': len(html.encode('utf-8')),
+        'traced_peak_mb': peak,
+    }
+
+
+def run(scales=(1000, 10000, 100000), seed=0, trace_memory=False):
+    """
+    运行基准测试
+
+    Args:
+        scales: 发布数量，可包含1000000（需要数GB内存）
+        seed: 合成数据的随机数种子
+        trace_memory: 是否测量内存峰值（明显变慢）
+
+    Returns:
+        {发布数量: 指标}
+    """
+    generator = ImprovedTimelineGenerator()
+    return {count: run_scale(generator, count, seed, trace_memory) for count in scales}
+
+
+def _int_list(value):
+    return tuple(int(part) for part in value.split(',') if part)
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='时间轴生成基准测试')
+    parser.add_argument('--scales', type=_int_list, default=(1000, 10000, 100000), help='发布数量，逗号分隔（如1000,10000,100000,1000000）')
+    parser.add_argument('--seed', type=int, default=0, help='合成数据的随机数种子')
+    parser.add_argument('--memory', action='store_true', help='用tracemalloc测量处理和渲染期间的内存峰值')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    results = run(args.scales, args.seed, args.memory)
+
+    print(f"{'发布数':>9}{'读取(s)':>9}{'分类/秒':>11}{'整理(s)':>9}{'合并(s)':>9}{'组织(s)':>9}{'处理/秒':>11}"
+          f"{'排序(s)':>9}{'渲染(s)':>9}{'条目':>8}{'合并率':>8}{'HTML(MB)':>10}{'峰值(MB)':>10}")
+    for count, row in results.items():
+        peak = f"{row['traced_peak_mb']:>10.1f}" if row['traced_peak_mb'] is not None else f"{'-':>10}"
+        print(f"{count:>9}{row['load_seconds']:>10.2f}{row['classify_per_sec']:>12,.0f}{row['prepare_seconds']:>10.2f}"
+              f"{row['merge_seconds']:>10.3f}{row['organize_seconds']:>10.3f}{row['process_per_sec']:>12,.0f}"
+              f"{row['sort_seconds']:>10.3f}{row['render_seconds']:>10.2f}{row['timeline_entries']:>9}"
+              f"{row['merged_ratio']:>9.1%}{row['html_bytes'] / 1024 / 1024:>10.1f}{peak}")
@@ -0,0 +1,392 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+本地GraphQL模拟服务
+按真实接口的结构返回releases列表和GetRelease详情响应，可配置延迟分布、错误率和429限流突发，
+用于离线压测爬虫（GRAPHQL_API_URL=http://127.0.0.1:<端口>/）
+"""
+
+import re
+import json
+import math
+import time
+import random
+import socket
+import functools
+import argparse
+import threading
+import multiprocessing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# 合成发布使用的产品及标签
+PRODUCTS = [
+    ('UniFi Network Application', ['unifi-network', 'software']),
+    ('UniFi OS - Dream Machines', ['unifi-os', 'firmware']),
+    ('UniFi Access Point', ['unifi-wireless', 'firmware']),
+    ('UniFi Switch', ['unifi-switch', 'firmware']),
+    ('UniFi Protect Application', ['unifi-protect', 'software']),
+    ('UniFi Protect Camera', ['unifi-protect', 'firmware']),
+    ('UniFi Access Application', ['unifi-access', 'software']),
+    ('UniFi Talk Application', ['unifi-talk', 'software']),
+    ('UISP Firmware', ['uisp', 'firmware']),
+    ('UniFi Identity Enterprise', ['unifi-identity', 'software']),
+]
+STAGES = ['GA', 'GA', 'GA', 'RC', 'BETA']
+
+_LIST_PATTERN = re.compile(r'releases\(\s*limit:\s*(\d+)\s*,\s*offset:\s*(\d+)\s*\)')
+
+
+def _user(index):
+    """GraphQL User片段"""
+    return {
+        'id': f"user-{index}", 'username': f"ui-user-{index}", 'title': 'Ubiquiti', 'slug': f"ui-user-{index}",
+        'avatar': {'color': '#0559C9', 'content': 'UI', 'image': None, '__typename': 'Avatar'},
+        'isEmployee': True, 'registeredAt': '2019-01-01T00:00:00.000Z', 'lastOnlineAt': '2024-05-01T00:00:00.000Z',
+        'groups': ['EMPLOYEE'], 'showOfficialBadge': True, 'canBeMentioned': True, 'canViewProfile': True,
+        'canStartConversationWith': False, '__typename': 'User'
+    }
+
+
+def _text(body):
+    return {'type': 'TEXT', 'content': body, '__typename': 'TextContent'}
+
+
+def _notes(rng, kind, lines):
+    return '<ul>' + ''.join(f"<li>{kind} {rng.randrange(10000)}.</li>" for _ in range(lines)) + '</ul>'
+
+
+def parse_latency(spec):
+    """
+    解析延迟分布
+
+    Args:
+        spec: 0（无延迟）、fixed:毫秒、uniform:最小毫秒:最大毫秒 或 lognormal:中位数毫秒:sigma
+
+    Returns:
+        以random.Random为参数、返回延迟秒数的函数
+    """
+    parts = str(spec).split(':')
+    kind = parts[0]
+    try:
+        values = [float(value) for value in parts[1:]]
+        if kind in ('0', 'none', ''):
+            return lambda rng: 0.0
+        if kind == 'fixed':
+            return lambda rng: values[0] / 1000
+        if kind == 'uniform':
+            return lambda rng: rng.uniform(values[0], values[1]) / 1000
+        if kind == 'lognormal':
+            mu = math.log(values[0] / 1000)
+            return lambda rng: rng.lognormvariate(mu, values[1])
+    except (ValueError, IndexError):
+        pass
+    raise ValueError(f"无法解析的延迟分布: {spec}")
+
+
+class MockCorpus:
+    """
+    模拟服务返回的发布数据
+
+    默认按序号确定性地合成；指定seed_file时以缓存的真实响应（GetRelease响应、releases响应或
+    发布对象，JSON数组或每行一个的JSONL）为模板循环生成，只替换ID、slug、版本和时间
+    """
+
+    def __init__(self, count=2000, seed=0, seed_file=None):
+        self.count = count
+        self.seed = seed
+        self.templates = self._load_templates(seed_file) if seed_file else []
+        self.items = [self._list_item(self.release(index)) for index in range(count)]
+        self.index_by_id = {item['id']: index for index, item in enumerate(self.items)}
+        # 详情响应生成较慢，缓存最近的响应，使服务端开销不掩盖爬虫自身的耗时
+        self._detail_bytes = functools.lru_cache(maxsize=4096)(self._render_detail)
+
+    @staticmethod
+    def _load_templates(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read().strip()
+        if text.startswith('['):
+            records = json.loads(text)
+        else:
+            records = [json.loads(line) for line in text.splitlines() if line.strip()]
+
+        templates = []
+        for record in records:
+            data = record.get('data', record) if isinstance(record, dict) else {}
+            if 'release' in data and data['release']:
+                templates.append(data['release'])
+            elif 'releases' in data:
+                templates.extend((data['releases'] or {}).get('items') or [])
+            elif 'id' in data:
+                templates.append(data)
+        if not templates:
+            raise ValueError(f"种子文件中没有可用的发布数据: {path}")
+        return templates
+
+    def release(self, index):
+        """按序号生成发布详情（releases列表按创建时间从新到旧排列）"""
+        rng = random.Random(self.seed * 1000003 + index)
+        created = time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime(1_700_000_000 - index * 3600))
+        major, minor, patch = 1 + index % 9, index // 9 % 20, index % 100
+
+        if self.templates:
+            release = json.loads(json.dumps(self.templates[index % len(self.templates)]))
+            release.update({
+                'id': f"mock-{index}",
+                'slug': f"{release.get('slug') or 'release'}-{index}",
+                'version': f"{major}.{minor}.{patch}",
+                'createdAt': created,
+                'lastActivityAt': created,
+                'updatedAt': created,
+            })
+            return release
+
+        title, tags = PRODUCTS[index % len(PRODUCTS)]
+        version = f"{major}.{minor}.{patch}"
+        return {
+            'id': f"mock-{index}", 'slug': f"{title.lower().replace(' ', '-')}-{version}", 'type': tags[1].upper(),
+            'title': title, 'version': version, 'stage': STAGES[index % len(STAGES)], 'tags': tags,
+            'betas': [], 'alphas': [], 'isFeatured': False, 'isLocked': False, 'hasUiEngagement': True,
+            'stats': {'comments': rng.randrange(200), 'views': rng.randrange(50000), '__typename': 'ReleaseStats'},
+            'createdAt': created, 'lastActivityAt': created, 'updatedAt': created,
+            'userStatus': {'isFollowing': False, 'lastViewedAt': None, 'reported': False, 'vote': None, 'lastViewedId': None, '__typename': 'UserStatus'},
+            'author': _user(index % 7),
+            'publishedAs': _user(index % 5),
+            'groupId': f"group-{index // 4}",
+            'content': [_text(_notes(rng, 'Release summary', 3))],
+            'newFeatures': [_text(_notes(rng, 'Added feature', rng.randrange(1, 15)))],
+            'improvements': [_text(_notes(rng, 'Improved stability of', rng.randrange(1, 40)))],
+            'bugfixes': [_text(_notes(rng, 'Fixed issue', rng.randrange(1, 40)))],
+            'knownIssues': [_text(_notes(rng, 'Known issue', rng.randrange(0, 5)))],
+            'importantNotes': [],
+            'instructions': [],
+            'links': [
+                {'url': f"https://dl.ui.com/firmware/mock/{index}/{model}.bin", 'title': f"{title} model {model}",
+                 'checksums': {'md5': 'a' * 32, 'sha256': 'b' * 64, '__typename': 'Checksums'}, '__typename': 'Link'}
+                for model in range(rng.randrange(1, 8))
+            ],
+            'editor': _user(3), 'status': 'PUBLISHED', '__typename': 'Release'
+        }
+
+    @staticmethod
+    def _list_item(release):
+        """从详情中取出releases列表查询返回的字段"""
+        item = {key: release.get(key) for key in (
+            'id', 'slug', 'title', 'version', 'stage', 'createdAt', 'lastActivityAt', 'updatedAt', 'tags', 'type', 'stats'
+        )}
+        item['publishedAs'] = release.get('publishedAs')
+        item['__typename'] = 'Release'
+        return item
+
+    def list_response(self, limit, offset):
+        items = self.items[offset:offset + limit]
+        return json.dumps({'data': {'releases': {'items': items, '__typename': 'Releases'}}}).encode()
+
+    def detail_response(self, release_id):
+        return self._detail_bytes(release_id)
+
+    def _render_detail(self, release_id):
+        index = self.index_by_id.get(release_id)
+        release = self.release(index) if index is not None else None
+        return json.dumps({'data': {'release': release}}).encode()
+
+
+class MockGraphQLServer:
+    """模拟GraphQL服务，在后台线程中运行"""
+
+    def __init__(self, corpus, host='127.0.0.1', port=0, latency='0', error_rate=0.0,
+                 graphql_error_rate=0.0, throttle_every=0, throttle_length=0, seed=0):
+        """
+        Args:
+            corpus: MockCorpus
+            host: 监听地址
+            port: 监听端口，0表示自动选择
+            latency: 延迟分布（见parse_latency）
+            error_rate: 返回HTTP 500的比例
+            graphql_error_rate: 返回200但带errors的比例
+            throttle_every: 每隔多少个请求出现一次429突发，0表示不限流
+            throttle_length: 每次突发连续返回429的请求数
+            seed: 随机数种子
+        """
+        self.corpus = corpus
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.graphql_error_rate = graphql_error_rate
+        self.throttle_every = throttle_every
+        self.throttle_length = throttle_length
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.status_counts = {}
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def _next_request(self):
+        """返回(请求序号, 延迟秒数, 随机数)"""
+        with self._lock:
+            self.requests += 1
+            return self.requests, self.latency(self.rng), self.rng.random()
+
+    def _count(self, status):
+        with self._lock:
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+
+    def respond(self, payload):
+        """
+        根据请求体生成响应
+
+        Returns:
+            (状态码, 响应字节, 额外响应头)
+        """
+        number, delay, roll = self._next_request()
+        if delay > 0:
+            time.sleep(delay)
+
+        if self.throttle_every > 0 and number % self.throttle_every >= self.throttle_every - self.throttle_length:
+            return 429, b'{"errors":[{"message":"Too Many Requests"}]}', {'Retry-After': '1'}
+        if roll < self.error_rate:
+            return 500, b'Internal Server Error', {}
+        if roll < self.error_rate + self.graphql_error_rate:
+            return 200, b'{"data":null,"errors":[{"message":"Mock GraphQL error"}]}', {}
+
+        if payload.get('operationName') == 'GetRelease':
+            release_id = (payload.get('variables') or {}).get('id')
+            return 200, self.corpus.detail_response(release_id), {}
+
+        match = _LIST_PATTERN.search(payload.get('query') or '')
+        if match:
+            limit, offset = int(match.group(1)), int(match.group(2))
+            return 200, self.corpus.list_response(limit, offset), {}
+        return 400, b'{"errors":[{"message":"Unsupported query"}]}', {}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # 响应头和响应体一次写出，避免Nagle算法与延迟确认叠加出约40毫秒的额外延迟
+            wbufsize = 1 << 16
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                try:
+                    payload = json.loads(self.rfile.read(length) or b'{}')
+                except ValueError:
+                    payload = {}
+                status, body, headers = server.respond(payload)
+                server._count(status)
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='mock-graphql', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def free_port(host='127.0.0.1'):
+    """取一个空闲端口"""
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def _serve(options, ready):
+    corpus = MockCorpus(options.pop('count'), options.get('seed', 0), options.pop('seed_file', None))
+    server = MockGraphQLServer(corpus, **options)
+    ready.set()
+    server.httpd.serve_forever()
+
+
+def serve_in_process(count=2000, seed_file=None, **options):
+    """
+    在子进程中启动模拟服务，避免与被测爬虫争用GIL
+
+    Args:
+        count: 发布数量
+        seed_file: 缓存响应文件
+        **options: MockGraphQLServer的参数
+
+    Returns:
+        (服务地址, 子进程)，用完后调用process.terminate()
+    """
+    host = options.setdefault('host', '127.0.0.1')
+    port = options.setdefault('port', free_port(host))
+    ready = multiprocessing.Event()
+    process = multiprocessing.Process(
+        target=_serve, args=(dict(options, count=count, seed_file=seed_file), ready), daemon=True
+    )
+    process.start()
+    if not ready.wait(60):
+        process.terminate()
+        raise RuntimeError("模拟服务启动超时")
+
+    # 等待端口可以连接
+    deadline = time.time() + 10
+    while True:
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            break
+        except OSError:
+            if time.time() > deadline:
+                process.terminate()
+                raise
+            time.sleep(0.05)
+    return f"http://{host}:{port}/", process
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='本地GraphQL模拟服务')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=8765, help='监听端口')
+    parser.add_argument('--count', type=int, default=2000, help='发布数量')
+    parser.add_argument('--seed', type=int, default=0, help='随机数种子')
+    parser.add_argument('--seed-file', default=None, help='缓存的真实响应（JSON或JSONL），作为合成发布的模板')
+    parser.add_argument('--latency', default='0', help='延迟分布: 0、fixed:毫秒、uniform:最小:最大、lognormal:中位数:sigma')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='返回HTTP 500的比例')
+    parser.add_argument('--graphql-error-rate', type=float, default=0.0, help='返回GraphQL errors的比例')
+    parser.add_argument('--throttle-every', type=int, default=0, help='每隔多少个请求出现一次429突发')
+    parser.add_argument('--throttle-length', type=int, default=0, help='每次突发连续返回429的请求数')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    corpus = MockCorpus(args.count, args.seed, args.seed_file)
+    server = MockGraphQLServer(
+        corpus, host=args.host, port=args.port, latency=args.latency, error_rate=args.error_rate,
+        graphql_error_rate=args.graphql_error_rate, throttle_every=args.throttle_every,
+        throttle_length=args.throttle_length, seed=args.seed
+    )
+    print(f"模拟GraphQL服务已启动: {server.url}（{args.count} 个发布）")
+    print(f"爬虫使用: GRAPHQL_API_URL={server.url} python run.py")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(f"共处理 {server.requests} 个请求，状态码: {server.status_counts}")
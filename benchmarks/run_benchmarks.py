@@ -0,0 +1,319 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+基准测试回归检查
+依次运行分类、模型、时间轴、爬虫和存储基准测试，把结果连同git提交和机器信息写入JSON，
+并与保存的基线比较：吞吐量下降或耗时上升超过容差的指标视为回归，此时以非零状态退出
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import fnmatch
+import logging
+import argparse
+import platform
+import subprocess
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import bench_classification, bench_models, bench_scraper, bench_storage, bench_timeline
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(REPO_ROOT, 'benchmarks', 'baseline.json')
+
+# 基准测试套件：(运行函数, 默认参数, --quick时的参数)
+SUITES = {
+    'classification': (bench_classification.run, {'count': 20000}, {'count': 5000}),
+    'models': (bench_models.run, {'count': 100000}, {'count': 20000}),
+    'timeline': (bench_timeline.run, {'scales': (1000, 10000)}, {'scales': (1000,)}),
+    'scraper': (
+        bench_scraper.run,
+        {'count': 2000, 'detail_count': 400, 'batch_sizes': (50,), 'workers': (8,), 'latency': 'fixed:5',
+         'pipeline_count': 200},
+        {'count': 1000, 'detail_count': 200, 'batch_sizes': (50,), 'workers': (8,), 'latency': 'fixed:5',
+         'pipeline_count': 100},
+    ),
+    'storage': (
+        bench_storage.run,
+        {'count': 5000, 'lookups': 2000, 'strategies': ('save_release', 'bulk_upsert')},
+        {'count': 1000, 'lookups': 500, 'strategies': ('save_release', 'bulk_upsert')},
+    ),
+}
+
+# 指标方向：按名称后缀判断，越大越好的为吞吐量，越小越好的为耗时和内存；其余指标（数量等）只记录不比较
+HIGHER_IS_BETTER = ('_per_sec',)
+LOWER_IS_BETTER = ('_seconds', '_ms', '_mb', 'us_per_response', 'bytes_per_release')
+
+# 默认容差（相对变化），按指标名通配匹配，先匹配到的生效；延迟尾部和依赖网络的指标波动更大
+DEFAULT_TOLERANCES = (
+    ('*.p99_ms', 0.5),
+    ('*.sort_seconds', 0.5),
+    ('scraper.*', 0.25),
+    ('storage.*', 0.25),
+    ('*peak*', 0.2),
+)
+DEFAULT_TOLERANCE = 0.1
+
+# 只记录不比较的指标：进程峰值RSS是整个进程的最高水位，取决于之前运行过的套件和重复次数
+IGNORED_METRICS = ('*peak_rss_mb',)
+
+# 绝对变化的下限：变化量小于该值时视为计时抖动，不判为回归或提升（亚毫秒级的耗时按比例比较会频繁误报）
+ABSOLUTE_FLOORS = (('*_seconds', 0.005),)
+
+
+def git_info():
+    """当前的git提交、分支以及工作区是否有未提交的修改"""
+    def git(*args):
+        try:
+            return subprocess.run(['git', *args], cwd=REPO_ROOT, capture_output=True, text=True,
+                                  timeout=30).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return ''
+
+    return {
+        'commit': git('rev-parse', 'HEAD') or None,
+        'branch': git('rev-parse', '--abbrev-ref', 'HEAD') or None,
+        'dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+    }
+
+
+def machine_info():
+    """机器信息，比较不同机器上的结果时给出提示"""
+    return {
+        'hostname': socket.gethostname(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+    }
+
+
+def flatten(results, prefix=''):
+    """把嵌套的结果展开为 {'套件.路径.指标': 数值}，忽略非数值"""
+    metrics = {}
+    for key, value in results.items():
+        name = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, dict):
+            metrics.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics[name] = value
+    return metrics
+
+
+def direction(metric):
+    """指标方向：1表示越大越好，-1表示越小越好，0表示不比较"""
+    name = metric.rsplit('.', 1)[-1]
+    if name.endswith(HIGHER_IS_BETTER):
+        return 1
+    if name.endswith(LOWER_IS_BETTER):
+        return -1
+    return 0
+
+
+def tolerance_for(metric, tolerances, default):
+    """按通配规则查找指标的容差"""
+    for pattern, tolerance in tolerances:
+        if fnmatch.fnmatchcase(metric, pattern):
+            return tolerance
+    return default
+
+
+def best_of(runs):
+    """多次运行时每个指标取最好的一次，减少偶发抖动造成的误报"""
+    best = dict(runs[0])
+    for metrics in runs[1:]:
+        for name, value in metrics.items():
+            if name not in best:
+                best[name] = value
+            elif direction(name) > 0:
+                best[name] = max(best[name], value)
+            elif direction(name) < 0:
+                best[name] = min(best[name], value)
+    return best
+
+
+def run_suites(suites, quick=False, repeat=1, overrides=None):
+    """
+    运行基准测试套件
+
+    Args:
+        suites: 套件名称
+        quick: 是否使用较小的规模
+        repeat: 每个套件运行的次数，指标取最好的一次
+        overrides: {套件: 额外参数}，如存储测试的mongo_uri
+
+    Returns:
+        (原始结果, 展开后的指标, 跳过的套件及原因)
+    """
+    results, metrics, skipped = {}, {}, {}
+    for name in suites:
+        func, params, quick_params = SUITES[name]
+        kwargs = dict(quick_params if quick else params)
+        kwargs.update((overrides or {}).get(name, {}))
+        logging.warning(f"运行基准测试: {name}")
+        runs = []
+        try:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                result = func(**kwargs)
+                results[name] = result
+                runs.append(flatten(result, name))
+                logging.warning(f"{name} 完成，耗时 {time.perf_counter() - start:.1f} 秒")
+        except RuntimeError as e:
+            # 环境不满足（如没有mongod）时跳过，不视为回归
+            skipped[name] = str(e)
+            logging.warning(f"跳过 {name}: {e}")
+            continue
+        metrics.update(best_of(runs))
+    return results, metrics, skipped
+
+
+def compare(current, baseline, tolerances=DEFAULT_TOLERANCES, default=DEFAULT_TOLERANCE,
+            ignored=IGNORED_METRICS, floors=ABSOLUTE_FLOORS):
+    """
+    与基线比较
+
+    Args:
+        current: 当前的指标
+        baseline: 基线的指标
+        tolerances: (通配模式, 容差) 列表
+        default: 未匹配任何模式时的容差
+        ignored: 不比较的指标（通配模式）
+        floors: (通配模式, 绝对变化下限) 列表
+
+    Returns:
+        比较结果列表，每项包含metric、baseline、current、change（相对变化，正数表示变好）、
+        tolerance和status（ok/improved/regressed）
+    """
+    rows = []
+    for metric in sorted(set(current) & set(baseline)):
+        sign = direction(metric)
+        old, new = baseline[metric], current[metric]
+        if not sign or not old or any(fnmatch.fnmatchcase(metric, pattern) for pattern in ignored):
+            continue
+        change = (new - old) / old * sign
+        tolerance = tolerance_for(metric, tolerances, default)
+        if abs(new - old) < tolerance_for(metric, floors, 0):
+            status = 'ok'
+        elif change < -tolerance:
+            status = 'regressed'
+        elif change > tolerance:
+            status = 'improved'
+        else:
+            status = 'ok'
+        rows.append({'metric': metric, 'baseline': old, 'current': new, 'change': change,
+                     'tolerance': tolerance, 'status': status})
+    return rows
+
+
+def load_results(path):
+    """读取之前保存的结果文件"""
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_results(path, data):
+    """写入结果文件"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, sort_keys=True, default=str)
+
+
+def _tolerance(value):
+    pattern, _, tolerance = value.rpartition('=')
+    if not pattern:
+        raise argparse.ArgumentTypeError('格式应为 通配模式=容差，如 timeline.*=0.2')
+    return pattern, float(tolerance)
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='运行基准测试并与基线比较')
+    parser.add_argument('--suites', default=','.join(SUITES), help=f"要运行的套件，逗号分隔（{','.join(SUITES)}）")
+    parser.add_argument('--quick', action='store_true', help='使用较小的规模（适合CI）')
+    parser.add_argument('--repeat', type=int, default=3, help='每个套件运行的次数，指标取最好的一次')
+    parser.add_argument('--output', default=None, help='结果文件，默认 benchmarks/results/<时间>-<提交>.json')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='基线结果文件')
+    parser.add_argument('--save-baseline', action='store_true', help='把本次结果保存为基线（不做比较）')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help='默认容差（相对变化，如0.1表示10%%）')
+    parser.add_argument('--tolerance-for', type=_tolerance, action='append', default=[],
+                        help='指定指标的容差，如 classification.*=0.05，可多次指定，优先于内置规则')
+    parser.add_argument('--mongod', default=None, help='存储测试使用的mongod路径')
+    parser.add_argument('--mongo-uri', default=None, help='存储测试使用已有的MongoDB服务')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s [%(levelname)s] %(message)s', force=True)
+
+    suites = [name for name in args.suites.split(',') if name]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        sys.exit(f"未知的套件: {', '.join(sorted(unknown))}")
+
+    storage_options = {key: value for key, value in (('mongod', args.mongod), ('mongo_uri', args.mongo_uri)) if value}
+    results, metrics, skipped = run_suites(suites, args.quick, max(1, args.repeat), {'storage': storage_options})
+
+    git = git_info()
+    data = {
+        'git': git,
+        'machine': machine_info(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'quick': args.quick,
+        'suites': suites,
+        'skipped': skipped,
+        'metrics': metrics,
+        'results': results,
+    }
+    output = args.output or os.path.join(
+        REPO_ROOT, 'benchmarks', 'results',
+        f"{datetime.now():%Y%m%d-%H%M%S}-{(git['commit'] or 'unknown')[:10]}.json"
+    )
+    write_results(output, data)
+    print(f"结果已写入: {output}")
+
+    if args.save_baseline:
+        write_results(args.baseline, data)
+        print(f"已保存为基线: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"基线不存在: {args.baseline}，用 --save-baseline 创建")
+        return 0
+
+    baseline = load_results(args.baseline)
+    if baseline.get('quick') != args.quick:
+        print("警告: 基线与本次运行的规模不同（--quick），结果可能不可比")
+    if baseline.get('machine', {}).get('hostname') != data['machine']['hostname']:
+        print(f"警告: 基线来自另一台机器（{baseline.get('machine', {}).get('hostname')}），结果可能不可比")
+
+    tolerances = tuple(args.tolerance_for) + DEFAULT_TOLERANCES
+    rows = compare(metrics, baseline.get('metrics', {}), tolerances, args.tolerance)
+    baseline_commit = (baseline.get('git', {}).get('commit') or 'unknown')[:10]
+    print(f"\n与基线比较（{baseline_commit} → {(git['commit'] or 'unknown')[:10]}{'，有未提交的修改' if git['dirty'] else ''}）")
+    print(f"{'指标':<58}{'基线':>14}{'当前':>14}{'变化':>9}{'容差':>7}  状态")
+    for row in rows:
+        marker = {'regressed': '回归', 'improved': '提升', 'ok': ''}[row['status']]
+        print(f"{row['metric']:<60}{row['baseline']:>14,.2f}{row['current']:>14,.2f}"
+              f"{row['change']:>+9.1%}{row['tolerance']:>8.0%}  {marker}")
+
+    regressions = [row for row in rows if row['status'] == 'regressed']
+    if regressions:
+        print(f"\n{len(regressions)} 项指标回归: {', '.join(row['metric'] for row in regressions)}")
+        return 1
+    print("\n没有超过容差的回归")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
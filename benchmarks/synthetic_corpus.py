@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+合成发布数据生成器
+生成与数据库中结构一致的发布文档：按真实分布混合各产品线的标签、多设备共享分组ID的统一固件、
+带平台标签的移动应用发布，以及少量很长的发布说明。同一种子和数量总是生成相同的数据，
+可输出为JSONL或写入MongoDB集合，供时间轴和存储基准测试使用
+"""
+
+import os
+import json
+import random
+import argparse
+from datetime import datetime, timedelta
+
+
+# (产品名称, 标签, 固件类型, 权重)；统一固件的产品在同一分组中展开为多个设备
+PRODUCTS = [
+    ('UniFi Network Application', ['unifi-network', 'software'], 'SOFTWARE', 8),
+    ('UniFi OS - Dream Machines', ['unifi-os', 'unifi-gateway'], 'FIRMWARE', 6),
+    ('UniFi OS - Cloud Keys', ['unifi-os', 'unifi-cloud'], 'FIRMWARE', 3),
+    ('UniFi Protect Application', ['unifi-protect', 'software'], 'SOFTWARE', 6),
+    ('UniFi Access Application', ['unifi-access', 'software'], 'SOFTWARE', 3),
+    ('UniFi Talk Application', ['unifi-talk', 'software'], 'SOFTWARE', 2),
+    ('UniFi Connect Application', ['unifi-connect', 'software'], 'SOFTWARE', 1),
+    ('UISP Firmware', ['uisp', 'firmware'], 'FIRMWARE', 3),
+    ('airMAX AC Firmware', ['airmax', 'firmware'], 'FIRMWARE', 3),
+    ('EdgeRouter Firmware', ['edgemax', 'firmware'], 'FIRMWARE', 2),
+    ('AmpliFi Alien Firmware', ['amplifi', 'firmware'], 'FIRMWARE', 1),
+    ('UniFi Design Center', ['unifi-design-center', 'software'], 'SOFTWARE', 1),
+]
+
+# 统一固件：(产品线名称, 标签, 设备型号)
+UNIFIED_FIRMWARE = [
+    ('UniFi Access Point', ['unifi-wireless', 'firmware'], ['U6-Lite', 'U6-LR', 'U6-Pro', 'U6-Enterprise', 'U7-Pro', 'UAP-AC-Lite', 'UAP-AC-Pro', 'UAP-nanoHD', 'UAP-FlexHD']),
+    ('UniFi Switch', ['unifi-switch', 'firmware'], ['USW-Lite-8-PoE', 'USW-24-PoE', 'USW-48-PoE', 'USW-Pro-24', 'USW-Pro-48', 'USW-Aggregation', 'USW-Flex-Mini', 'USW-Enterprise-24']),
+    ('UniFi Protect Camera', ['unifi-protect', 'camera'], ['G4 Bullet', 'G4 Dome', 'G4 Doorbell', 'G4 Instant', 'G5 Bullet', 'G5 Flex', 'G5 Turret Ultra', 'AI 360']),
+    ('UniFi Access Reader', ['unifi-access', 'firmware'], ['UA-Lite', 'UA-Pro', 'UA-Hub', 'UA-G2-Pro']),
+]
+
+# 移动应用：(应用名称, 标签)
+APPS = [
+    ('UniFi Protect', ['protect-app']),
+    ('UniFi', ['unifi-app']),
+    ('WiFiman', ['wifiman-app']),
+    ('UniFi Access', ['access-app']),
+    ('UniFi Verify', ['verify-app']),
+]
+PLATFORMS = ['iOS', 'Android']
+
+# 发布类型分布：普通产品、统一固件分组、移动应用
+KIND_WEIGHTS = (('product', 55), ('unified', 30), ('app', 15))
+
+STAGE_WEIGHTS = (('GA', 70), ('RC', 15), ('BETA', 10), ('EA', 5))
+
+NOTE_LINES = [
+    'Improved stability of {feature}.',
+    'Fixed an issue where {feature} could fail after a restart.',
+    'Added support for {feature}.',
+    'Improved performance of {feature} on large sites.',
+    'Fixed a rare crash related to {feature}.',
+    'Updated {feature} translations.',
+]
+FEATURES = ['adoption', 'VLAN tagging', 'PoE scheduling', 'roaming', 'firmware updates', 'RADIUS', 'backup restore',
+            'camera streaming', 'door unlock', 'traffic identification', 'site-to-site VPN', 'mobile notifications']
+
+
+def _weighted(rng, weights):
+    total = sum(weight for _, weight in weights)
+    roll = rng.uniform(0, total)
+    for value, weight in weights:
+        roll -= weight
+        if roll <= 0:
+            return value
+    return weights[-1][0]
+
+
+def _notes(rng, long_notes):
+    """生成发布说明，long_notes时生成数百行的长说明"""
+    lines = rng.randrange(200, 600) if long_notes else rng.randrange(3, 30)
+    sections = ['## Improvements', '## Bugfixes', '## Known Issues']
+    body = []
+    for index in range(lines):
+        if index % 10 == 0:
+            body.append(sections[index // 10 % len(sections)])
+        body.append('- ' + rng.choice(NOTE_LINES).format(feature=rng.choice(FEATURES)))
+    return '\n'.join(body)
+
+
+def _version(rng, stage, index):
+    version = f"{rng.randrange(1, 10)}.{rng.randrange(0, 20)}.{index % 200}"
+    if stage == 'RC':
+        version += f"-rc.{rng.randrange(1, 6)}"
+    elif stage == 'BETA':
+        version += f"-beta.{rng.randrange(1, 10)}"
+    return version
+
+
+def _document(index, product_name, tags, firmware_type, version, stage, release_date, group_id, notes, rng):
+    slug = f"{product_name.lower().replace(' ', '-')}-{version.replace('.', '-')}"
+    return {
+        'product_name': product_name,
+        'version': version,
+        'release_date': release_date.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+        'release_id': f"synthetic-{index}",
+        'download_url': f"https://community.ui.com/releases/{slug}",
+        'release_notes': notes,
+        'firmware_type': firmware_type,
+        'is_beta': stage == 'BETA',
+        'created_at': release_date,
+        'stage': stage,
+        'slug': slug,
+        'tags': json.dumps(tags),
+        'download_links': json.dumps([
+            f"{product_name}: https://dl.ui.com/synthetic/{index}/{link}.bin" for link in range(rng.randrange(0, 4))
+        ]),
+        'group_id': group_id,
+        'last_updated': release_date,
+        'views': rng.randrange(0, 100000),
+        'comments': rng.randrange(0, 300),
+        'last_activity_at': release_date.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+    }
+
+
+def generate_documents(count, seed=0, long_notes_ratio=0.02, start=datetime(2024, 12, 31)):
+    """
+    逐个生成发布文档
+
+    Args:
+        count: 文档数量
+        seed: 随机数种子
+        long_notes_ratio: 长发布说明的比例
+        start: 最新发布的日期，之后的发布依次向前
+
+    Returns:
+        文档字典的迭代器，统一固件分组中的设备共享group_id、版本和发布日期
+    """
+    rng = random.Random(seed)
+    index = 0
+    group = 0
+    while index < count:
+        release_date = start - timedelta(hours=index * 3 + rng.randrange(3))
+        stage = _weighted(rng, STAGE_WEIGHTS)
+        kind = _weighted(rng, KIND_WEIGHTS)
+        notes = _notes(rng, rng.random() < long_notes_ratio)
+        group += 1
+
+        if kind == 'unified':
+            name, tags, models = rng.choice(UNIFIED_FIRMWARE)
+            version = _version(rng, stage, index)
+            for model in rng.sample(models, rng.randrange(2, len(models) + 1)):
+                if index >= count:
+                    break
+                yield _document(index, f"{name} {model}", tags, 'FIRMWARE', version, stage,
+                                release_date, f"group-{group}", notes, rng)
+                index += 1
+        elif kind == 'app':
+            name, tags = rng.choice(APPS)
+            platform = rng.choice(PLATFORMS)
+            version = f"{rng.randrange(1, 6)}.{rng.randrange(0, 30)}.{rng.randrange(0, 10)}"
+            yield _document(index, f"{name} {platform} App", tags + [platform.lower()], 'APP', version, 'GA',
+                            release_date, '', notes, rng)
+            index += 1
+        else:
+            name, tags, firmware_type, _ = _weighted(rng, [(product, product[3]) for product in PRODUCTS])
+            yield _document(index, name, tags, firmware_type, _version(rng, stage, index), stage,
+                            release_date, f"group-{group}", notes, rng)
+            index += 1
+
+
+def make_documents(count, seed=0, long_notes_ratio=0.02):
+    """生成发布文档列表"""
+    return list(generate_documents(count, seed, long_notes_ratio))
+
+
+def write_jsonl(path, count, seed=0):
+    """把合成文档写入JSONL文件（日期写为ISO字符串）"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for document in generate_documents(count, seed):
+            f.write(json.dumps(document, default=lambda value: value.isoformat(), ensure_ascii=False) + '\n')
+
+
+def insert_into(collection, count, seed=0, batch_size=5000):
+    """
+    把合成文档批量写入MongoDB集合
+
+    Args:
+        collection: pymongo集合
+        count: 文档数量
+        seed: 随机数种子
+        batch_size: 每批写入的文档数
+
+    Returns:
+        写入的文档数
+    """
+    batch = []
+    written = 0
+    for document in generate_documents(count, seed):
+        batch.append(document)
+        if len(batch) >= batch_size:
+            collection.insert_many(batch, ordered=False)
+            written += len(batch)
+            batch = []
+    if batch:
+        collection.insert_many(batch, ordered=False)
+        written += len(batch)
+    return written
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='生成合成发布数据')
+    parser.add_argument('--count', type=int, default=10000, help='文档数量')
+    parser.add_argument('--seed', type=int, default=0, help='随机数种子')
+    parser.add_argument('--output', default=None, help='写入JSONL文件')
+    parser.add_argument('--mongo-db', default=None, help='写入该MongoDB数据库的unifi_releases集合（使用MONGO_URI）')
+    parser.add_argument('--drop', action='store_true', help='写入MongoDB前清空集合')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.output:
+        write_jsonl(args.output, args.count, args.seed)
+        print(f"已写入 {args.count} 个合成发布: {args.output}")
+    if args.mongo_db:
+        import pymongo
+        client = pymongo.MongoClient(os.getenv('MONGO_URI', 'mongodb://localhost:27017/'))
+        collection = client[args.mongo_db]['unifi_releases']
+        if args.drop:
+            collection.drop()
+        written = insert_into(collection, args.count, args.seed)
+        client.close()
+        print(f"已写入 {written} 个合成发布: {args.mongo_db}.unifi_releases")
+    if not args.output and not args.mongo_db:
+        print("请指定 --output 或 --mongo-db")
@@ -8,14 +8,24 @@
 import os
 import json
 import logging
+import argparse
 from datetime import datetime
 from collections import defaultdict
 from pymongo import MongoClient
-from jinja2 import Template
 from dotenv import load_dotenv
 import re
 from jinja2 import Environment, FileSystemLoader
 
+from unifi_scraper import classification
+from unifi_scraper.analytics import ReleaseAnalytics
+from unifi_scraper.bson_dump import BsonDumpDatabase
+from unifi_scraper.locking import create_run_lock
+from unifi_scraper.metrics import stage
+from unifi_scraper.mongo_monitor import COMMAND_MONITOR
+from unifi_scraper.memprofile import MemoryProfiler
+from unifi_scraper.profiling import Profiler
+from unifi_scraper.storage import RELEASE_STATS_COLLECTION, STATS_DOCUMENT_ID, aggregate_timeline_stats, stats_from_document
+
 # 加载环境变量
 load_dotenv()
 
@@ -26,53 +36,6 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# 产品线映射关系，根据标签和产品名称进行分类
-PRODUCT_LINE_MAPPING = {
-    # ===== Platform 平台 =====
-    'unifi-os': ['unifi os', 'unifi console', 'dream os', 'udm os', 'dream machine os', 'unifi os console', 'uisp os'],
-    'unifi-network-app': ['unifi network application', 'network controller', 'network management','uap controller', 'unifi sdn'],
-    'unifi-protect-app': ['unifi protect application', 'unifi protect server', 'protect controller', 'video controller'],
-    'unifi-access-app': ['access application', 'access app', 'access controller', 'door controller', 'identity controller'],
-    'unifi-talk-app': ['talk application', 'talk app', 'talk controller', 'voip controller', 'voice controller', 'phone controller'],
-    'unifi-led-app': ['led application', 'led controller', 'led app', 'lighting controller'],
-    'unifi-connect-app': ['connect application', 'connect app', 'connect controller', 'sense controller', 'iot controller'],
-    'unifi-drive-app': ['drive application', 'drive app', 'storage controller', 'backup controller'],
-    'unifi-platform-other': ['security advisory', 'security bulletin', 'advisory bulletin', 'platform advisory'],
-    
-    # ===== 设备产品线 =====
-    'unifi-switch': ['switch', 'campus', 'aggregation', 'usw', 'flex switch', 'enterprise switch', 'poe switch', 'switch firmware', 'usw firmware'],
-    'unifi-gateway': ['gateway', 'usg', 'security gateway', 'routing', 'cable internet', 'mobile routers', 'mobile router', 'dream router', 'dream machine', 'udr', 'udm', 'lte', 'unifi lte', 'udm firmware', 'dream firmware', 'gateway firmware', 'usg firmware'],
-    'unifi-ap': ['access point', 'uap', 'wifi', 'wireless', 'u6', 'nanohd', 'flexhd', 'ac-lite', 'ac-pro', 'access point firmware', 'uap firmware', 'ap firmware','bridge'],
-    'unifi-cloud': ['cloud key', 'uck', 'cloud gateway', 'console', 'ck', 'cloudkey firmware'],
-    'unifi-protect': ['protect', 'camera', 'g4', 'g3', 'doorbell', 'viewport', 'nvr', 'unvr', 'video', 'camera firmware', 'g4 firmware', 'g3 firmware', 'doorbell firmware', 'viewport firmware'],
-    'unifi-access': ['access', 'door', 'smart lock', 'hub', 'identity', 'access hub firmware', 'door firmware', 'smart lock firmware'],
-    'unifi-talk': ['talk', 'phone', 'voip', 'phone firmware', 'talk hardware firmware'],
-    'unifi-led': ['led', 'light', 'lighting', 'led hardware firmware', 'light firmware'],
-    'unifi-connect': ['connect', 'sense', 'sensor', 'uid', 'sense firmware', 'sensor firmware'],
-    
-    # ===== APP & Tools 应用与工具 =====
-    'protect-app': ['protect app', 'protect ios', 'protect android','unifi play', 'unifi play ios','play android', 'play ios', 'play app'],
-    'access-app': ['access app', 'access ios', 'access android'],
-    'connect-app': ['connect app', 'connect ios', 'connect android'],
-    'verify-app': ['verify app', 'verify ios', 'verify android'],
-    'portal-app': ['portal app', 'portal ios', 'portal android'],
-    'identity-endpoint': ['identity endpoint', 'identity endpoint ios', 'identity endpoint android'],
-    'wifiman-app': ['wifiman app', 'wifiman ios', 'wifiman android', 'WiFiman Desktop', 'wifiman for desktop'],
-    'unifi-app': ['unifi app', 'unifi ios', 'unifi android'],
-    'design-center': ['unifi design center', 'unifi innerspace'],
-    
-    # ===== 其他产品线 =====
-    'airmax': ['airmax', 'nanostation', 'litebeam', 'powerbeam', 'rocket', 'prism', 'aircube', '60ghz'],
-    'airfiber': ['airfiber', 'ltu', 'gigabeam'],
-    'edgemax': ['edgerouter', 'edgeswitch', 'edgepoint', 'edgemax'],
-    'amplifi': ['amplifi', 'alien', 'mesh', 'poweramp'],
-    'ufiber': ['ufiber', 'fiber'],
-    'uisp': ['uisp', 'unms', 'isp design', 'isp-app', 'uisp design center','isp design center'],
-    
-    # 未分类的 Unifi 产品
-    'unifi-other': ['unifi']  # 放在最后作为兜底分类
-}
-
 # 产品线分组（按照高级分类组织）
 PRODUCT_LINE_GROUPS = {
     'Platform': [
@@ -166,8 +129,16 @@ VERSION_TYPE_LABELS = {
 class ImprovedTimelineGenerator:
     """增强版时间轴生成器"""
     
-    def __init__(self):
-        """初始化连接和设置"""
+    def __init__(self, dump_dir=None, storage=None):
+        """
+        初始化连接和设置
+        
+        Args:
+            dump_dir: mongodump备份目录，指定时直接读取备份文件而不连接MongoDB
+            storage: 存储后端（如MemoryStorage），指定时从中读取数据，由调用方负责关闭
+        """
+        self.dump_dir = dump_dir
+        self.storage = storage
         self.mongo_uri = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
         self.mongo_db = os.getenv('MONGO_DATABASE', 'unifi_releases')
         self.collection_name = 'unifi_releases'
@@ -181,8 +152,20 @@ class ImprovedTimelineGenerator:
     
     def connect_db(self):
         """连接到MongoDB"""
+        if self.storage is not None:
+            if self.storage.db is None and not self.storage.connect():
+                return False
+            self.db = self.storage.db
+            logger.info(f"使用存储后端: {type(self.storage).__name__}")
+            return True
+        
+        if self.dump_dir:
+            self.db = BsonDumpDatabase(self.dump_dir, self.mongo_db)
+            logger.info(f"使用离线备份: {self.db.dump_dir}")
+            return True
+        
         try:
-            self.client = MongoClient(self.mongo_uri)
+            self.client = MongoClient(self.mongo_uri, **COMMAND_MONITOR.client_options())
             self.db = self.client[self.mongo_db]
             logger.info(f"已连接到MongoDB: {self.mongo_uri}")
             return True
@@ -213,197 +196,11 @@ class ImprovedTimelineGenerator:
     
     def determine_product_line(self, release):
         """确定产品所属的产品线"""
-        tags_str = release.get('tags', '[]')
-        product_name = release.get('product_name', '').lower()
-        firmware_type = release.get('firmware_type', '').lower()
-        version = release.get('version', '').lower()
-        
-        try:
-            # 解析标签
-            tags = json.loads(tags_str) if isinstance(tags_str, str) else tags_str
-            if not isinstance(tags, list):
-                tags = []
-            
-            # 获取标签文本和产品名称文本
-            tags_text = ' '.join([str(tag).lower() for tag in tags])
-            name_text = product_name + ' ' + firmware_type
-            all_text = name_text + ' ' + tags_text
-            
-            # 调试日志
-            logger.debug(f"处理产品: {product_name}, 标签: {tags}")
-            
-            # 特殊处理：识别旧版本的UniFi控制器（5.x.x系列）
-            if ('unifi' in product_name.lower() and 
-                re.search(r'\b5\.\d+\.\d+\b', version) and 
-                ('stable' in all_text or 'controller' in all_text)):
-                return 'unifi-network-app'
-            
-            # 先检查是不是UniFi OS - 这是最高优先级
-            if ('unifi os' in all_text or 'dream os' in all_text or 'udm os' in all_text or 'console os' in all_text) and not 'ios' in all_text:
-                return 'unifi-os'
-            
-            # 检查是否为移动应用 (APP) - 高优先级
-            # 移动应用识别
-            if 'ios' in all_text or 'iphone' in all_text or 'ipad' in all_text or 'android' in all_text or 'mobile app' in all_text:
-                if 'play' in all_text or 'protect' in all_text:
-                    return 'protect-app'
-                elif 'wifiman' in all_text:
-                    return 'wifiman-app'
-                elif 'access' in all_text:
-                    return 'access-app'
-                elif 'connect' in all_text:
-                    return 'connect-app'
-                elif 'verify' in all_text:
-                    return 'verify-app'
-                elif 'portal' in all_text:
-                    return 'portal-app'
-                elif 'identity' in all_text:
-                    return 'identity-endpoint'
-                elif 'unifi' in all_text:
-                    return 'unifi-app'
-
-            # 直接从标签中获取产品线（精确匹配）
-            primary_tag = None
-            for tag in tags:
-                tag_lower = str(tag).lower()
-                if (tag_lower.startswith('unifi-') or tag_lower in ['edgemax', 'airmax', 'airfiber', 'amplifi', 'ufiber', 'uisp', 'design-center']):
-                    primary_tag = tag_lower
-                    break
-            
-            # 特定产品线的标签映射
-            if primary_tag:
-                # 处理标签直接匹配的情况
-                if primary_tag == 'unifi-gateway' or (primary_tag == 'unifi-gateway-cloudkey' and 'gateway' in all_text):
-                    # 如果是UniFi OS相关，优先归类为OS
-                    if ('unifi os' in all_text or 'dream os' in all_text or 'udm os' in all_text) and not 'ios' in all_text:
-                        return 'unifi-os'
-                    return 'unifi-gateway'
-                elif primary_tag == 'unifi-gateway-cloudkey' and not 'gateway' in all_text:
-                    return 'unifi-cloud'
-                elif primary_tag in ['unifi-cloud', 'unifi-cloudkey']:
-                    return 'unifi-cloud'
-                elif primary_tag in ['unifi-switch', 'unifi-switching', 'unifi-routing-switching']:
-                    return 'unifi-switch'
-                elif primary_tag == 'unifi-wireless':
-                    if 'lte' in all_text:
-                        return 'unifi-gateway'  # LTE产品归到Gateway
-                    else:
-                        return 'unifi-ap'
-                elif primary_tag in ['edgemax', 'airmax', 'airfiber', 'amplifi', 'ufiber', 'uisp', 'unms', 'design-center']:
-                    if primary_tag == 'unms':
-                        return 'uisp'
-                    return primary_tag
-            
-            # 使用PRODUCT_LINE_MAPPING进行精确匹配
-            # 1. 将all_text拆分为单词列表，用于精确匹配
-            words = re.findall(r'\b\w+\b', all_text.lower())
-            text_as_phrase = ' '.join(words)
-            
-            # 检查是否包含UniFi OS关键词（最高优先级）
-            for keyword in PRODUCT_LINE_MAPPING['unifi-os']:
-                # 将关键词转换为单词边界正则表达式模式
-                keyword_pattern = r'\b' + re.escape(keyword.lower()) + r'\b'
-                # 检查是否完整匹配且非iOS
-                if re.search(keyword_pattern, text_as_phrase) and not 'ios' in all_text:
-                    return 'unifi-os'
-            
-            # 2. 对每个产品线的关键词列表进行匹配
-            for product_line, keywords in PRODUCT_LINE_MAPPING.items():
-                # 跳过已检查过的UniFi OS
-                if product_line == 'unifi-os':
-                    continue
-                
-                for keyword in keywords:
-                    # 将关键词转换为单词边界正则表达式模式
-                    keyword_pattern = r'\b' + re.escape(keyword.lower()) + r'\b'
-                    
-                    # 检查关键词是否完整匹配（作为独立短语）
-                    if re.search(keyword_pattern, text_as_phrase):
-                        # 特殊情况处理：避免iOS被识别为OS
-                        if product_line == 'unifi-os' and 'ios' in all_text and not keyword.lower() in all_text:
-                            continue
-                        
-                        return product_line
-            
-            # 产品线标识检查
-            if 'unifi' in all_text:
-                # Play相关的产品归类到protect-app
-                if 'play' in all_text:
-                    return 'protect-app'
-                
-                # 检查是否是旧版本UniFi控制器
-                if re.search(r'(unifi.*controller|controller.*unifi|network.*controller)', all_text) or re.search(r'\bunifi\s+\d+\.\d+\.\d+', all_text):
-                    return 'unifi-network-app'
-                
-                # 如果包含UniFi标识，但无法精确匹配，归为其他UniFi产品
-                return 'unifi-other'
-            elif 'edgemax' in all_text or 'edgerouter' in all_text or 'edgeswitch' in all_text:
-                return 'edgemax'
-            elif 'airmax' in all_text:
-                return 'airmax'
-            elif 'airfiber' in all_text or 'ltu' in all_text:
-                return 'airfiber'
-            elif 'amplifi' in all_text:
-                return 'amplifi'
-            elif 'ufiber' in all_text:
-                return 'ufiber'
-            elif 'uisp' in all_text or 'unms' in all_text:
-                return 'uisp'
-            
-            # 完全无法识别的产品
-            return 'other'
-        except Exception as e:
-            logger.warning(f"解析产品线失败: {e}")
-            return 'other'
+        return classification.determine_product_line(release)
     
     def determine_version_type(self, release):
         """确定版本类型(GA/RC/Beta/Alpha等)或移动应用平台类型"""
-        # 获取产品线
-        product_line = self.determine_product_line(release)
-        
-        # 对于APP类产品，返回平台类型而非版本类型
-        if product_line in ['unifi-app', 'protect-app', 'wifiman-app', 'access-app', 'connect-app', 'verify-app', 'portal-app', 'identity-endpoint']:
-            all_text = (release.get('product_name', '') + ' ' + 
-                       release.get('firmware_type', '') + ' ' + 
-                       ' '.join(json.loads(release.get('tags', '[]')) if isinstance(release.get('tags', '[]'), str) else release.get('tags', '[]'))).lower()
-            
-            # 确定平台类型
-            if 'ios' in all_text or 'iphone' in all_text or 'ipad' in all_text:
-                return 'iOS'
-            elif 'android' in all_text:
-                return 'Android'
-            elif 'desktop' in all_text or 'windows' in all_text or 'mac' in all_text:
-                return 'Desktop'
-            else:
-                return 'Other'  # 默认平台类型
-        
-        # 非APP产品使用正常的版本类型判断
-        # 首先检查stage字段
-        stage = release.get('stage', '').lower()
-        
-        if 'ga' in stage or 'general' in stage:
-            return 'GA'
-        elif 'rc' in stage or 'release candidate' in stage:
-            return 'RC'
-        elif 'beta' in stage:
-            return 'Beta'
-        elif 'alpha' in stage:
-            return 'Alpha'
-        
-        # 如果stage字段没有明确指示，从版本号中识别
-        version = release.get('version', '').lower()
-        
-        if 'rc' in version:
-            return 'RC'
-        elif 'beta' in version or 'b' in version:
-            return 'Beta'
-        elif 'alpha' in version or 'a' in version:
-            return 'Alpha'
-        elif release.get('is_beta', False):
-            return 'Beta'
-        
-        # 默认为GA
-        return 'GA'
+        return classification.determine_version_type(release)
     
     def format_date(self, date_str):
         """格式化日期为YYYY-MM-DD格式"""
@@ -420,22 +217,7 @@ class ImprovedTimelineGenerator:
     
     def extract_year(self, date_str):
         """从日期中提取年份"""
-        try:
-            if isinstance(date_str, str):
-                date_obj = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-                return date_obj.year
-            elif isinstance(date_str, datetime):
-                return date_str.year
-        except Exception:
-            pass
-        
-        # 如果无法解析日期，尝试直接提取开头的4位数字作为年份
-        if isinstance(date_str, str) and len(date_str) >= 4:
-            year_str = date_str[:4]
-            if year_str.isdigit():
-                return int(year_str)
-        
-        return "未知年份"
+        return classification.extract_year(date_str)
     
     def categorize_notes(self, notes_text, categorized_notes):
         """将release notes分类为改进内容、bug修复、已知问题等类别"""
@@ -476,25 +258,34 @@ class ImprovedTimelineGenerator:
                     if sentence:
                         categorized_notes[current_category].add(sentence.strip() + ('.' if not sentence.endswith('.') else ''))
     
+    def get_merge_key(self, release, product_line, version_type, year, version):
+        """生成合并键，相同合并键的发布在时间轴中合并为一条"""
+        return classification.get_merge_key(release, product_line, version_type, year, version)
+    
+    def classify_release(self, release):
+        """
+        计算发布的时间轴分类，供统计使用
+        
+        Returns:
+            (产品线, 版本类型, 年份, 合并键)
+        """
+        return classification.classify_release(release)
+    
     def process_releases(self, releases):
         """处理发布数据，按产品线、版本类型和年份组织，并合并相同版本的产品"""
-        # 创建多级嵌套字典结构：产品线 -> 版本类型 -> 年份 -> 发布列表
-        organized_data = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
-        
-        # 统计信息 - 总体统计
-        stats = {
-            'total_releases': len(releases),
-            'product_lines': defaultdict(int),
-            'version_types': defaultdict(int),
-            'years': defaultdict(int)
-        }
-        
-        # 产品线级别的版本类型统计信息
-        product_line_stats = defaultdict(lambda: defaultdict(int))
-        
-        # 用于合并相同版本的临时数据结构
-        merged_releases = {}
+        entries = self.prepare_releases(releases)
+        merged_releases, stats, product_line_stats = self.merge_releases(entries, len(releases))
+        organized_data = self.organize_releases(merged_releases)
+        return organized_data, stats, product_line_stats
+    
+    def prepare_releases(self, releases):
+        """
+        分类每个发布，并整理下载链接、原帖链接和发布说明
         
+        Returns:
+            [(合并键, 处理后的发布, 原始发布), ...]
+        """
+        entries = []
         for release in releases:
             # 确定产品线、版本类型和年份
             product_line = self.determine_product_line(release)
@@ -594,8 +385,8 @@ class ImprovedTimelineGenerator:
                 # 只替换下划线为空格，保留所有其他格式和换行
                 release_notes = release_notes.replace('_', ' ')
             
-            # 创建唯一键，用于合并相同产品线、版本类型、年份和版本号的发布
-            merge_key = f"{product_line}_{version_type}_{year}_{version}"
+            # 创建唯一键，用于合并同一分组的发布
+            merge_key = self.get_merge_key(release, product_line, version_type, year, version)
             
             # 创建处理后的发布数据
             processed_release = {
@@ -613,6 +404,41 @@ class ImprovedTimelineGenerator:
                 'is_merged': False,  # 标记是否为合并版本
                 'categorized_notes': defaultdict(set)  # 添加分类字段
             }
+            entries.append((merge_key, processed_release, release))
+        
+        return entries
+    
+    def merge_releases(self, entries, total_releases):
+        """
+        合并相同合并键的发布，并统计产品线、版本类型和年份（合并后的发布只计数一次）
+        
+        Args:
+            entries: prepare_releases的结果
+            total_releases: 发布总数
+        
+        Returns:
+            (merged_releases, stats, product_line_stats)
+        """
+        # 统计信息 - 总体统计
+        stats = {
+            'total_releases': total_releases,
+            'product_lines': defaultdict(int),
+            'version_types': defaultdict(int),
+            'years': defaultdict(int)
+        }
+        
+        # 产品线级别的版本类型统计信息
+        product_line_stats = defaultdict(lambda: defaultdict(int))
+        
+        # 用于合并相同版本的临时数据结构
+        merged_releases = {}
+        
+        for merge_key, processed_release, release in entries:
+            product_line = processed_release['product_line']
+            version_type = processed_release['version_type']
+            year = processed_release['year']
+            download_links = processed_release['download_links']
+            source_url = processed_release['source_urls'][0] if processed_release['source_urls'] else None
             
             # 如果该合并键已存在，合并发布信息
             if merge_key in merged_releases:
@@ -641,7 +467,8 @@ class ImprovedTimelineGenerator:
                 device_count = len(merged_releases[merge_key]['compatible_devices'])
                 # 根据产品线获取产品线显示名称作为前缀
                 product_line_prefix = PRODUCT_LINE_LABELS.get(product_line, "")
-                merged_releases[merge_key]['display_title'] = f"{product_line_prefix} 统一固件 {version} (适用于{device_count}个设备)"
+                merged_version = merged_releases[merge_key]['version']
+                merged_releases[merge_key]['display_title'] = f"{product_line_prefix} 统一固件 {merged_version} (适用于{device_count}个设备)"
                 
                 # 合并下载链接（如果有不同的链接）
                 for link in download_links:
@@ -694,6 +521,13 @@ class ImprovedTimelineGenerator:
                 # 更新产品线级别的版本类型统计
                 product_line_stats[product_line][version_type] += 1
         
+        return merged_releases, stats, product_line_stats
+    
+    def organize_releases(self, merged_releases):
+        """按产品线、版本类型和年份组织合并后的发布，每个年份下按日期和版本号降序排序"""
+        # 创建多级嵌套字典结构：产品线 -> 版本类型 -> 年份 -> 发布列表
+        organized_data = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
+        
         # 按照产品线、版本类型和年份进行组织
         for merge_key, release in merged_releases.items():
             product_line = release['product_line']
@@ -713,7 +547,7 @@ class ImprovedTimelineGenerator:
                         reverse=True
                     )
         
-        return organized_data, stats, product_line_stats
+        return organized_data
     
     def version_to_sortable(self, version_str):
         """将版本号转换为可排序的格式"""
@@ -1306,44 +1140,26 @@ class ImprovedTimelineGenerator:
         """生成时间轴HTML文件"""
         try:
             # 获取所有发布数据
-            releases = self.get_all_releases()
+            with stage('load_releases'):
+                releases = self.get_all_releases()
             if not releases:
                 logger.error("没有发布数据，无法生成时间轴")
                 return False
             
             # 处理数据
-            organized_data, stats, product_line_stats = self.process_releases(releases)
-            
-            # 创建Jinja2环境
-            env = Environment(loader=FileSystemLoader('.'))
-            
-            # 添加模板
-            template_content = self.create_template_files()
-            template = env.from_string(template_content)
+            with stage('process_releases'):
+                organized_data, stats, product_line_stats = self.process_releases(releases)
             
             # 找出最新更新日期
-            latest_date = "未知"
-            for release in releases:
-                if release.get('release_date'):
-                    date_str = self.format_date(release['release_date'])
-                    if date_str and date_str != "None":
-                        latest_date = date_str
-                        break
+            latest_date = self.latest_update(releases)
             
             # 渲染模板并保存到文件
-            html_output = template.render(
-                organized_data=organized_data,
-                stats=stats,
-                product_line_stats=product_line_stats,
-                product_line_order=PRODUCT_LINE_ORDER,
-                product_line_labels=PRODUCT_LINE_LABELS,
-                product_line_groups=PRODUCT_LINE_GROUPS,
-                version_type_labels=VERSION_TYPE_LABELS,
-                latest_update=latest_date
-            )
+            with stage('render'):
+                html_output = self.render_html(organized_data, stats, product_line_stats, latest_date)
             
-            with open(self.html_file, 'w', encoding='utf-8') as f:
-                f.write(html_output)
+            with stage('write_html'):
+                with open(self.html_file, 'w', encoding='utf-8') as f:
+                    f.write(html_output)
             
             logger.info(f"时间轴HTML文件已生成: {self.html_file}")
             return True
@@ -1353,12 +1169,97 @@ class ImprovedTimelineGenerator:
             logger.error(traceback.format_exc())
             return False
     
-    def run(self):
-        """运行生成器"""
+    def latest_update(self, releases):
+        """最新一条发布的日期，releases按发布日期降序排列"""
+        for release in releases:
+            if release.get('release_date'):
+                date_str = self.format_date(release['release_date'])
+                if date_str and date_str != "None":
+                    return date_str
+        return "未知"
+    
+    def render_html(self, organized_data, stats, product_line_stats, latest_update):
+        """
+        渲染时间轴HTML
+        
+        Returns:
+            str: HTML内容
+        """
+        # 创建Jinja2环境并添加模板
+        env = Environment(loader=FileSystemLoader('.'))
+        template = env.from_string(self.create_template_files())
+        
+        return template.render(
+            organized_data=organized_data,
+            stats=stats,
+            product_line_stats=product_line_stats,
+            product_line_order=PRODUCT_LINE_ORDER,
+            product_line_labels=PRODUCT_LINE_LABELS,
+            product_line_groups=PRODUCT_LINE_GROUPS,
+            version_type_labels=VERSION_TYPE_LABELS,
+            latest_update=latest_update
+        )
+    
+    def get_stats(self):
+        """
+        获取时间轴统计信息
+        
+        优先读取每轮爬取后汇总的统计文档（O(1)，离线备份中包含release_stats时同样读取）；
+        统计尚未建立时按入库时保存的timeline字段聚合，存在尚未回填该字段的发布时按分类所需的字段分组计数后在本地分类
+        
+        Returns:
+            (stats, product_line_stats)，与生成时间轴时的统计一致
+        """
+        if self.storage is not None:
+            result = self.storage.get_stats()
+        else:
+            doc = self.db[RELEASE_STATS_COLLECTION].find_one({'_id': STATS_DOCUMENT_ID})
+            result = stats_from_document(doc) if doc is not None else None
+        if result is not None:
+            return result
+        
+        analytics = ReleaseAnalytics(self.db[self.collection_name])
+        if analytics.pushdown:
+            result = aggregate_timeline_stats(analytics.source)
+            if result is not None:
+                return result
+        return analytics.timeline_stats(self.classify_release)
+    
+    def print_stats(self):
+        """打印时间轴统计信息"""
+        stats, product_line_stats = self.get_stats()
+        
+        print(f"\n总发布数: {stats['total_releases']}")
+        
+        print("\n----- 产品线 -----")
+        for product_line, count in sorted(stats['product_lines'].items(), key=lambda x: -x[1]):
+            label = PRODUCT_LINE_LABELS.get(product_line, product_line)
+            version_types = ', '.join(f"{vt}: {c}" for vt, c in product_line_stats[product_line].items())
+            print(f"  {label}: {count} ({version_types})")
+        
+        print("\n----- 版本类型 -----")
+        for version_type, count in sorted(stats['version_types'].items(), key=lambda x: -x[1]):
+            print(f"  {VERSION_TYPE_LABELS.get(version_type, version_type)}: {count}")
+        
+        print("\n----- 年份 -----")
+        for year, count in sorted(stats['years'].items(), key=lambda x: str(x[0]), reverse=True):
+            print(f"  {year}: {count}")
+    
+    def run(self, stats_only=False):
+        """
+        运行生成器
+        
+        Args:
+            stats_only: 只打印统计信息，不生成时间轴
+        """
         if not self.connect_db():
             return False
         
         try:
+            if stats_only:
+                self.print_stats()
+                return True
+            
             success = self.generate_timeline()
             if success:
                 logger.info(f"时间轴生成成功，请在浏览器中打开: {self.html_file}")
@@ -1370,11 +1271,60 @@ class ImprovedTimelineGenerator:
             self.close_db()
 
 
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='生成Unifi产品发布时间轴')
+    parser.add_argument('--stats-only', action='store_true', help='只打印统计信息，不生成时间轴')
+    parser.add_argument('--dump', type=str, default=None, help='从mongodump备份目录读取数据（支持gzip），无需运行MongoDB')
+    parser.add_argument('--lock', choices=['file', 'mongo', 'none'], default='file', help='运行锁类型：本地锁文件、MongoDB租约（多台主机共享）或不加锁')
+    parser.add_argument('--wait-lock', action='store_true', help='已有实例在生成时排队等待，而不是直接退出')
+    parser.add_argument('--lock-timeout', type=float, default=0, help='排队等待运行锁的最长时间（秒），0表示一直等待')
+    parser.add_argument('--mongo-monitor', action='store_true', help='记录每条MongoDB命令的耗时、返回文档数和字节数，结束时按查询形状输出汇总')
+    parser.add_argument('--slow-ms', type=float, default=float(os.getenv('MONGO_SLOW_MS', '100')), help='慢操作阈值（毫秒），超过时记录查询形状')
+    parser.add_argument('--profile', action='store_true', help='在cProfile下运行，输出.pstats和折叠栈文件')
+    parser.add_argument('--profile-output', type=str, default='profile/timeline', help='剖析结果文件前缀')
+    parser.add_argument('--profile-stage', action='append', default=[], help='只剖析指定的阶段或方法（load_releases/process_releases/render/write_html或生成器方法名如determine_product_line），可重复指定')
+    parser.add_argument('--memprofile', action='store_true', help='按阶段记录tracemalloc快照，报告内存增量、峰值RSS和主要分配位置')
+    parser.add_argument('--memprofile-output', type=str, default='profile/timeline_memory.json', help='内存剖析JSON报告路径')
+    parser.add_argument('--memprofile-baseline', type=str, help='之前运行的内存剖析报告，结束后输出对比')
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    generator = ImprovedTimelineGenerator()
-    success = generator.run()
+    args = parse_args()
+    generator = ImprovedTimelineGenerator(dump_dir=args.dump)
+    if args.mongo_monitor:
+        COMMAND_MONITOR.enable(args.slow_ms)
+    
+    # 只打印统计时不写文件，无需加锁
+    lock = None if args.stats_only else create_run_lock(args.lock, 'generate_timeline')
+    if lock is not None and not lock.acquire(wait=args.wait_lock, timeout=args.lock_timeout):
+        print("已有时间轴生成任务在运行，本次退出（可使用 --wait-lock 排队等待）")
+        raise SystemExit(1)
+    
+    profiler = None
+    if args.profile or args.profile_stage:
+        profiler = Profiler(args.profile_output, stages=args.profile_stage)
+        profiler.attach(ImprovedTimelineGenerator, classification)
+        profiler.start()
+    
+    memprofiler = None
+    if args.memprofile:
+        memprofiler = MemoryProfiler(args.memprofile_output, baseline_path=args.memprofile_baseline)
+        memprofiler.start()
+    
+    try:
+        success = generator.run(stats_only=args.stats_only)
+    finally:
+        if memprofiler is not None:
+            memprofiler.stop()
+        if profiler is not None:
+            profiler.stop()
+        if lock is not None:
+            lock.release()
+        COMMAND_MONITOR.log_summary()
     
     if not success:
         print("时间轴生成失败，请检查日志获取详细信息。")
-    else:
+    elif not args.stats_only:
         print(f"时间轴生成成功，请在浏览器中打开: {generator.html_file}") 
\ No newline at end of file
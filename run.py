@@ -4,27 +4,27 @@ Ubiquiti产品发布爬虫运行脚本
 基于GraphQL API重构版本
 """
 import os
-import sys
 import time
+import random
+import signal
 import logging
 import argparse
+import threading
 from datetime import datetime
 from dotenv import load_dotenv
 
 from unifi_scraper.graphql_scraper import GraphQLScraper
+from unifi_scraper.storage import MongoStorage
+from unifi_scraper.work_queue import MongoWorkQueue, default_worker_id
+from unifi_scraper.locking import create_run_lock
+from unifi_scraper.logging_setup import setup_logging
+from unifi_scraper.metrics import METRICS
+from unifi_scraper.memprofile import MemoryProfiler
+from unifi_scraper.mongo_monitor import COMMAND_MONITOR
+from unifi_scraper.profiling import Profiler
 from unifi_scraper.utils import clean_crawl_data, send_email
 
 
-# 设置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s [%(levelname)s] %(message)s',
-    handlers=[
-        logging.FileHandler('unifi_scraper.log'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
-
 # 加载环境变量
 load_dotenv()
 
@@ -42,13 +42,245 @@ def parse_args():
     parser.add_argument('--checkpoint', type=str, default='checkpoint.pkl', help='检查点文件路径')
     parser.add_argument('--skip-ssl-verify', action='store_true', help='跳过SSL验证')
     parser.add_argument('--batch-size', type=int, default=50, help='每批次爬取数量')
+    parser.add_argument('--rebuild-stats', action='store_true', help='重新分类全部发布并回填时间轴分类字段后退出')
+    parser.add_argument('--retry-failed', action='store_true', help='只重试之前获取详情失败的发布，不重新获取列表')
+    parser.add_argument('--workers', type=int, default=4, help='重试失败发布时并发获取详情的线程数')
+    parser.add_argument('--budget', type=int, default=0, help='每次运行的详情请求预算，0表示不限制')
+    parser.add_argument('--reverify-limit', type=int, default=50, help='每次运行最多重新校验的已入库发布数量，0表示不重新校验')
+    parser.add_argument('--daemon', action='store_true', help='以守护进程方式运行，按间隔持续增量爬取')
+    parser.add_argument('--interval', type=float, default=300, help='守护进程两次爬取之间的间隔（秒）')
+    parser.add_argument('--jitter', type=float, default=30, help='守护进程间隔的随机抖动上限（秒）')
+    parser.add_argument('--full-every', type=int, default=12, help='守护进程每隔多少轮执行一次完整列表爬取，0表示只做增量爬取')
+    parser.add_argument('--enqueue', action='store_true', help='获取列表，把需要获取详情的发布写入MongoDB工作队列后退出')
+    parser.add_argument('--worker', action='store_true', help='作为工作进程领取队列中的发布并获取详情，队列为空时退出')
+    parser.add_argument('--worker-id', type=str, default=None, help='工作进程标识，默认为主机名-进程号')
+    parser.add_argument('--claim-batch', type=int, default=10, help='工作进程每次领取的发布数量')
+    parser.add_argument('--lease-seconds', type=int, default=300, help='队列租约时长（秒），超时未确认的发布会被重新领取')
+    parser.add_argument('--lock', choices=['file', 'mongo', 'none'], default='file', help='运行锁类型：本地锁文件、MongoDB租约（多台主机共享）或不加锁')
+    parser.add_argument('--lock-file', type=str, default=None, help='锁文件路径，默认为<检查点文件>.lock')
+    parser.add_argument('--wait-lock', action='store_true', help='已有实例在运行时排队等待，而不是直接退出')
+    parser.add_argument('--lock-timeout', type=float, default=0, help='排队等待运行锁的最长时间（秒），0表示一直等待')
+    parser.add_argument('--metrics-file', type=str, default=None, help='运行结束（守护进程为每轮结束）时写入Prometheus textfile，供node_exporter收集')
+    parser.add_argument('--metrics-port', type=int, default=0, help='在本机指定端口提供/metrics接口（适合守护进程），0表示不启动')
+    parser.add_argument('--profile', action='store_true', help='在cProfile下运行，输出.pstats和折叠栈文件')
+    parser.add_argument('--profile-output', type=str, default='profile/run', help='剖析结果文件前缀')
+    parser.add_argument('--profile-stage', action='append', default=[], help='只剖析指定的阶段或方法（fetch_list/list_page/detail_fetch/transform/db_write/checkpoint_save或爬虫/存储的方法名），可重复指定')
+    parser.add_argument('--memprofile', action='store_true', help='按阶段记录tracemalloc快照，报告内存增量、峰值RSS和主要分配位置')
+    parser.add_argument('--memprofile-output', type=str, default='profile/run_memory.json', help='内存剖析JSON报告路径')
+    parser.add_argument('--memprofile-baseline', type=str, help='之前运行的内存剖析报告，结束后输出对比')
+    parser.add_argument('--mongo-monitor', action='store_true', help='记录每条MongoDB命令的耗时、返回文档数和字节数，结束时按查询形状输出汇总')
+    parser.add_argument('--slow-ms', type=float, default=float(os.getenv('MONGO_SLOW_MS', '100')), help='慢操作阈值（毫秒），超过时记录查询形状')
+    parser.add_argument('--log-json', action='store_true', help='日志每行输出一条JSON（写入文件和控制台）')
+    parser.add_argument('--log-interval', type=float, default=30, help='高频日志（每个发布一条）的聚合周期（秒），0表示逐条输出')
+    parser.add_argument('--log-sample', type=int, default=0, help='聚合时每隔多少条抽样输出一条，0表示只输出汇总')
+    parser.add_argument('--refresh-stats', action='store_true', help='只获取列表并批量更新浏览/评论统计，不请求详情')
+    parser.add_argument('--stats-history', action='store_true', help='刷新统计时同时写入release_popularity时间序列集合')
     return parser.parse_args()
 
 
+def rebuild_stats() -> bool:
+    """重新分类全部发布并回填时间轴分类字段"""
+    storage = MongoStorage()
+    if not storage.connect():
+        logging.error("无法连接到MongoDB，统计重建失败")
+        return False
+    
+    try:
+        return storage.rebuild_stats() is not None
+    finally:
+        storage.close()
+
+
+def retry_failed(checkpoint_file: str, workers: int, limit: int) -> bool:
+    """重试死信集合中的失败发布"""
+    scraper = GraphQLScraper(checkpoint_file=checkpoint_file)
+    if not scraper.setup():
+        logging.error("爬虫设置失败，无法连接到MongoDB")
+        return False
+    
+    try:
+        succeeded, failed = scraper.retry_failed(workers=workers, limit=limit)
+        return failed == 0
+    finally:
+        scraper.close()
+
+
+def refresh_stats(checkpoint_file: str, batch_size: int, history: bool) -> bool:
+    """刷新已入库发布的浏览/评论统计"""
+    scraper = GraphQLScraper(checkpoint_file=checkpoint_file)
+    if not scraper.setup():
+        logging.error("爬虫设置失败，无法连接到MongoDB")
+        return False
+    
+    try:
+        return scraper.refresh_stats(batch_size=batch_size, history=history) > 0
+    finally:
+        scraper.close()
+
+
+def run_queue(args) -> bool:
+    """工作队列模式：入队（--enqueue）或作为工作进程处理队列（--worker）"""
+    scraper = GraphQLScraper(checkpoint_file=args.checkpoint)
+    if not scraper.setup():
+        logging.error("爬虫设置失败，无法连接到MongoDB")
+        return False
+    
+    queue = MongoWorkQueue(scraper.storage.db, lease_seconds=args.lease_seconds, storage=scraper.storage)
+    try:
+        if args.enqueue:
+            scraper.enqueue_releases(queue, limit=args.limit, budget=args.budget, reverify_limit=args.reverify_limit)
+            return True
+        
+        succeeded, failed = scraper.work_queue(
+            queue,
+            worker_id=args.worker_id or default_worker_id(),
+            claim_batch=args.claim_batch,
+            workers=args.workers
+        )
+        return failed == 0
+    finally:
+        scraper.close()
+
+
+def regenerate_timeline(db, lock_kind: str = 'file', lock_timeout: float = 0) -> bool:
+    """
+    使用已有的数据库连接重新生成时间轴
+    
+    与generate_timeline.py使用同一个运行锁，避免两者同时写入时间轴文件
+    
+    Args:
+        db: MongoDB数据库
+        lock_kind: 运行锁类型（file/mongo/none）
+        lock_timeout: 排队等待运行锁的最长时间（秒），0表示一直等待
+    """
+    # 延迟导入，避免一次性运行时加载时间轴模板代码
+    from generate_timeline import ImprovedTimelineGenerator
+    
+    lock = create_run_lock(lock_kind, 'generate_timeline')
+    if lock is not None and not lock.acquire(wait=True, timeout=lock_timeout):
+        logging.warning("等待时间轴生成锁超时，本轮不重新生成时间轴")
+        return False
+    
+    try:
+        generator = ImprovedTimelineGenerator()
+        generator.db = db
+        return generator.generate_timeline()
+    finally:
+        if lock is not None:
+            lock.release()
+
+
+def run_daemon(args) -> bool:
+    """
+    守护进程模式：保持爬虫、MongoDB连接和HTTP连接池，按间隔（加随机抖动）重复增量爬取，
+    有新插入或内容变化的发布时重新生成时间轴
+    """
+    scraper = GraphQLScraper(checkpoint_file=args.checkpoint)
+    if not scraper.setup():
+        logging.error("爬虫设置失败，无法连接到MongoDB")
+        return False
+    
+    # 收到SIGTERM/SIGINT时在当前一轮结束后退出
+    stop = threading.Event()
+    
+    def handle_signal(signum, frame):
+        logging.info(f"收到信号 {signum}，当前一轮结束后退出")
+        stop.set()
+    
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+    
+    logging.info(f"守护进程已启动，间隔: {args.interval} 秒，抖动: {args.jitter} 秒")
+    polls = 0
+    try:
+        while not stop.is_set():
+            # 第一轮以及每隔full_every轮获取完整列表，其余只获取列表开头的新发布
+            full = polls == 0 or (args.full_every > 0 and polls % args.full_every == 0)
+            polls += 1
+            
+            start_time = time.time()
+            result = scraper.run_once(
+                limit=args.limit,
+                budget=args.budget,
+                reverify_limit=args.reverify_limit,
+                incremental=not full
+            )
+            logging.info(f"第 {polls} 轮{'完整' if full else '增量'}爬取完成，处理 {result['processed']} 个"
+                         f"（新增 {result['inserted']} 个，内容变化 {result['changed']} 个），用时: {time.time() - start_time:.2f} 秒")
+            
+            # 只刷新了更新时间或浏览/评论数时时间轴不变，不重新生成
+            if result['inserted'] or result['changed']:
+                regenerate_timeline(scraper.storage.db, args.lock, args.lock_timeout)
+            
+            if args.metrics_file:
+                METRICS.write_textfile(args.metrics_file)
+            
+            stop.wait(args.interval + random.uniform(0, args.jitter))
+    finally:
+        scraper.close()
+        logging.info("守护进程已退出")
+    
+    return True
+
+
 def main():
     """主运行函数"""
     # 解析命令行参数
     args = parse_args()
+    setup_logging(json_output=args.log_json, interval=args.log_interval, sample_every=args.log_sample)
+    
+    # 工作进程本来就要并发运行，不加锁；刷新统计只获取列表，与爬取使用不同的锁
+    lock = None
+    if not args.worker:
+        if args.refresh_stats:
+            lock = create_run_lock(args.lock, 'refresh_stats', args.lock_file)
+        else:
+            lock = create_run_lock(args.lock, 'crawl', args.lock_file or f"{args.checkpoint}.lock")
+    
+    if lock is not None and not lock.acquire(wait=args.wait_lock, timeout=args.lock_timeout):
+        logging.error("已有实例在运行，本次退出（可使用 --wait-lock 排队等待）")
+        return False
+    
+    metrics_server = METRICS.start_http_server(args.metrics_port) if args.metrics_port else None
+    
+    if args.mongo_monitor:
+        COMMAND_MONITOR.enable(args.slow_ms)
+    
+    profiler = None
+    if args.profile or args.profile_stage:
+        profiler = Profiler(args.profile_output, stages=args.profile_stage)
+        profiler.attach(GraphQLScraper, MongoStorage)
+        profiler.start()
+    
+    memprofiler = None
+    if args.memprofile:
+        memprofiler = MemoryProfiler(args.memprofile_output, baseline_path=args.memprofile_baseline)
+        memprofiler.start()
+    
+    try:
+        return run(args)
+    finally:
+        if memprofiler is not None:
+            memprofiler.stop()
+        if profiler is not None:
+            profiler.stop()
+        if lock is not None:
+            lock.release()
+        if metrics_server is not None:
+            metrics_server.shutdown()
+        
+        # 输出各阶段的耗时汇总，便于发现瓶颈
+        if METRICS.histograms:
+            logging.info("各阶段统计:\n" + METRICS.summary_table())
+        COMMAND_MONITOR.log_summary()
+        if args.metrics_file:
+            METRICS.write_textfile(args.metrics_file)
+
+
+def run(args):
+    """按命令行参数执行对应的任务"""
+    if args.rebuild_stats:
+        return rebuild_stats()
     
     # 设置环境变量
     if args.skip_ssl_verify:
@@ -57,6 +289,18 @@ def main():
     # 检查点文件路径
     checkpoint_file = args.checkpoint
     
+    if args.retry_failed:
+        return retry_failed(checkpoint_file, args.workers, args.limit)
+    
+    if args.refresh_stats:
+        return refresh_stats(checkpoint_file, args.batch_size, args.stats_history)
+    
+    if args.daemon:
+        return run_daemon(args)
+    
+    if args.enqueue or args.worker:
+        return run_queue(args)
+    
     # 如果指定了清除数据，则清除检查点
     if args.clean:
         clean_crawl_data(checkpoint_file)
@@ -75,7 +319,7 @@ def main():
             return False
         
         # 执行爬取
-        success = scraper.scrape(limit=args.limit)
+        success = scraper.scrape(limit=args.limit, budget=args.budget, reverify_limit=args.reverify_limit)
         
         # 计算运行时间
         duration = time.time() - start_time
@@ -0,0 +1,7 @@
+"""
+pytest配置：把项目根目录加入导入路径，使测试可以直接导入unifi_scraper
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
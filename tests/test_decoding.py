@@ -0,0 +1,99 @@
+"""
+GraphQL响应解码测试：所有可用的解码后端对同一响应应返回相同结果
+"""
+import json
+
+import pytest
+
+from unifi_scraper.decoding import BACKENDS, ResponseDecoder, to_builtins
+
+
+LIST_ITEM = {
+    "id": "r1",
+    "slug": "unifi-network-application-9-0-100",
+    "title": "UniFi Network Application 9.0.100",
+    "version": "9.0.100",
+    "stage": "GA",
+    "createdAt": "2025-01-02T03:04:05Z",
+    "tags": ["network"],
+    "stats": {"comments": 3, "views": 120},
+}
+
+DETAIL = {
+    "id": "r1",
+    "stage": "GA",
+    "improvements": [{"type": "text", "content": "改进"}],
+    "links": [{"url": "https://example.com/a.bin", "title": "固件"}],
+}
+
+LIST_RESPONSES = {
+    "items": {"data": {"releases": {"items": [LIST_ITEM]}}},
+    "empty_items": {"data": {"releases": {"items": []}}},
+    "null_items": {"data": {"releases": {"items": None}}},
+    "null_releases": {"data": {"releases": None}},
+    "null_data": {"data": None},
+    "no_data": {},
+    "empty_errors": {"errors": [], "data": {"releases": {"items": [LIST_ITEM]}}},
+    "null_errors": {"errors": None, "data": {"releases": {"items": [LIST_ITEM]}}},
+    "errors": {"errors": [{"message": "boom"}], "data": None},
+}
+
+DETAIL_RESPONSES = {
+    "release": {"data": {"release": DETAIL}},
+    "null_release": {"data": {"release": None}},
+    "null_data": {"data": None},
+    "no_data": {},
+    "empty_errors": {"errors": [], "data": {"release": DETAIL}},
+    "null_errors": {"errors": None, "data": {"release": DETAIL}},
+    "errors": {"errors": [{"message": "not found"}], "data": None},
+}
+
+
+def _decode_all(method, payload):
+    """用每个后端解码同一响应，返回{后端: 转为内置类型的结果}"""
+    content = json.dumps(payload).encode()
+    results = {}
+    for backend in BACKENDS:
+        value, errors = getattr(ResponseDecoder(backend), method)(content)
+        results[backend] = (to_builtins(value), errors)
+    return results
+
+
+@pytest.mark.parametrize("case", sorted(LIST_RESPONSES))
+def test_decode_releases_backends_agree(case):
+    results = _decode_all("decode_releases", LIST_RESPONSES[case])
+    expected = results["json"]
+    for backend, result in results.items():
+        assert result == expected, backend
+
+
+@pytest.mark.parametrize("case", sorted(DETAIL_RESPONSES))
+def test_decode_release_detail_backends_agree(case):
+    results = _decode_all("decode_release_detail", DETAIL_RESPONSES[case])
+    expected = results["json"]
+    for backend, result in results.items():
+        assert result == expected, backend
+
+
+def test_decode_releases_values():
+    decoder = ResponseDecoder("json")
+    items, errors = decoder.decode_releases(json.dumps(LIST_RESPONSES["items"]).encode())
+    assert items == [LIST_ITEM] and errors is None
+
+    items, errors = decoder.decode_releases(json.dumps(LIST_RESPONSES["null_releases"]).encode())
+    assert items == [] and errors is None
+
+    items, errors = decoder.decode_releases(json.dumps(LIST_RESPONSES["errors"]).encode())
+    assert items == [] and errors == [{"message": "boom"}]
+
+
+def test_decode_release_detail_values():
+    decoder = ResponseDecoder("json")
+    release, errors = decoder.decode_release_detail(json.dumps(DETAIL_RESPONSES["release"]).encode())
+    assert release == DETAIL and errors is None
+
+    release, errors = decoder.decode_release_detail(json.dumps(DETAIL_RESPONSES["null_data"]).encode())
+    assert release is None and errors is None
+
+    release, errors = decoder.decode_release_detail(json.dumps(DETAIL_RESPONSES["errors"]).encode())
+    assert release is None and errors == [{"message": "not found"}]
@@ -0,0 +1,249 @@
+"""
+爬虫测试：调度顺序、分页漂移重新定位、列表分页进度的保存与恢复、保存结果
+
+全部使用MemoryStorage和模拟的列表接口，不需要MongoDB和网络
+"""
+import os
+import pickle
+from datetime import datetime, timedelta
+
+import pytest
+
+from unifi_scraper.graphql_scraper import GraphQLScraper
+from unifi_scraper.memory_storage import MemoryStorage
+from unifi_scraper.models import UnifiRelease
+from unifi_scraper.scheduler import ACTIVE, NEW, REVERIFY, CrawlScheduler
+from unifi_scraper.storage import SAVE_CHANGED, SAVE_INSERTED, SAVE_UNCHANGED, save_outcome
+
+
+NOW = datetime(2025, 6, 1, 12, 0, 0)
+
+
+def make_release(release_id, **fields):
+    release = UnifiRelease()
+    release.release_id = release_id
+    release.product_name = 'UniFi Network Application'
+    release.version = '9.0.100'
+    release.release_notes = '改进'
+    for name, value in fields.items():
+        setattr(release, name, value)
+    return release
+
+
+class FakeList:
+    """模拟按offset分页的发布列表，after_call可在指定次数的请求后修改列表"""
+
+    def __init__(self, count, fail_after=None):
+        self.releases = [{'id': f"r{index}", 'title': f"Release {index}"} for index in range(count)]
+        self.calls = 0
+        self.fail_after = fail_after
+        self.hooks = {}
+
+    def __call__(self, offset, limit):
+        if self.fail_after is not None and self.calls >= self.fail_after:
+            return [], False
+        self.calls += 1
+        page = [dict(item) for item in self.releases[offset:offset + limit]]
+        hook = self.hooks.get(self.calls)
+        if hook is not None:
+            hook(self.releases)
+        return page, True
+
+
+@pytest.fixture
+def make_scraper(tmp_path, monkeypatch):
+    def factory(fake_list, page_overlap=1, storage=None):
+        monkeypatch.setenv('PAGE_OVERLAP', str(page_overlap))
+        monkeypatch.setenv('LIST_MAX_RETRIES', '0')
+        scraper = GraphQLScraper(checkpoint_file=str(tmp_path / 'checkpoint.pkl'), storage=storage or MemoryStorage())
+        scraper._fetch_releases_batch = fake_list
+        return scraper
+    return factory
+
+
+def _ids(items):
+    return [item['id'] for item in items]
+
+
+# ---------------------------------------------------------------- 调度顺序
+
+def test_scheduler_orders_new_active_then_reverify():
+    storage = MemoryStorage()
+    storage.save_release(make_release('active', last_activity_at='2025-05-01T00:00:00Z', last_updated=NOW))
+    storage.save_release(make_release('stale', last_activity_at='2025-01-01T00:00:00Z',
+                                      last_updated=NOW - timedelta(days=200)))
+    storage.save_release(make_release('older-stale', last_activity_at='2025-01-01T00:00:00Z',
+                                      last_updated=NOW - timedelta(days=120)))
+    storage.save_release(make_release('fresh', last_activity_at='2025-05-01T00:00:00Z', last_updated=NOW))
+
+    items = [
+        {'id': 'stale', 'createdAt': '2024-01-01T00:00:00Z', 'lastActivityAt': '2025-01-01T00:00:00Z'},
+        {'id': 'new-old', 'createdAt': '2025-05-01T00:00:00Z'},
+        {'id': 'active', 'createdAt': '2025-04-01T00:00:00Z', 'lastActivityAt': '2025-05-30T00:00:00Z'},
+        {'id': 'fresh', 'createdAt': '2025-04-01T00:00:00Z', 'lastActivityAt': '2025-05-01T00:00:00Z'},
+        {'id': 'new-recent', 'createdAt': '2025-05-30T00:00:00Z'},
+        {'id': 'older-stale', 'createdAt': '2024-01-01T00:00:00Z', 'lastActivityAt': '2025-01-01T00:00:00Z'},
+    ]
+    processed_ids = {'active', 'stale', 'older-stale', 'fresh'}
+
+    plan = CrawlScheduler().plan(items, processed_ids, storage.get_crawl_state(), now=NOW)
+
+    assert [(item['id'], reason) for item, reason in plan] == [
+        ('new-recent', NEW),
+        ('new-old', NEW),
+        ('active', ACTIVE),
+        ('stale', REVERIFY),
+        ('older-stale', REVERIFY),
+    ]
+
+
+def test_scheduler_budget_and_reverify_limit():
+    storage = MemoryStorage()
+    storage.save_release(make_release('stale', last_updated=NOW - timedelta(days=200)))
+    items = [
+        {'id': 'stale', 'createdAt': '2024-01-01T00:00:00Z'},
+        {'id': 'new-1', 'createdAt': '2025-05-02T00:00:00Z'},
+        {'id': 'new-2', 'createdAt': '2025-05-01T00:00:00Z'},
+    ]
+    state = storage.get_crawl_state()
+
+    plan = CrawlScheduler(budget=2).plan(items, {'stale'}, state, now=NOW)
+    assert [item['id'] for item, _ in plan] == ['new-1', 'new-2']
+
+    plan = CrawlScheduler(reverify_limit=0).plan(items, {'stale'}, state, now=NOW)
+    assert [reason for _, reason in plan] == [NEW, NEW]
+
+
+# ---------------------------------------------------------------- 分页漂移
+
+def test_fetch_list_without_drift(make_scraper):
+    scraper = make_scraper(FakeList(10))
+
+    items = scraper.fetch_all_releases(batch_size=3)
+
+    assert _ids(items) == [f"r{index}" for index in range(10)]
+    assert scraper.list_drift == GraphQLScraper._new_drift_stats()
+
+
+def test_reanchor_after_insertion(make_scraper):
+    fake = FakeList(10)
+    # 第一页之后列表开头新增了一个发布，后面的页整体后移
+    fake.hooks[1] = lambda releases: releases.insert(0, {'id': 'inserted'})
+    scraper = make_scraper(fake)
+
+    items = scraper.fetch_all_releases(batch_size=3)
+
+    assert _ids(items) == [f"r{index}" for index in range(10)]
+    assert scraper.list_drift['inserted_shift'] == 1
+    assert scraper.list_drift['anchor_lost'] == 0
+
+
+def test_reanchor_after_removal_recovers_skipped_items(make_scraper):
+    fake = FakeList(12)
+    # 第二页之后删除了两个已获取的发布，后面的页整体前移，锚点落到本页之前，需要回退重新获取
+    fake.hooks[2] = lambda releases: releases.__delitem__(slice(1, 3))
+    scraper = make_scraper(fake, page_overlap=1)
+
+    items = scraper.fetch_all_releases(batch_size=3)
+
+    assert _ids(items) == [f"r{index}" for index in range(12)]
+    assert scraper.list_drift['removed_shift'] > 0
+    assert scraper.list_drift['recovered'] > 0
+    assert scraper.list_drift['anchor_lost'] == 0
+
+
+def test_no_reanchor_when_overlap_disabled(make_scraper):
+    fake = FakeList(10)
+    fake.hooks[1] = lambda releases: releases.insert(0, {'id': 'inserted'})
+    scraper = make_scraper(fake, page_overlap=0)
+
+    items = scraper.fetch_all_releases(batch_size=3)
+
+    # 不重叠时不检测漂移，插入导致的重复条目仍会被去重
+    assert _ids(items) == [f"r{index}" for index in range(10)]
+    assert scraper.list_drift['inserted_shift'] == 0
+    assert scraper.list_drift['anchor_lost'] == 0
+    assert scraper.list_drift['duplicates'] == 1
+
+
+# ---------------------------------------------------------------- 列表分页进度
+
+def test_list_journal_checkpoint_and_restore(make_scraper, tmp_path):
+    first = make_scraper(FakeList(10, fail_after=3))
+
+    partial = first.fetch_all_releases(batch_size=3)
+
+    assert _ids(partial) == [f"r{index}" for index in range(9)]
+    with open(first.checkpoint_file, 'rb') as f:
+        checkpoint = pickle.load(f)
+    # 检查点只记录分页位置和条目数，列表项在列表文件中
+    assert checkpoint['list_state']['items_count'] == 9
+    assert checkpoint['list_state']['offset'] == 9
+    assert 'items' not in checkpoint['list_state']
+    assert os.path.exists(first.list_journal_file)
+
+    resumed = make_scraper(FakeList(10))
+    assert resumed.list_state['offset'] == 9
+    assert _ids(resumed.list_state['items']) == _ids(partial)
+
+    items = resumed.fetch_all_releases(batch_size=3)
+
+    assert _ids(items) == [f"r{index}" for index in range(10)]
+    assert resumed.list_state is None
+    assert not os.path.exists(resumed.list_journal_file)
+
+
+def test_incomplete_list_journal_refetches(make_scraper):
+    first = make_scraper(FakeList(10, fail_after=3))
+    first.fetch_all_releases(batch_size=3)
+    os.remove(first.list_journal_file)
+
+    resumed = make_scraper(FakeList(10))
+
+    assert resumed.list_state is None
+
+
+# ---------------------------------------------------------------- 保存结果
+
+def test_save_outcomes():
+    storage = MemoryStorage()
+    created_at = datetime(2025, 1, 1)
+
+    assert storage.save_release(make_release('r1', created_at=created_at)) == SAVE_INSERTED
+    # 只有浏览/评论数和更新时间变化
+    assert storage.save_release(make_release('r1', views=10, comments=2, last_updated=NOW)) == SAVE_UNCHANGED
+    assert storage.save_release(make_release('r1', release_notes='修复')) == SAVE_CHANGED
+    # 创建时间只在首次插入时写入
+    assert storage.get_release('r1').created_at == created_at
+
+
+def test_save_outcome_ignores_backfilled_timeline():
+    release = make_release('r1').to_dict()
+    legacy = dict(release)
+    release['timeline'] = {'merge_key': 'r1'}
+
+    # 引入timeline字段之前保存的文档只回填分类，不算内容变化
+    assert save_outcome(legacy, release) == SAVE_UNCHANGED
+    assert save_outcome({**legacy, 'timeline': {'merge_key': 'old'}}, release) == SAVE_CHANGED
+
+
+def test_memory_storage_legacy_document_is_unchanged():
+    release = make_release('r1')
+    legacy = release.to_dict()
+    storage = MemoryStorage()
+    storage.releases['r1'] = legacy
+
+    assert storage.save_release(release) == SAVE_UNCHANGED
+    assert 'timeline' in storage.releases['r1']
+
+
+def test_scraper_counts_save_outcomes(make_scraper):
+    storage = MemoryStorage()
+    scraper = make_scraper(FakeList(0), storage=storage)
+
+    scraper.save_processed_release(make_release('r1'))
+    scraper.save_processed_release(make_release('r1', views=5))
+    scraper.save_processed_release(make_release('r2'))
+
+    assert scraper.save_outcomes == {SAVE_INSERTED: 2, SAVE_UNCHANGED: 1}
+    assert scraper.processed_ids == {'r1', 'r2'}
@@ -0,0 +1,137 @@
+"""
+MongoWorkQueue租约测试：领取、续约、确认以及租约多次过期后的失败处理
+
+使用mongomock模拟MongoDB，服务器时间由测试控制
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+from unifi_scraper.memory_storage import MemoryStorage
+from unifi_scraper.work_queue import DONE, FAILED, LEASED, PENDING, MongoWorkQueue
+
+
+START = datetime(2025, 1, 1, 12, 0, 0)
+
+
+class Clock:
+    """可手动推进的服务器时钟"""
+
+    def __init__(self):
+        self.now = START
+
+    def advance(self, seconds: float) -> None:
+        self.now += timedelta(seconds=seconds)
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def storage():
+    return MemoryStorage()
+
+
+@pytest.fixture
+def queue(clock, storage, monkeypatch):
+    db = mongomock.MongoClient().db
+    queue = MongoWorkQueue(db, lease_seconds=60, max_attempts=2, storage=storage)
+    monkeypatch.setattr(queue, '_now', lambda: clock.now)
+    return queue
+
+
+def _items(*ids):
+    return [{'id': release_id, 'title': f"Release {release_id}"} for release_id in ids]
+
+
+def test_claim_orders_by_priority_then_enqueue_time(queue, clock):
+    queue.enqueue(_items('a', 'b'), priority=1)
+    clock.advance(1)
+    queue.enqueue(_items('c'), priority=0)
+
+    claimed = queue.claim('w1', batch_size=10)
+
+    assert [doc['_id'] for doc in claimed] == ['c', 'a', 'b']
+    assert all(doc['status'] == LEASED and doc['lease_owner'] == 'w1' for doc in claimed)
+    assert all(doc['attempts'] == 1 for doc in claimed)
+    assert queue.claim('w2') == []
+
+
+def test_claim_respects_batch_size(queue):
+    queue.enqueue(_items('a', 'b', 'c'))
+
+    assert len(queue.claim('w1', batch_size=2)) == 2
+    assert [doc['_id'] for doc in queue.claim('w2', batch_size=2)] == ['c']
+
+
+def test_enqueue_skips_leased_items(queue):
+    queue.enqueue(_items('a'))
+    queue.claim('w1')
+
+    assert queue.enqueue(_items('a', 'b')) == 1
+    assert queue.counts()[LEASED] == 1
+    assert queue.counts()[PENDING] == 1
+
+
+def test_renew_keeps_lease_from_being_reclaimed(queue, clock):
+    queue.enqueue(_items('a'))
+    queue.claim('w1')
+
+    clock.advance(50)
+    assert queue.renew('w1') == 1
+    clock.advance(50)
+    assert queue.claim('w2') == []
+
+    clock.advance(61)
+    reclaimed = queue.claim('w2')
+    assert [doc['_id'] for doc in reclaimed] == ['a']
+    assert reclaimed[0]['lease_owner'] == 'w2'
+    assert reclaimed[0]['attempts'] == 2
+
+
+def test_ack_only_by_lease_owner(queue, clock):
+    queue.enqueue(_items('a'))
+    queue.claim('w1')
+    clock.advance(61)
+    queue.claim('w2')
+
+    assert queue.ack('a', 'w1') is False
+    assert queue.ack('a', 'w2') is True
+    assert queue.counts()[DONE] == 1
+    assert queue.claim('w3') == []
+
+
+def test_fail_requeues_until_attempts_exhausted(queue):
+    queue.enqueue(_items('a'))
+    queue.claim('w1')
+    queue.fail('a', 'w1', 'boom', attempts=1)
+    assert queue.counts()[PENDING] == 1
+
+    doc = queue.claim('w1')[0]
+    queue.fail('a', 'w1', 'boom', attempts=doc['attempts'])
+    assert queue.counts()[FAILED] == 1
+    assert queue.claim('w1') == []
+
+
+def test_exhausted_leases_are_failed_and_dead_lettered(queue, clock, storage):
+    queue.enqueue(_items('a', 'b'))
+    for _ in range(2):
+        queue.claim('w1')
+        clock.advance(61)
+
+    assert queue.claim('w2') == []
+    counts = queue.counts()
+    assert counts[FAILED] == 2 and counts[LEASED] == 0
+
+    failures = {failure['release_id']: failure for failure in storage.get_failed_releases()}
+    assert set(failures) == {'a', 'b'}
+    assert failures['a']['error_class'] == 'LeaseExpired'
+    assert failures['a']['item'] == {'id': 'a', 'title': 'Release a'}
+
+    # 已标记为失败的发布不会被重复记录
+    queue.claim('w3')
+    assert all(failure['attempts'] == 1 for failure in storage.get_failed_releases())
@@ -0,0 +1,275 @@
+"""
+数据分析累加器模块
+每种分析实现为一个累加器，由单次流式遍历逐条喂入发布文档，避免把全部数据载入内存
+"""
+import json
+import logging
+from collections import defaultdict, Counter
+from typing import Dict, Any, Iterable, List, Optional, Set
+
+
+logger = logging.getLogger(__name__)
+
+
+def parse_tags(tags_value: Any) -> Optional[Any]:
+    """
+    解析发布文档中的tags字段
+
+    Args:
+        tags_value: tags字段原始值（JSON字符串或列表）
+
+    Returns:
+        解析后的值，无法解析时返回None
+    """
+    if isinstance(tags_value, list):
+        return tags_value
+
+    try:
+        return json.loads(tags_value)
+    except (json.JSONDecodeError, TypeError):
+        logger.warning(f"无法解析tags: {tags_value}")
+        return None
+
+
+class Accumulator:
+    """
+    分析累加器基类
+
+    子类声明所需字段（用于查询投影），并在add中累计单条文档的贡献。
+    facets把fields拆分为互相独立的字段组：单条文档的贡献等于各字段组部分贡献之和，
+    因此可以按字段组的不同取值分组计数后，以带权重的部分文档喂入，结果与逐条累计一致
+    """
+
+    # 结果在分析报告中的键名
+    name: str = ''
+    # 分析所需的文档字段
+    fields: tuple = ()
+
+    @property
+    def facets(self) -> tuple:
+        """可独立分组计数的字段组，默认所有字段作为一组"""
+        return (self.fields,)
+
+    def add(self, release: Dict[str, Any], tags: Optional[Any], weight: int = 1) -> None:
+        """
+        累计一条发布文档
+
+        Args:
+            release: 发布文档（可能只包含投影字段）
+            tags: 已解析的tags字段，解析失败时为None
+            weight: 该文档代表的记录数
+        """
+        raise NotImplementedError
+
+    def result(self) -> Any:
+        """返回分析结果"""
+        raise NotImplementedError
+
+
+class FieldValuesAccumulator(Accumulator):
+    """字段值分布"""
+
+    def __init__(self, field_name: str):
+        self.name = field_name
+        self.fields = (field_name,)
+        self.value_counts = Counter()
+
+    def add(self, release, tags, weight=1):
+        value = release.get(self.name, None)
+        if value is not None:
+            self.value_counts[str(value)] += weight
+
+    def result(self):
+        return self.value_counts
+
+
+class TagsAccumulator(Accumulator):
+    """tags字段分析"""
+
+    name = 'tags_analysis'
+    fields = ('tags',)
+
+    def __init__(self):
+        self.total_tags = 0
+        self.tag_counts = Counter()
+        self.tags_per_release = Counter()
+
+    def add(self, release, tags, weight=1):
+        if isinstance(tags, list):
+            self.tags_per_release[len(tags)] += weight
+            self.total_tags += len(tags) * weight
+            for tag in tags:
+                self.tag_counts[tag] += weight
+
+    def result(self):
+        return {
+            'unique_tags': len(self.tag_counts),
+            'total_tags': self.total_tags,
+            'tags_per_release': dict(self.tags_per_release),
+            'most_common_tags': self.tag_counts.most_common(50)
+        }
+
+
+def _name_prefix(text: str) -> Optional[str]:
+    """取前两个单词作为可能的前缀"""
+    words = text.split()
+    if len(words) >= 2:
+        return ' '.join(words[:2])
+    elif len(words) == 1:
+        return words[0]
+    return None
+
+
+class ProductLinePatternsAccumulator(Accumulator):
+    """识别可能的产品线模式"""
+
+    name = 'product_line_patterns'
+    fields = ('tags', 'product_name')
+    facets = (('tags',), ('product_name',))
+
+    def __init__(self):
+        self.tag_prefixes = Counter()
+        self.product_name_prefixes = Counter()
+
+    def add(self, release, tags, weight=1):
+        # 分析tags字段中的常见前缀
+        if isinstance(tags, list):
+            for tag in tags:
+                prefix = _name_prefix(str(tag))
+                if prefix is not None:
+                    self.tag_prefixes[prefix] += weight
+
+        # 分析product_name字段
+        product_name = release.get('product_name', '')
+        if product_name:
+            prefix = _name_prefix(product_name)
+            if prefix is not None:
+                self.product_name_prefixes[prefix] += weight
+
+    def result(self):
+        return {
+            'tag_prefixes': self.tag_prefixes.most_common(20),
+            'product_name_prefixes': self.product_name_prefixes.most_common(20)
+        }
+
+
+class VersionDistributionAccumulator(Accumulator):
+    """版本号分布"""
+
+    name = 'version_distribution'
+    fields = ('version',)
+
+    def __init__(self):
+        self.version_counts = Counter()
+        self.version_patterns = Counter()
+
+    def add(self, release, tags, weight=1):
+        version = release.get('version', '')
+        if version:
+            self.version_counts[version] += weight
+
+            # 识别版本模式 (x.y.z, vx.y 等)
+            pattern = ''.join('n' if char.isdigit() else char for char in version)
+            self.version_patterns[pattern] += weight
+
+    def result(self):
+        return {
+            'unique_versions': len(self.version_counts),
+            'most_common_versions': self.version_counts.most_common(20),
+            'version_patterns': self.version_patterns.most_common(10)
+        }
+
+
+class ProductLineCandidatesAccumulator(Accumulator):
+    """可能的产品线字段"""
+
+    name = 'product_line_candidates'
+    candidate_fields = ('product_name', 'firmware_type', 'stage')
+    fields = candidate_fields + ('tags',)
+    facets = tuple((field,) for field in fields)
+    keywords = ('unifi', 'edgemax', 'airmax', 'amplifi')
+
+    def __init__(self):
+        self.product_lines = defaultdict(Counter)
+
+    def add(self, release, tags, weight=1):
+        for field in self.candidate_fields:
+            value = release.get(field, '')
+            if value:
+                self.product_lines[field][value] += weight
+
+        # 分析tags字段中的可能产品线
+        if isinstance(tags, list) and len(tags) > 0:
+            # 假设第一个标签可能是产品线
+            self.product_lines['first_tag'][tags[0]] += weight
+
+            # 检查包含特定关键词的标签
+            for tag in tags:
+                if any(keyword in tag.lower() for keyword in self.keywords):
+                    self.product_lines['keyword_in_tag'][tag] += weight
+
+    def result(self):
+        # 保持字段在报告中的固定顺序，与逐字段分析时一致
+        order = self.candidate_fields + ('first_tag', 'keyword_in_tag')
+        return {
+            field: {
+                'unique_values': len(self.product_lines[field]),
+                'most_common': self.product_lines[field].most_common(20)
+            }
+            for field in order
+            if field in self.product_lines
+        }
+
+
+def projection_for(accumulators: Iterable[Accumulator]) -> Dict[str, int]:
+    """
+    计算一组累加器所需字段的查询投影
+
+    Args:
+        accumulators: 累加器列表
+
+    Returns:
+        MongoDB投影字典
+    """
+    fields: Set[str] = set()
+    for accumulator in accumulators:
+        fields.update(accumulator.fields)
+
+    projection = {field: 1 for field in sorted(fields)}
+    projection['_id'] = 0
+    return projection
+
+
+def run_accumulators(releases: Iterable[Dict[str, Any]], accumulators: List[Accumulator]) -> int:
+    """
+    单次遍历发布文档，依次喂给所有累加器
+
+    Args:
+        releases: 发布文档迭代器（如MongoDB游标）
+        accumulators: 累加器列表
+
+    Returns:
+        遍历的文档数量
+    """
+    needs_tags = any('tags' in accumulator.fields for accumulator in accumulators)
+    count = 0
+
+    for release in releases:
+        # 每条文档的tags只解析一次
+        tags = parse_tags(release.get('tags', '[]')) if needs_tags else None
+        for accumulator in accumulators:
+            accumulator.add(release, tags)
+        count += 1
+
+    return count
+
+
+def default_accumulators() -> List[Accumulator]:
+    """创建analyze_db_data默认使用的累加器"""
+    common_fields = ['product_name', 'version', 'firmware_type', 'stage', 'is_beta']
+    return [FieldValuesAccumulator(field) for field in common_fields] + [
+        TagsAccumulator(),
+        ProductLinePatternsAccumulator(),
+        VersionDistributionAccumulator(),
+        ProductLineCandidatesAccumulator(),
+    ]
@@ -0,0 +1,238 @@
+"""
+数据统计模块
+在MongoDB集合上用聚合管道把计数下推到服务端，只把分组后的小结果集传回客户端；
+其它数据源（文档列表、游标等）在Python中按同样的分组方式计算，结果一致
+"""
+import logging
+from collections import defaultdict, Counter
+from datetime import datetime
+from typing import Dict, Any, List, Tuple, Callable
+
+from pymongo.collection import Collection
+
+from .accumulators import Accumulator, parse_tags
+
+
+# 时间轴分类依赖的字段
+TIMELINE_FIELDS = ('tags', 'product_name', 'firmware_type', 'version', 'stage', 'is_beta', 'group_id')
+
+
+def _freeze(value: Any) -> Any:
+    """把字段值转换为可哈希的分组键"""
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    return value
+
+
+def _year_prefix(release_date: Any) -> str:
+    """取发布日期的前4个字符，用于按年份分组（与聚合管道中的表达式一致）"""
+    if isinstance(release_date, datetime):
+        return release_date.isoformat()[:4]
+    if isinstance(release_date, str):
+        return release_date[:4]
+    return ''
+
+
+class ReleaseAnalytics:
+    """
+    发布数据统计
+
+    数据源是MongoDB集合时使用聚合管道（$group/$facet），否则把数据源当作文档迭代器在Python中计算
+    """
+
+    def __init__(self, source: Any):
+        """
+        初始化统计
+
+        Args:
+            source: MongoDB集合，或可迭代的发布文档
+        """
+        self.source = source
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def pushdown(self) -> bool:
+        """是否可以把计算下推到MongoDB"""
+        return isinstance(self.source, Collection)
+
+    def grouped_counts(self, facets: List[Tuple[str, ...]]) -> Tuple[Dict[Tuple[str, ...], List[Tuple[Dict[str, Any], int]]], int]:
+        """
+        按多组字段分别分组计数
+
+        Args:
+            facets: 字段组列表
+
+        Returns:
+            ({字段组: [(分组取值, 文档数), ...]}, 文档总数)
+        """
+        if self.pushdown:
+            return self._grouped_counts_pipeline(facets)
+        return self._grouped_counts_python(facets)
+
+    def _grouped_counts_pipeline(self, facets):
+        """使用$facet在一次聚合中完成所有字段组的分组计数"""
+        facet_stages = {
+            f"f{index}": [
+                {'$group': {'_id': {field: f"${field}" for field in facet}, 'count': {'$sum': 1}}}
+            ]
+            for index, facet in enumerate(facets)
+        }
+        facet_stages['total'] = [{'$count': 'count'}]
+
+        pipeline = [
+            {'$project': {field: 1 for facet in facets for field in facet}},
+            {'$facet': facet_stages}
+        ]
+        result = next(self.source.aggregate(pipeline, allowDiskUse=True), {})
+
+        grouped = {
+            facet: [(row['_id'], row['count']) for row in result.get(f"f{index}", [])]
+            for index, facet in enumerate(facets)
+        }
+        total_rows = result.get('total', [])
+        total = total_rows[0]['count'] if total_rows else 0
+        return grouped, total
+
+    def _grouped_counts_python(self, facets):
+        """单次遍历文档，在Python中完成分组计数"""
+        counters = {facet: Counter() for facet in facets}
+        samples = {facet: {} for facet in facets}
+        total = 0
+
+        for release in self.source:
+            total += 1
+            for facet in facets:
+                row = {field: release[field] for field in facet if field in release}
+                key = _freeze(row)
+                counters[facet][key] += 1
+                samples[facet].setdefault(key, row)
+
+        grouped = {
+            facet: [(samples[facet][key], count) for key, count in counters[facet].items()]
+            for facet in facets
+        }
+        return grouped, total
+
+    def run_accumulators(self, accumulators: List[Accumulator]) -> int:
+        """
+        按字段组分组计数，并把带权重的分组结果喂给累加器
+
+        Args:
+            accumulators: 累加器列表
+
+        Returns:
+            统计的文档数量
+        """
+        facets = []
+        for accumulator in accumulators:
+            for facet in accumulator.facets:
+                if facet not in facets:
+                    facets.append(facet)
+
+        grouped, total = self.grouped_counts(facets)
+        self.logger.info(f"分组统计完成，{total} 条文档归并为 {sum(len(rows) for rows in grouped.values())} 个分组")
+
+        for facet in facets:
+            rows = grouped[facet]
+            # 每个不同的tags取值只解析一次
+            if 'tags' in facet:
+                parsed = [parse_tags(row.get('tags', '[]')) for row, _ in rows]
+            else:
+                parsed = [None] * len(rows)
+
+            for accumulator in accumulators:
+                if facet not in accumulator.facets:
+                    continue
+                for (row, count), tags in zip(rows, parsed):
+                    accumulator.add(row, tags, weight=count)
+
+        return total
+
+    def timeline_rows(self) -> List[Tuple[Dict[str, Any], int]]:
+        """
+        按时间轴分类依赖的字段和发布年份分组计数
+
+        Returns:
+            [(分组取值, 文档数), ...]，分组取值中的release_date为日期的前4个字符
+        """
+        if self.pushdown:
+            group_id = {field: f"${field}" for field in TIMELINE_FIELDS}
+            group_id['release_date'] = {
+                '$cond': [
+                    {'$in': [{'$type': '$release_date'}, ['string', 'date']]},
+                    {'$substrCP': [{'$toString': '$release_date'}, 0, 4]},
+                    ''
+                ]
+            }
+            pipeline = [{'$group': {'_id': group_id, 'count': {'$sum': 1}}}]
+            return [(row['_id'], row['count']) for row in self.source.aggregate(pipeline, allowDiskUse=True)]
+
+        counter = Counter()
+        samples = {}
+        for release in self.source:
+            row = {field: release[field] for field in TIMELINE_FIELDS if field in release}
+            row['release_date'] = _year_prefix(release.get('release_date'))
+            key = _freeze(row)
+            counter[key] += 1
+            samples.setdefault(key, row)
+        return [(samples[key], count) for key, count in counter.items()]
+
+    def timeline_stats(self, classify: Callable[[Dict[str, Any]], Tuple[str, str, Any, str]]) -> Tuple[Dict[str, Any], Dict[str, Dict[str, int]]]:
+        """
+        计算时间轴头部统计，与时间轴生成时的stats/product_line_stats一致
+
+        Args:
+            classify: 分类函数，返回(产品线, 版本类型, 年份, 合并键)
+
+        Returns:
+            (stats, product_line_stats)
+        """
+        counter = TimelineStats()
+        for row, count in self.timeline_rows():
+            counter.add(classify(row), count)
+        return counter.result()
+
+
+class TimelineStats:
+    """时间轴统计计数器，合并为同一条的发布只计入一次分类统计"""
+
+    def __init__(self):
+        self.total_releases = 0
+        self.product_lines = defaultdict(int)
+        self.version_types = defaultdict(int)
+        self.years = defaultdict(int)
+        self.product_line_stats = defaultdict(lambda: defaultdict(int))
+        self.seen_keys = set()
+
+    def add(self, classified: Tuple[str, str, Any, str], count: int = 1) -> None:
+        """
+        计入一条（或count条分类相同的）发布
+
+        Args:
+            classified: (产品线, 版本类型, 年份, 合并键)
+            count: 发布数量
+        """
+        self.total_releases += count
+        product_line, version_type, year, merge_key = classified
+
+        # 合并后的发布只计数一次
+        if merge_key in self.seen_keys:
+            return
+        self.seen_keys.add(merge_key)
+
+        self.product_lines[product_line] += 1
+        self.version_types[version_type] += 1
+        self.years[year] += 1
+        self.product_line_stats[product_line][version_type] += 1
+
+    def result(self) -> Tuple[Dict[str, Any], Dict[str, Dict[str, int]]]:
+        """返回(stats, product_line_stats)"""
+        stats = {
+            'total_releases': self.total_releases,
+            'product_lines': self.product_lines,
+            'version_types': self.version_types,
+            'years': self.years
+        }
+        return stats, self.product_line_stats
@@ -0,0 +1,175 @@
+"""
+mongodump备份读取模块
+直接流式读取mongodump导出的BSON文件（支持--gzip压缩），无需启动mongod即可离线生成时间轴和分析数据
+"""
+import os
+import gzip
+import logging
+from datetime import datetime
+from typing import Dict, Any, Iterator, List, Optional
+
+import bson
+
+
+logger = logging.getLogger(__name__)
+
+
+def iter_bson_file(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    逐条读取BSON文件中的文档
+
+    Args:
+        path: BSON文件路径，以.gz结尾时按gzip解压
+
+    Returns:
+        文档迭代器
+    """
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as f:
+        for doc in bson.decode_file_iter(f):
+            yield doc
+
+
+def _project(doc: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """按MongoDB投影规则（仅支持顶层字段的包含/排除）裁剪文档"""
+    if not projection:
+        return doc
+
+    include = {field for field, flag in projection.items() if flag and field != '_id'}
+    if include:
+        result = {field: doc[field] for field in include if field in doc}
+        if projection.get('_id', 1) and '_id' in doc:
+            result['_id'] = doc['_id']
+        return result
+
+    exclude = {field for field, flag in projection.items() if not flag}
+    return {field: value for field, value in doc.items() if field not in exclude}
+
+
+def _matches(doc: Dict[str, Any], query: Optional[Dict[str, Any]]) -> bool:
+    """判断文档是否满足过滤条件（仅支持顶层字段的等值过滤）"""
+    if not query:
+        return True
+
+    for field, expected in query.items():
+        if field.startswith('$') or isinstance(expected, dict):
+            raise ValueError(f"离线数据源只支持等值过滤: {query}")
+        if doc.get(field) != expected:
+            return False
+    return True
+
+
+def _sort_value(value: Any) -> tuple:
+    """排序键，按MongoDB的类型顺序（空值 < 数字 < 字符串 < 布尔 < 日期）比较"""
+    if value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (3, value)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    if isinstance(value, datetime):
+        return (4, value.replace(tzinfo=None))
+    return (5, str(value))
+
+
+class DumpCursor:
+    """离线游标，支持sort/limit和迭代"""
+
+    def __init__(self, documents: Iterator[Dict[str, Any]]):
+        self._documents = documents
+        self._limit = 0
+
+    def sort(self, key, direction: int = 1) -> 'DumpCursor':
+        """排序（需要把文档载入内存）"""
+        keys = [(key, direction)] if isinstance(key, str) else list(key)
+        documents: List[Dict[str, Any]] = list(self._documents)
+        # 按优先级从低到高依次稳定排序
+        for field, field_direction in reversed(keys):
+            documents.sort(key=lambda doc: _sort_value(doc.get(field)), reverse=field_direction < 0)
+        self._documents = iter(documents)
+        return self
+
+    def limit(self, limit: int) -> 'DumpCursor':
+        """限制返回数量，0表示不限制"""
+        self._limit = limit
+        return self
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for count, doc in enumerate(self._documents, start=1):
+            yield doc
+            if self._limit and count >= self._limit:
+                break
+
+
+class BsonDumpCollection:
+    """mongodump导出的单个集合（只读）"""
+
+    def __init__(self, path: Optional[str], name: str):
+        """
+        Args:
+            path: BSON文件路径，集合不存在时为None
+            name: 集合名称
+        """
+        self.path = path
+        self.name = name
+
+    def _iter_documents(self) -> Iterator[Dict[str, Any]]:
+        if self.path is None:
+            return iter(())
+        return iter_bson_file(self.path)
+
+    def find(self, filter: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None, **kwargs) -> DumpCursor:
+        """
+        流式查询文档
+
+        Args:
+            filter: 等值过滤条件
+            projection: 字段投影
+            **kwargs: 兼容pymongo的其它参数（如batch_size），离线读取时忽略
+        """
+        documents = (
+            _project(doc, projection)
+            for doc in self._iter_documents()
+            if _matches(doc, filter)
+        )
+        return DumpCursor(documents)
+
+    def find_one(self, filter: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """查询第一条满足条件的文档"""
+        return next(iter(self.find(filter, projection)), None)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return self._iter_documents()
+
+
+class BsonDumpDatabase:
+    """
+    mongodump导出的数据库目录（只读）
+
+    可以指定数据库目录（如backup/unifi_releases），也可以指定其上级目录（如backup）
+    """
+
+    def __init__(self, dump_dir: str, db_name: str = 'unifi_releases'):
+        """
+        Args:
+            dump_dir: 备份目录
+            db_name: 数据库名称，dump_dir为上级目录时用于定位数据库目录
+        """
+        nested_dir = os.path.join(dump_dir, db_name)
+        self.dump_dir = nested_dir if os.path.isdir(nested_dir) else dump_dir
+
+    def collection_path(self, name: str) -> Optional[str]:
+        """查找集合对应的BSON文件"""
+        for filename in (f"{name}.bson", f"{name}.bson.gz"):
+            path = os.path.join(self.dump_dir, filename)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def __getitem__(self, name: str) -> BsonDumpCollection:
+        path = self.collection_path(name)
+        if path is None:
+            logger.warning(f"备份目录中没有集合 {name}: {self.dump_dir}")
+        return BsonDumpCollection(path, name)
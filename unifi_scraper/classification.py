@@ -0,0 +1,305 @@
+"""
+发布分类模块
+根据标签、产品名称和版本信息确定发布所属的产品线、版本类型和年份，
+时间轴生成和入库时的统计维护共用同一套规则
+"""
+import re
+import json
+import logging
+from datetime import datetime
+
+
+logger = logging.getLogger(__name__)
+
+# 产品线映射关系，根据标签和产品名称进行分类
+PRODUCT_LINE_MAPPING = {
+    # ===== Platform 平台 =====
+    'unifi-os': ['unifi os', 'unifi console', 'dream os', 'udm os', 'dream machine os', 'unifi os console', 'uisp os'],
+    'unifi-network-app': ['unifi network application', 'network controller', 'network management','uap controller', 'unifi sdn'],
+    'unifi-protect-app': ['unifi protect application', 'unifi protect server', 'protect controller', 'video controller'],
+    'unifi-access-app': ['access application', 'access app', 'access controller', 'door controller', 'identity controller'],
+    'unifi-talk-app': ['talk application', 'talk app', 'talk controller', 'voip controller', 'voice controller', 'phone controller'],
+    'unifi-led-app': ['led application', 'led controller', 'led app', 'lighting controller'],
+    'unifi-connect-app': ['connect application', 'connect app', 'connect controller', 'sense controller', 'iot controller'],
+    'unifi-drive-app': ['drive application', 'drive app', 'storage controller', 'backup controller'],
+    'unifi-platform-other': ['security advisory', 'security bulletin', 'advisory bulletin', 'platform advisory'],
+    
+    # ===== 设备产品线 =====
+    'unifi-switch': ['switch', 'campus', 'aggregation', 'usw', 'flex switch', 'enterprise switch', 'poe switch', 'switch firmware', 'usw firmware'],
+    'unifi-gateway': ['gateway', 'usg', 'security gateway', 'routing', 'cable internet', 'mobile routers', 'mobile router', 'dream router', 'dream machine', 'udr', 'udm', 'lte', 'unifi lte', 'udm firmware', 'dream firmware', 'gateway firmware', 'usg firmware'],
+    'unifi-ap': ['access point', 'uap', 'wifi', 'wireless', 'u6', 'nanohd', 'flexhd', 'ac-lite', 'ac-pro', 'access point firmware', 'uap firmware', 'ap firmware','bridge'],
+    'unifi-cloud': ['cloud key', 'uck', 'cloud gateway', 'console', 'ck', 'cloudkey firmware'],
+    'unifi-protect': ['protect', 'camera', 'g4', 'g3', 'doorbell', 'viewport', 'nvr', 'unvr', 'video', 'camera firmware', 'g4 firmware', 'g3 firmware', 'doorbell firmware', 'viewport firmware'],
+    'unifi-access': ['access', 'door', 'smart lock', 'hub', 'identity', 'access hub firmware', 'door firmware', 'smart lock firmware'],
+    'unifi-talk': ['talk', 'phone', 'voip', 'phone firmware', 'talk hardware firmware'],
+    'unifi-led': ['led', 'light', 'lighting', 'led hardware firmware', 'light firmware'],
+    'unifi-connect': ['connect', 'sense', 'sensor', 'uid', 'sense firmware', 'sensor firmware'],
+    
+    # ===== APP & Tools 应用与工具 =====
+    'protect-app': ['protect app', 'protect ios', 'protect android','unifi play', 'unifi play ios','play android', 'play ios', 'play app'],
+    'access-app': ['access app', 'access ios', 'access android'],
+    'connect-app': ['connect app', 'connect ios', 'connect android'],
+    'verify-app': ['verify app', 'verify ios', 'verify android'],
+    'portal-app': ['portal app', 'portal ios', 'portal android'],
+    'identity-endpoint': ['identity endpoint', 'identity endpoint ios', 'identity endpoint android'],
+    'wifiman-app': ['wifiman app', 'wifiman ios', 'wifiman android', 'WiFiman Desktop', 'wifiman for desktop'],
+    'unifi-app': ['unifi app', 'unifi ios', 'unifi android'],
+    'design-center': ['unifi design center', 'unifi innerspace'],
+    
+    # ===== 其他产品线 =====
+    'airmax': ['airmax', 'nanostation', 'litebeam', 'powerbeam', 'rocket', 'prism', 'aircube', '60ghz'],
+    'airfiber': ['airfiber', 'ltu', 'gigabeam'],
+    'edgemax': ['edgerouter', 'edgeswitch', 'edgepoint', 'edgemax'],
+    'amplifi': ['amplifi', 'alien', 'mesh', 'poweramp'],
+    'ufiber': ['ufiber', 'fiber'],
+    'uisp': ['uisp', 'unms', 'isp design', 'isp-app', 'uisp design center','isp design center'],
+    
+    # 未分类的 Unifi 产品
+    'unifi-other': ['unifi']  # 放在最后作为兜底分类
+}
+
+
+def determine_product_line(release):
+    """确定产品所属的产品线"""
+    tags_str = release.get('tags', '[]')
+    product_name = release.get('product_name', '').lower()
+    firmware_type = release.get('firmware_type', '').lower()
+    version = release.get('version', '').lower()
+
+    try:
+        # 解析标签
+        tags = json.loads(tags_str) if isinstance(tags_str, str) else tags_str
+        if not isinstance(tags, list):
+            tags = []
+
+        # 获取标签文本和产品名称文本
+        tags_text = ' '.join([str(tag).lower() for tag in tags])
+        name_text = product_name + ' ' + firmware_type
+        all_text = name_text + ' ' + tags_text
+
+        # 调试日志
+        logger.debug(f"处理产品: {product_name}, 标签: {tags}")
+
+        # 特殊处理：识别旧版本的UniFi控制器（5.x.x系列）
+        if ('unifi' in product_name.lower() and 
+            re.search(r'\b5\.\d+\.\d+\b', version) and 
+            ('stable' in all_text or 'controller' in all_text)):
+            return 'unifi-network-app'
+
+        # 先检查是不是UniFi OS - 这是最高优先级
+        if ('unifi os' in all_text or 'dream os' in all_text or 'udm os' in all_text or 'console os' in all_text) and not 'ios' in all_text:
+            return 'unifi-os'
+
+        # 检查是否为移动应用 (APP) - 高优先级
+        # 移动应用识别
+        if 'ios' in all_text or 'iphone' in all_text or 'ipad' in all_text or 'android' in all_text or 'mobile app' in all_text:
+            if 'play' in all_text or 'protect' in all_text:
+                return 'protect-app'
+            elif 'wifiman' in all_text:
+                return 'wifiman-app'
+            elif 'access' in all_text:
+                return 'access-app'
+            elif 'connect' in all_text:
+                return 'connect-app'
+            elif 'verify' in all_text:
+                return 'verify-app'
+            elif 'portal' in all_text:
+                return 'portal-app'
+            elif 'identity' in all_text:
+                return 'identity-endpoint'
+            elif 'unifi' in all_text:
+                return 'unifi-app'
+
+        # 直接从标签中获取产品线（精确匹配）
+        primary_tag = None
+        for tag in tags:
+            tag_lower = str(tag).lower()
+            if (tag_lower.startswith('unifi-') or tag_lower in ['edgemax', 'airmax', 'airfiber', 'amplifi', 'ufiber', 'uisp', 'design-center']):
+                primary_tag = tag_lower
+                break
+
+        # 特定产品线的标签映射
+        if primary_tag:
+            # 处理标签直接匹配的情况
+            if primary_tag == 'unifi-gateway' or (primary_tag == 'unifi-gateway-cloudkey' and 'gateway' in all_text):
+                # 如果是UniFi OS相关，优先归类为OS
+                if ('unifi os' in all_text or 'dream os' in all_text or 'udm os' in all_text) and not 'ios' in all_text:
+                    return 'unifi-os'
+                return 'unifi-gateway'
+            elif primary_tag == 'unifi-gateway-cloudkey' and not 'gateway' in all_text:
+                return 'unifi-cloud'
+            elif primary_tag in ['unifi-cloud', 'unifi-cloudkey']:
+                return 'unifi-cloud'
+            elif primary_tag in ['unifi-switch', 'unifi-switching', 'unifi-routing-switching']:
+                return 'unifi-switch'
+            elif primary_tag == 'unifi-wireless':
+                if 'lte' in all_text:
+                    return 'unifi-gateway'  # LTE产品归到Gateway
+                else:
+                    return 'unifi-ap'
+            elif primary_tag in ['edgemax', 'airmax', 'airfiber', 'amplifi', 'ufiber', 'uisp', 'unms', 'design-center']:
+                if primary_tag == 'unms':
+                    return 'uisp'
+                return primary_tag
+
+        # 使用PRODUCT_LINE_MAPPING进行精确匹配
+        # 1. 将all_text拆分为单词列表，用于精确匹配
+        words = re.findall(r'\b\w+\b', all_text.lower())
+        text_as_phrase = ' '.join(words)
+
+        # 检查是否包含UniFi OS关键词（最高优先级）
+        for keyword in PRODUCT_LINE_MAPPING['unifi-os']:
+            # 将关键词转换为单词边界正则表达式模式
+            keyword_pattern = r'\b' + re.escape(keyword.lower()) + r'\b'
+            # 检查是否完整匹配且非iOS
+            if re.search(keyword_pattern, text_as_phrase) and not 'ios' in all_text:
+                return 'unifi-os'
+
+        # 2. 对每个产品线的关键词列表进行匹配
+        for product_line, keywords in PRODUCT_LINE_MAPPING.items():
+            # 跳过已检查过的UniFi OS
+            if product_line == 'unifi-os':
+                continue
+
+            for keyword in keywords:
+                # 将关键词转换为单词边界正则表达式模式
+                keyword_pattern = r'\b' + re.escape(keyword.lower()) + r'\b'
+
+                # 检查关键词是否完整匹配（作为独立短语）
+                if re.search(keyword_pattern, text_as_phrase):
+                    # 特殊情况处理：避免iOS被识别为OS
+                    if product_line == 'unifi-os' and 'ios' in all_text and not keyword.lower() in all_text:
+                        continue
+
+                    return product_line
+
+        # 产品线标识检查
+        if 'unifi' in all_text:
+            # Play相关的产品归类到protect-app
+            if 'play' in all_text:
+                return 'protect-app'
+
+            # 检查是否是旧版本UniFi控制器
+            if re.search(r'(unifi.*controller|controller.*unifi|network.*controller)', all_text) or re.search(r'\bunifi\s+\d+\.\d+\.\d+', all_text):
+                return 'unifi-network-app'
+
+            # 如果包含UniFi标识，但无法精确匹配，归为其他UniFi产品
+            return 'unifi-other'
+        elif 'edgemax' in all_text or 'edgerouter' in all_text or 'edgeswitch' in all_text:
+            return 'edgemax'
+        elif 'airmax' in all_text:
+            return 'airmax'
+        elif 'airfiber' in all_text or 'ltu' in all_text:
+            return 'airfiber'
+        elif 'amplifi' in all_text:
+            return 'amplifi'
+        elif 'ufiber' in all_text:
+            return 'ufiber'
+        elif 'uisp' in all_text or 'unms' in all_text:
+            return 'uisp'
+
+        # 完全无法识别的产品
+        return 'other'
+    except Exception as e:
+        logger.warning(f"解析产品线失败: {e}")
+        return 'other'
+
+
+def determine_version_type(release):
+    """确定版本类型(GA/RC/Beta/Alpha等)或移动应用平台类型"""
+    # 获取产品线
+    product_line = determine_product_line(release)
+
+    # 对于APP类产品，返回平台类型而非版本类型
+    if product_line in ['unifi-app', 'protect-app', 'wifiman-app', 'access-app', 'connect-app', 'verify-app', 'portal-app', 'identity-endpoint']:
+        all_text = (release.get('product_name', '') + ' ' + 
+                   release.get('firmware_type', '') + ' ' + 
+                   ' '.join(json.loads(release.get('tags', '[]')) if isinstance(release.get('tags', '[]'), str) else release.get('tags', '[]'))).lower()
+
+        # 确定平台类型
+        if 'ios' in all_text or 'iphone' in all_text or 'ipad' in all_text:
+            return 'iOS'
+        elif 'android' in all_text:
+            return 'Android'
+        elif 'desktop' in all_text or 'windows' in all_text or 'mac' in all_text:
+            return 'Desktop'
+        else:
+            return 'Other'  # 默认平台类型
+
+    # 非APP产品使用正常的版本类型判断
+    # 首先检查stage字段
+    stage = release.get('stage', '').lower()
+
+    if 'ga' in stage or 'general' in stage:
+        return 'GA'
+    elif 'rc' in stage or 'release candidate' in stage:
+        return 'RC'
+    elif 'beta' in stage:
+        return 'Beta'
+    elif 'alpha' in stage:
+        return 'Alpha'
+
+    # 如果stage字段没有明确指示，从版本号中识别
+    version = release.get('version', '').lower()
+
+    if 'rc' in version:
+        return 'RC'
+    elif 'beta' in version or 'b' in version:
+        return 'Beta'
+    elif 'alpha' in version or 'a' in version:
+        return 'Alpha'
+    elif release.get('is_beta', False):
+        return 'Beta'
+
+    # 默认为GA
+    return 'GA'
+
+
+def extract_year(date_str):
+    """从日期中提取年份"""
+    try:
+        if isinstance(date_str, str):
+            date_obj = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
+            return date_obj.year
+        elif isinstance(date_str, datetime):
+            return date_str.year
+    except Exception:
+        pass
+
+    # 如果无法解析日期，尝试直接提取开头的4位数字作为年份
+    if isinstance(date_str, str) and len(date_str) >= 4:
+        year_str = date_str[:4]
+        if year_str.isdigit():
+            return int(year_str)
+
+    return "未知年份"
+
+
+def get_merge_key(release, product_line, version_type, year, version):
+    """
+    生成合并键，相同合并键的发布在时间轴中合并为一条
+
+    优先使用API返回的分组ID；旧数据没有分组ID时，退回按产品线、版本类型、年份和版本号合并
+    """
+    group_id = release.get('group_id')
+    if group_id:
+        return f"{product_line}_{version_type}_{year}_group_{group_id}"
+    return f"{product_line}_{version_type}_{year}_{version}"
+
+
+def classify_release(release):
+    """
+    计算发布的时间轴分类，供统计使用
+
+    Returns:
+        (产品线, 版本类型, 年份, 合并键)
+    """
+    product_line = determine_product_line(release)
+    version_type = determine_version_type(release)
+    year = extract_year(release.get('release_date', ''))
+    version = release.get('version', '未知版本')
+    if isinstance(version, str):
+        version = version.replace('_', '-')
+
+    merge_key = get_merge_key(release, product_line, version_type, year, version)
+    return product_line, version_type, year, merge_key
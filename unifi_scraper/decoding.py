@@ -0,0 +1,190 @@
+"""
+GraphQL响应解码模块
+安装了msgspec时，把响应字节直接解码为类型化的发布结构体，跳过未使用的字段；
+否则退回orjson（或标准库json）解码为字典。两种结果都支持get()和in，爬虫代码无需区分
+"""
+import json
+import logging
+from typing import Any, List, Optional, Tuple, Union
+
+try:
+    import msgspec
+except ImportError:  # pragma: no cover - 可选依赖
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 可选依赖
+    orjson = None
+
+
+logger = logging.getLogger(__name__)
+
+
+if msgspec is not None:
+    UNSET = msgspec.UNSET
+
+    class _Record(msgspec.Struct):
+        """结构体基类，提供与字典一致的get()和in，未返回的字段视为不存在"""
+
+        def get(self, key: str, default: Any = None) -> Any:
+            value = getattr(self, key, UNSET)
+            return default if value is UNSET else value
+
+        def __contains__(self, key: str) -> bool:
+            return getattr(self, key, UNSET) is not UNSET
+
+    _Str = Union[str, None, msgspec.UnsetType]
+
+    class ReleaseStats(_Record):
+        """发布统计"""
+        comments: Union[int, None, msgspec.UnsetType] = UNSET
+        views: Union[int, None, msgspec.UnsetType] = UNSET
+
+    class ReleaseListItem(_Record):
+        """发布列表项（releases查询）"""
+        id: _Str = UNSET
+        slug: _Str = UNSET
+        title: _Str = UNSET
+        version: _Str = UNSET
+        stage: _Str = UNSET
+        createdAt: _Str = UNSET
+        lastActivityAt: _Str = UNSET
+        updatedAt: _Str = UNSET
+        tags: Union[List[Any], None, msgspec.UnsetType] = UNSET
+        type: _Str = UNSET
+        stats: Union[ReleaseStats, None, msgspec.UnsetType] = UNSET
+
+    class Content(_Record):
+        """发布内容块，只保留文本内容"""
+        type: _Str = UNSET
+        content: _Str = UNSET
+
+    class ReleaseLink(_Record):
+        """下载链接"""
+        url: _Str = UNSET
+        title: _Str = UNSET
+
+    _Contents = Union[List[Content], None, msgspec.UnsetType]
+
+    class ReleaseDetail(_Record):
+        """发布详情（GetRelease查询），只解码入库需要的字段"""
+        id: _Str = UNSET
+        groupId: _Str = UNSET
+        stage: _Str = UNSET
+        lastActivityAt: _Str = UNSET
+        updatedAt: _Str = UNSET
+        improvements: _Contents = UNSET
+        bugfixes: _Contents = UNSET
+        knownIssues: _Contents = UNSET
+        importantNotes: _Contents = UNSET
+        links: Union[List[ReleaseLink], None, msgspec.UnsetType] = UNSET
+
+    class _ReleaseItems(msgspec.Struct):
+        items: Optional[List[ReleaseListItem]] = None
+
+    class _ListData(msgspec.Struct):
+        releases: Optional[_ReleaseItems] = None
+
+    class _ListResponse(msgspec.Struct):
+        data: Optional[_ListData] = None
+        errors: Optional[List[Any]] = None
+
+    class _DetailData(msgspec.Struct):
+        release: Optional[ReleaseDetail] = None
+
+    class _DetailResponse(msgspec.Struct):
+        data: Optional[_DetailData] = None
+        errors: Optional[List[Any]] = None
+
+
+# 可用的解码后端，按优先级排列
+BACKENDS = tuple(
+    name for name, module in (('msgspec', msgspec), ('orjson', orjson), ('json', json))
+    if module is not None
+)
+
+
+def to_builtins(value: Any) -> Any:
+    """
+    把解码结果转换为普通的字典/列表，便于持久化（如写入检查点）
+
+    Args:
+        value: 字典或类型化结构体
+
+    Returns:
+        只包含内置类型的值，结构体中未返回的字段会被省略
+    """
+    if msgspec is not None and isinstance(value, (msgspec.Struct, list)):
+        return msgspec.to_builtins(value)
+    return value
+
+
+class ResponseDecoder:
+    """GraphQL响应解码器"""
+
+    def __init__(self, backend: Optional[str] = None):
+        """
+        初始化解码器
+
+        Args:
+            backend: 解码后端（msgspec/orjson/json），None表示使用可用的最快后端
+        """
+        if backend is None:
+            backend = BACKENDS[0]
+        if backend not in BACKENDS:
+            raise ValueError(f"解码后端不可用: {backend}，可用后端: {', '.join(BACKENDS)}")
+
+        self.backend = backend
+        if backend == 'msgspec':
+            self._list_decoder = msgspec.json.Decoder(_ListResponse)
+            self._detail_decoder = msgspec.json.Decoder(_DetailResponse)
+            self._loads = None
+        else:
+            self._loads = orjson.loads if backend == 'orjson' else json.loads
+
+    def decode_releases(self, content: bytes) -> Tuple[List[Any], Optional[List[Any]]]:
+        """
+        解码releases列表查询的响应
+
+        Args:
+            content: 响应字节
+
+        Returns:
+            (发布列表项, GraphQL错误列表)
+        """
+        if self._loads is None:
+            response = self._list_decoder.decode(content)
+            if response.errors:
+                return [], response.errors
+            releases = response.data.releases if response.data else None
+            return (releases.items or []) if releases else [], None
+
+        data = self._loads(content)
+        errors = data.get("errors")
+        if errors:
+            return [], errors
+        releases = (data.get("data") or {}).get("releases") or {}
+        return releases.get("items") or [], None
+
+    def decode_release_detail(self, content: bytes) -> Tuple[Optional[Any], Optional[List[Any]]]:
+        """
+        解码GetRelease详情查询的响应
+
+        Args:
+            content: 响应字节
+
+        Returns:
+            (发布详情，未找到时为None, GraphQL错误列表)
+        """
+        if self._loads is None:
+            response = self._detail_decoder.decode(content)
+            if response.errors:
+                return None, response.errors
+            return (response.data.release if response.data else None), None
+
+        data = self._loads(content)
+        errors = data.get("errors")
+        if errors:
+            return None, errors
+        return (data.get("data") or {}).get("release") or None, None
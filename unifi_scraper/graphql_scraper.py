@@ -7,13 +7,19 @@ import time
 import json
 import logging
 import pickle
+import random
 import requests
 import urllib3
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Dict, List, Any, Optional, Tuple
 
 from .models import UnifiRelease
-from .storage import MongoStorage
+from .storage import BaseStorage, MongoStorage, SAVE_INSERTED, SAVE_CHANGED
+from .decoding import ResponseDecoder, to_builtins
+from .scheduler import CrawlScheduler, REASON_NAMES
+from .metrics import METRICS, PREFIX, stage
 
 
 # 如果设置了跳过SSL验证，则禁用警告
@@ -21,30 +27,86 @@ if os.getenv('SSL_VERIFY', 'True').lower() == 'false':
     urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 
+class ReleaseDetailError(Exception):
+    """获取产品发布详情失败，错误类型名称会记录到死信集合"""
+
+
+class HTTPStatusError(ReleaseDetailError):
+    """响应状态码不是200"""
+
+
+class GraphQLQueryError(ReleaseDetailError):
+    """GraphQL查询返回错误"""
+
+
+class ReleaseNotFoundError(ReleaseDetailError):
+    """响应中没有发布详情"""
+
+
+class RequestFailedError(ReleaseDetailError):
+    """请求失败（连接错误、超时等）"""
+
+
+class InvalidResponseError(ReleaseDetailError):
+    """响应无法解码"""
+
+
+class SaveFailedError(Exception):
+    """发布保存到数据库失败"""
+
+
 class GraphQLScraper:
     """
     GraphQL API爬虫类
     使用GraphQL API获取Ubiquiti产品发布信息
     """
     
-    def __init__(self, checkpoint_file: str = 'checkpoint.pkl'):
+    def __init__(self, checkpoint_file: str = 'checkpoint.pkl', storage: Optional[BaseStorage] = None):
         """
         初始化爬虫
         
         Args:
             checkpoint_file: 检查点文件路径
+            storage: 存储后端，默认为MongoStorage（回放和基准测试可传入MemoryStorage）
         """
-        self.api_url = "https://community.svc.ui.com/"
+        # GraphQL接口地址，可指向本地模拟服务（benchmarks/mock_graphql_server.py）做离线压测
+        self.api_url = os.getenv('GRAPHQL_API_URL', "https://community.svc.ui.com/")
         self.checkpoint_file = checkpoint_file
-        self.storage = MongoStorage()
+        self.storage = storage if storage is not None else MongoStorage()
         self.logger = logging.getLogger(__name__)
         
         # 已处理的发布ID
         self.processed_ids = set()
         
+        # 本轮（process_releases/work_queue/retry_failed）各保存结果（新插入/有变化/未变化）的数量
+        self.save_outcomes = Counter()
+        
+        # 列表分页进度，未完成的分页在下次运行时从断点继续
+        self.list_state = None
+        # 已获取的列表项逐页追加到单独的文件，检查点只记录offset和条目数，保存开销不随列表增长
+        self.list_journal_file = f"{checkpoint_file}.list"
+        self.list_journaled = 0
+        
+        # 列表分页失败重试设置
+        self.list_max_retries = int(os.getenv('LIST_MAX_RETRIES', '3'))
+        self.retry_backoff = float(os.getenv('RETRY_BACKOFF', '2.0'))
+        # 分页进度的有效期（小时），过期后从头获取列表，避免遗漏新发布
+        self.list_state_max_age = float(os.getenv('LIST_STATE_MAX_AGE', '24'))
+        
+        # 分页漂移检测：每页与上一页重叠的条数（0表示不检测），以及锚点丢失时最多向前回退的页数
+        self.page_overlap = max(0, int(os.getenv('PAGE_OVERLAP', '1')))
+        self.drift_max_steps = int(os.getenv('DRIFT_MAX_STEPS', '3'))
+        self.list_drift = self._new_drift_stats()
+        
+        # 复用HTTP连接池，长时间运行时避免每次请求重新建立TLS连接
+        self.session = requests.Session()
+        
         # SSL验证设置
         self.verify_ssl = os.getenv('SSL_VERIFY', 'True').lower() != 'false'
         
+        # 响应解码器，默认使用可用的最快后端（msgspec > orjson > json）
+        self.decoder = ResponseDecoder(os.getenv('DECODER_BACKEND') or None)
+        
         # 加载断点数据
         self.load_checkpoint()
     
@@ -65,36 +127,101 @@ class GraphQLScraper:
                     data = pickle.load(f)
                     if isinstance(data, dict) and 'processed_ids' in data:
                         self.processed_ids = data['processed_ids']
+                        self.list_state = self._restore_list_state(data.get('list_state'))
                     else:
                         # 如果加载的数据不是预期的格式，则使用默认值
                         self.logger.warning(f"检查点文件格式不正确，使用默认值")
                         self.processed_ids = set()
                 self.logger.info(f"已加载检查点数据，已处理ID数量: {len(self.processed_ids)}")
+                if self.list_state:
+                    self.logger.info(f"检查点中有未完成的列表分页，offset: {self.list_state['offset']}")
             else:
                 self.logger.info("检查点文件不存在，将创建新的检查点")
         except Exception as e:
             self.logger.error(f"加载检查点数据失败: {e}")
             self.processed_ids = set()
     
+    def _restore_list_state(self, state: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        从列表文件读回检查点中记录的列表项
+
+        Args:
+            state: 检查点中的分页进度（offset/items_count/updated）
+
+        Returns:
+            Optional[Dict[str, Any]]: 包含items的分页进度，列表文件缺失或不完整时返回None
+        """
+        if not state:
+            return None
+        if 'items' in state:
+            # 旧格式的检查点直接包含列表项，下次保存时全部写入列表文件
+            self.list_journaled = 0
+            return state
+        
+        count = state.get('items_count', 0)
+        items = []
+        if os.path.exists(self.list_journal_file):
+            with open(self.list_journal_file, 'rb') as f:
+                while len(items) < count:
+                    try:
+                        items.extend(pickle.load(f))
+                    except EOFError:
+                        break
+        if len(items) < count:
+            self.logger.warning(f"列表文件不完整（{len(items)}/{count}），重新获取列表")
+            return None
+        
+        # 保存检查点前中断时，列表文件中可能多出未记录的页
+        self.list_journaled = count
+        return {'offset': state['offset'], 'items': items[:count], 'updated': state['updated']}
+    
+    def _reset_list_journal(self) -> None:
+        """开始获取新的列表时清空列表文件"""
+        if os.path.exists(self.list_journal_file):
+            os.remove(self.list_journal_file)
+        self.list_journaled = 0
+    
+    def _checkpoint_list_state(self) -> Optional[Dict[str, Any]]:
+        """把新获取的列表项追加到列表文件，返回写入检查点的分页进度（不含列表项）"""
+        if not self.list_state:
+            if self.list_journaled or os.path.exists(self.list_journal_file):
+                self._reset_list_journal()
+            return None
+        
+        items = self.list_state['items']
+        if len(items) > self.list_journaled:
+            with open(self.list_journal_file, 'ab') as f:
+                pickle.dump(items[self.list_journaled:], f)
+            self.list_journaled = len(items)
+        return {
+            'offset': self.list_state['offset'],
+            'items_count': len(items),
+            'updated': self.list_state['updated']
+        }
+    
     def save_checkpoint(self) -> None:
         """保存检查点数据"""
+        with stage('checkpoint_save'):
+            self._save_checkpoint()
+    
+    def _save_checkpoint(self) -> None:
         try:
+            checkpoint = {
+                'processed_ids': self.processed_ids,
+                'list_state': self._checkpoint_list_state(),
+                'timestamp': datetime.now()
+            }
+            
             # 创建备份
             if os.path.exists(self.checkpoint_file):
                 backup_file = f"{self.checkpoint_file}.bak"
                 with open(backup_file, 'wb') as f:
-                    pickle.dump({
-                        'processed_ids': self.processed_ids,
-                        'timestamp': datetime.now()
-                    }, f)
+                    pickle.dump(checkpoint, f)
             
             # 保存当前数据
             with open(self.checkpoint_file, 'wb') as f:
-                pickle.dump({
-                    'processed_ids': self.processed_ids,
-                    'timestamp': datetime.now()
-                }, f)
-            self.logger.info(f"已保存检查点数据，已处理ID数量: {len(self.processed_ids)}")
+                pickle.dump(checkpoint, f)
+            self.logger.info(f"已保存检查点数据，已处理ID数量: {len(self.processed_ids)}", extra={'aggregate': '保存检查点'})
         except Exception as e:
             self.logger.error(f"保存检查点数据失败: {e}")
     
@@ -130,13 +257,42 @@ class GraphQLScraper:
             'x-frontend-version': datetime.now().strftime('%Y-%m-%dT%H:%M:%SZ')
         }
     
-    def fetch_all_releases(self, limit: int = 0, batch_size: int = 50) -> List[Dict[str, Any]]:
+    def _post(self, payload: Dict[str, Any], endpoint: str) -> requests.Response:
+        """
+        发送GraphQL请求，并记录请求数和接收字节数
+        
+        Args:
+            payload: 请求数据
+            endpoint: 指标中的接口名称（list/detail）
+        
+        Returns:
+            requests.Response: 响应
+        """
+        try:
+            response = self.session.post(
+                self.api_url,
+                headers=self.get_headers(),
+                json=payload,
+                verify=self.verify_ssl,
+                timeout=30
+            )
+        except requests.RequestException:
+            METRICS.inc(f'{PREFIX}_http_requests_total', help='GraphQL请求数', endpoint=endpoint, status='error')
+            raise
+        
+        METRICS.inc(f'{PREFIX}_http_requests_total', help='GraphQL请求数', endpoint=endpoint, status=response.status_code)
+        METRICS.inc(f'{PREFIX}_http_response_bytes_total', len(response.content), help='接收的响应字节数', endpoint=endpoint)
+        return response
+    
+    def fetch_all_releases(self, limit: int = 0, batch_size: int = 50, incremental: bool = False) -> List[Dict[str, Any]]:
         """
         获取所有产品发布信息
         
         Args:
             limit: 最大获取数量，0表示不限制
             batch_size: 每批次获取的数量
+            incremental: 增量获取，列表按发布时间从新到旧排列，遇到一整页都已处理过时停止；
+                增量获取不保存也不继续分页进度
         
         Returns:
             List[Dict[str, Any]]: 产品发布信息列表
@@ -147,6 +303,19 @@ class GraphQLScraper:
         offset = 0
         has_more = True
         
+        # 从上次中断的分页位置继续
+        state = None if incremental else self._resumable_list_state()
+        if state is not None:
+            all_items = state['items']
+            offset = state['offset']
+            self.logger.info(f"从上次中断的位置继续获取列表，offset: {offset}，已获取: {len(all_items)}")
+        elif not incremental:
+            self._reset_list_journal()
+        
+        seen_ids = {item.get("id") for item in all_items}
+        self.list_drift = self._new_drift_stats()
+        pages = 0
+        
         while has_more:
             # 如果设置了limit且已达到，则停止
             if limit > 0 and len(all_items) >= limit:
@@ -160,33 +329,202 @@ class GraphQLScraper:
                 if remaining < batch_size:
                     current_batch_size = remaining
             
-            # 获取产品发布列表
-            items, success = self._fetch_releases_batch(offset, current_batch_size)
+            # 与上一页重叠若干条，通过上一页最后一条发布检测分页漂移
+            overlap = min(self.page_overlap, offset) if all_items else 0
+            page_start = offset - overlap
+            
+            # 获取产品发布列表，失败时按退避间隔重试
+            items, success = self._fetch_releases_batch_with_retry(page_start, current_batch_size + overlap)
             
             if not success:
-                self.logger.error("获取产品发布列表失败")
+                if incremental:
+                    self.logger.error("获取产品发布列表失败")
+                else:
+                    self.logger.error(f"获取产品发布列表失败，已保存分页进度，下次运行将从offset {offset} 继续")
+                    self.save_checkpoint()
                 break
             
+            items = [to_builtins(item) for item in items]
+            pages += 1
+            
+            # 如果返回的数量小于请求的数量，表示没有更多数据
+            if len(items) < current_batch_size + overlap:
+                has_more = False
+            
+            # 以已获取的发布为锚点重新定位本页，跳过重复项，必要时补回漏掉的发布；
+            # 不重叠时本页本来就不含已获取的发布，无法定位，不做检测（否则每页都会回退）
+            if overlap > 0:
+                items, page_start = self._reanchor_page(items, page_start, seen_ids, batch_size)
+            
             # 添加到结果中
-            all_items.extend(items)
+            new_items = [item for item in items if item.get("id") not in seen_ids]
+            self.list_drift['duplicates'] += len(items) - len(new_items)
+            all_items.extend(new_items)
+            seen_ids.update(item.get("id") for item in new_items)
             
-            self.logger.info(f"已获取 {len(items)} 个发布项，总计: {len(all_items)}，offset: {offset}")
+            self.logger.info(f"已获取 {len(new_items)} 个发布项，总计: {len(all_items)}，offset: {page_start}")
             
-            # 如果返回的数量小于请求的数量，表示没有更多数据
-            if len(items) < current_batch_size:
+            if incremental and has_more and all(item.get("id") in self.processed_ids for item in new_items):
                 has_more = False
+                self.logger.info("本页发布都已处理过，停止增量获取")
+            elif not has_more:
                 self.logger.info("已获取所有发布项")
             
-            # 更新offset
-            offset += len(items)
+            # 更新offset（本页最后一条之后的位置）
+            offset = page_start + len(items)
             
-            # 每获取100个项目保存一次检查点
-            if len(all_items) % 100 == 0:
+            if incremental:
+                continue
+            
+            # 记录分页进度，列表获取完毕后清除
+            if has_more:
+                self.list_state = {
+                    'offset': offset,
+                    'items': all_items,
+                    'updated': datetime.now()
+                }
+            else:
+                self.list_state = None
+            
+            # 每获取2页（以及列表获取完毕时）保存一次检查点
+            if pages % 2 == 0 or not has_more:
                 self.save_checkpoint()
         
-        return all_items
+        self._report_drift()
+        
+        # 继续的分页进度可能已超过本次的获取上限
+        return all_items[:limit] if limit > 0 else all_items
     
-    def _fetch_releases_batch(self, offset: int, limit: int) -> Tuple[List[Dict[str, Any]], bool]:
+    @staticmethod
+    def _new_drift_stats() -> Dict[str, int]:
+        """创建分页漂移统计"""
+        return {
+            'duplicates': 0,        # 因新发布插入而重复返回的条目
+            'inserted_shift': 0,    # 检测到的插入偏移
+            'removed_shift': 0,     # 检测到的删除偏移
+            'recovered': 0,         # 回退重新获取后补回的条目（否则会被漏掉）
+            'anchor_lost': 0,       # 回退后仍找不到锚点的次数，可能有漏掉的条目
+        }
+    
+    def _reanchor_page(self, items: List[Dict[str, Any]], page_start: int, seen_ids: set, batch_size: int) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        以本页中最后一条已获取的发布为锚点重新定位本页
+        
+        列表按offset分页，爬取期间有新发布时后面的页整体后移，出现重复条目；
+        有发布被删除时整体前移，锚点落到本页之前，本页之前的条目会被漏掉，此时向前回退重新获取
+        
+        Args:
+            items: 本页条目（包含与上一页重叠的部分）
+            page_start: 本页的起始offset
+            seen_ids: 已获取的发布ID
+            batch_size: 每批次获取的数量，也是回退的步长
+        
+        Returns:
+            Tuple[List[Dict[str, Any]], int]: (锚点之后的条目, 这些条目的起始offset)
+        """
+        overlap = self.page_overlap
+        anchor = self._last_seen_index(items, seen_ids)
+        
+        if anchor >= 0:
+            shift = anchor - (overlap - 1)
+            if shift > 0:
+                self.list_drift['inserted_shift'] += shift
+                self.logger.warning(f"检测到分页漂移：offset {page_start} 之前新增了 {shift} 个发布，已重新定位")
+            elif shift < 0:
+                self.list_drift['removed_shift'] += -shift
+                self.logger.warning(f"检测到分页漂移：offset {page_start} 之前删除了 {-shift} 个发布，已重新定位")
+            # 重叠部分之外的已获取条目是插入导致的重复
+            self.list_drift['duplicates'] += max(shift, 0)
+            return items[anchor + 1:], page_start + anchor + 1
+        
+        # 本页没有任何已获取的发布：锚点前移到了本页之前，向前回退查找
+        back_start = page_start
+        for step in range(1, self.drift_max_steps + 1):
+            if back_start == 0:
+                break
+            back_start = max(0, page_start - step * batch_size)
+            back_items, success = self._fetch_releases_batch_with_retry(back_start, page_start - back_start)
+            if not success:
+                break
+            back_items = [to_builtins(item) for item in back_items]
+            
+            anchor = self._last_seen_index(back_items, seen_ids)
+            if anchor >= 0:
+                recovered = back_items[anchor + 1:]
+                self.list_drift['removed_shift'] += (page_start + overlap - 1) - (back_start + anchor)
+                self.list_drift['recovered'] += len(recovered)
+                self.logger.warning(f"检测到分页漂移：回退到offset {back_start} 找到锚点，补回 {len(recovered)} 个发布")
+                return recovered + items, back_start + anchor + 1
+        
+        self.list_drift['anchor_lost'] += 1
+        self.logger.warning(f"检测到分页漂移：offset {page_start} 附近找不到上一页的发布，可能漏掉了部分发布")
+        return items, page_start
+    
+    @staticmethod
+    def _last_seen_index(items: List[Dict[str, Any]], seen_ids: set) -> int:
+        """返回最后一条已获取的发布在列表中的位置，没有时返回-1"""
+        for index in range(len(items) - 1, -1, -1):
+            if items[index].get("id") in seen_ids:
+                return index
+        return -1
+    
+    def _report_drift(self) -> None:
+        """输出分页漂移统计"""
+        drift = self.list_drift
+        if drift['inserted_shift'] or drift['removed_shift'] or drift['anchor_lost']:
+            self.logger.warning(
+                f"列表获取期间发生分页漂移：重复 {drift['duplicates']} 条（不含页间重叠），"
+                f"新增偏移 {drift['inserted_shift']}，删除偏移 {drift['removed_shift']}，"
+                f"补回 {drift['recovered']} 条，锚点丢失 {drift['anchor_lost']} 次"
+            )
+    
+    def _resumable_list_state(self) -> Optional[Dict[str, Any]]:
+        """
+        获取可以继续的列表分页进度
+        
+        Returns:
+            Optional[Dict[str, Any]]: 分页进度（offset/items/updated），没有或已过期时返回None
+        """
+        state = self.list_state
+        if not state:
+            return None
+        
+        age_hours = (datetime.now() - state['updated']).total_seconds() / 3600
+        if age_hours > self.list_state_max_age:
+            self.logger.info(f"列表分页进度已过期（{age_hours:.1f} 小时前），重新获取列表")
+            self.list_state = None
+            return None
+        
+        return state
+    
+    def _fetch_releases_batch_with_retry(self, offset: int, limit: int) -> Tuple[List[Any], bool]:
+        """
+        获取一批产品发布列表，失败时按指数退避重试
+        
+        Args:
+            offset: 偏移量
+            limit: 获取数量
+        
+        Returns:
+            Tuple[List[Any], bool]: (产品发布列表, 是否成功)
+        """
+        for attempt in range(self.list_max_retries + 1):
+            if attempt > 0:
+                # 指数退避，加上随机抖动避免与其它请求同时重试
+                delay = self.retry_backoff * (2 ** (attempt - 1))
+                delay += random.uniform(0, self.retry_backoff)
+                self.logger.warning(f"第 {attempt} 次重试获取产品发布列表，offset: {offset}，等待 {delay:.1f} 秒")
+                METRICS.inc(f'{PREFIX}_retries_total', help='失败后重试的请求数', endpoint='list')
+                time.sleep(delay)
+            
+            with stage('list_page'):
+                items, success = self._fetch_releases_batch(offset, limit)
+            if success:
+                return items, True
+        
+        return [], False
+    
+    def _fetch_releases_batch(self, offset: int, limit: int) -> Tuple[List[Any], bool]:
         """
         获取一批产品发布列表
         
@@ -195,7 +533,7 @@ class GraphQLScraper:
             limit: 获取数量
         
         Returns:
-            Tuple[List[Dict[str, Any]], bool]: (产品发布列表, 是否成功)
+            Tuple[List[Any], bool]: (产品发布列表, 是否成功)，列表项为字典或类型化结构体，均支持get()
         """
         # 构建GraphQL查询
         query = """
@@ -237,37 +575,28 @@ class GraphQLScraper:
         
         try:
             # 发送请求
-            response = requests.post(
-                self.api_url,
-                headers=self.get_headers(),
-                json=payload,
-                verify=self.verify_ssl,
-                timeout=30
-            )
+            response = self._post(payload, 'list')
             
             # 检查状态码
             if response.status_code != 200:
                 self.logger.error(f"请求失败，状态码: {response.status_code}")
                 return [], False
             
-            # 解析响应
-            data = response.json()
+            # 直接从响应字节解码出产品发布列表
+            items, errors = self.decoder.decode_releases(response.content)
             
             # 检查是否有错误
-            if "errors" in data:
-                self.logger.error(f"GraphQL查询出错: {data['errors']}")
+            if errors is not None:
+                self.logger.error(f"GraphQL查询出错: {errors}")
                 return [], False
             
-            # 提取产品发布列表
-            items = data.get("data", {}).get("releases", {}).get("items", [])
-            
             return items, True
             
         except Exception as e:
             self.logger.error(f"获取产品发布列表失败: {e}")
             return [], False
     
-    def get_release_detail(self, release_id: str) -> Optional[Dict[str, Any]]:
+    def get_release_detail(self, release_id: str) -> Optional[Any]:
         """
         获取产品发布详情
         
@@ -275,9 +604,28 @@ class GraphQLScraper:
             release_id: 产品发布ID
         
         Returns:
-            Optional[Dict[str, Any]]: 产品发布详情，失败时返回None
+            Optional[Any]: 产品发布详情（字典或类型化结构体，均支持get()），失败时返回None
+        """
+        try:
+            return self.fetch_release_detail(release_id)
+        except ReleaseDetailError as e:
+            self.logger.error(f"获取产品发布详情失败: {release_id}, {type(e).__name__}: {e}")
+            return None
+    
+    def fetch_release_detail(self, release_id: str) -> Any:
+        """
+        获取产品发布详情，失败时抛出对应类型的异常
+        
+        Args:
+            release_id: 产品发布ID
+        
+        Returns:
+            Any: 产品发布详情（字典或类型化结构体，均支持get()）
+        
+        Raises:
+            ReleaseDetailError: 获取失败，子类区分具体的错误类型
         """
-        self.logger.info(f"获取产品发布详情: {release_id}")
+        self.logger.info(f"获取产品发布详情: {release_id}", extra={'aggregate': '获取详情'})
         
         # 使用完整的GraphQL查询格式
         query = """query GetRelease($id: ID!) {
@@ -459,39 +807,28 @@ fragment Content on Content {
         
         try:
             # 发送请求
-            response = requests.post(
-                self.api_url,
-                headers=self.get_headers(),
-                json=payload,
-                verify=self.verify_ssl,
-                timeout=30
-            )
-            
-            # 检查状态码
-            if response.status_code != 200:
-                self.logger.error(f"请求失败，状态码: {response.status_code}")
-                return None
-            
-            # 解析响应
-            data = response.json()
-            
-            # 检查是否有错误
-            if "errors" in data:
-                self.logger.error(f"GraphQL查询出错: {data['errors']}")
-                return None
-            
-            # 提取产品发布详情
-            release = data.get("data", {}).get("release")
-            
-            if not release:
-                self.logger.error(f"未找到产品发布详情: {release_id}")
-                return None
-            
-            return release
-            
+            response = self._post(payload, 'detail')
+        except requests.RequestException as e:
+            raise RequestFailedError(str(e)) from e
+        
+        # 检查状态码
+        if response.status_code != 200:
+            raise HTTPStatusError(f"请求失败，状态码: {response.status_code}")
+        
+        try:
+            # 直接从响应字节解码出产品发布详情
+            release, errors = self.decoder.decode_release_detail(response.content)
         except Exception as e:
-            self.logger.error(f"获取产品发布详情失败: {e}")
-            return None
+            raise InvalidResponseError(f"响应解码失败: {e}") from e
+        
+        # 检查是否有错误
+        if errors is not None:
+            raise GraphQLQueryError(f"GraphQL查询出错: {errors}")
+        
+        if not release:
+            raise ReleaseNotFoundError(f"未找到产品发布详情: {release_id}")
+        
+        return release
     
     def extract_release_info(self, item: Dict[str, Any]) -> UnifiRelease:
         """
@@ -519,8 +856,26 @@ fragment Content on Content {
         # 将标签作为JSON存储
         release.tags = json.dumps(item.get("tags", []))
         
+        # 列表中已包含浏览/评论统计
+        release.views, release.comments = self.extract_stats(item)
+        release.last_activity_at = item.get("lastActivityAt") or ""
+        
         return release
     
+    @staticmethod
+    def extract_stats(item: Dict[str, Any]) -> Tuple[int, int]:
+        """
+        提取列表项中的浏览/评论统计
+        
+        Args:
+            item: API返回的单个产品发布数据
+        
+        Returns:
+            Tuple[int, int]: (浏览次数, 评论数)
+        """
+        stats = item.get("stats") or {}
+        return stats.get("views") or 0, stats.get("comments") or 0
+    
     def process_release_detail(self, release: UnifiRelease, detail: Dict[str, Any]) -> None:
         """
         处理产品发布详情
@@ -529,6 +884,9 @@ fragment Content on Content {
             release: 产品发布模型
             detail: 产品发布详情数据
         """
+        # 记录发布分组ID，时间轴据此合并统一固件
+        release.group_id = detail.get("groupId") or ""
+        
         # 提取发布说明
         release_notes = []
         
@@ -585,12 +943,15 @@ fragment Content on Content {
             
             release.download_links = json.dumps(download_links)
     
-    def process_releases(self, limit: int = 0) -> int:
+    def process_releases(self, limit: int = 0, budget: int = 0, reverify_limit: int = 50, incremental: bool = False) -> int:
         """
-        处理产品发布信息
+        处理产品发布信息，按调度器给出的优先级获取详情
         
         Args:
             limit: 最大处理数量，0表示不限制
+            budget: 本次运行的详情请求预算，0表示不限制
+            reverify_limit: 本次运行最多重新校验的已入库发布数量
+            incremental: 只获取列表开头的新发布（见fetch_all_releases）
         
         Returns:
             int: 处理的数量
@@ -598,7 +959,8 @@ fragment Content on Content {
         self.logger.info(f"开始处理产品发布信息，最大数量: {'不限制' if limit == 0 else limit}")
         
         # 获取产品发布列表
-        releases = self.fetch_all_releases(limit=limit)
+        with stage('fetch_list'):
+            releases = self.fetch_all_releases(limit=limit, incremental=incremental)
         
         if not releases:
             self.logger.error("未获取到产品发布信息")
@@ -606,71 +968,348 @@ fragment Content on Content {
         
         self.logger.info(f"获取到 {len(releases)} 个产品发布信息")
         
-        # 处理每个产品发布
+        # 之前失败过的发布，处理成功后从死信集合移除
+        failed_ids = self.storage.get_failed_release_ids()
+        
+        # 新发布优先，其次是有新活动的发布，再按衰减间隔重新校验旧发布；其余已处理的发布跳过
+        scheduler = CrawlScheduler(budget=budget, reverify_limit=reverify_limit)
+        plan = scheduler.plan(releases, self.processed_ids, self.storage.get_crawl_state())
+        self.logger.info(f"跳过 {len(releases) - len(plan)} 个已处理且无需更新的发布")
+        
+        # 按计划处理产品发布
         processed_count = 0
-        for item in releases:
+        self.save_outcomes = Counter()
+        for item, reason in plan:
             release_id = item.get("id")
-            
-            # 跳过已处理的发布
-            if release_id in self.processed_ids:
-                self.logger.info(f"跳过已处理的发布: {item.get('title')} {item.get('version')}")
-                continue
+            self.logger.debug(f"调度原因: {REASON_NAMES[reason]}, {item.get('title')} {item.get('version')}")
             
             try:
-                # 提取基本信息
-                release = self.extract_release_info(item)
+                # 提取基本信息并获取详情
+                release = self.build_release(item)
+                self.save_processed_release(release, resolve_failure=release_id in failed_ids)
+                processed_count += 1
                 
-                # 获取详情
-                detail = self.get_release_detail(release_id)
-                
-                if detail is not None:
-                    # 处理详情
-                    self.process_release_detail(release, detail)
-                
-                # 保存到数据库
-                success = self.storage.save_release(release)
-                
-                if success:
-                    # 标记为已处理
-                    self.processed_ids.add(release_id)
-                    processed_count += 1
-                    
-                    self.logger.info(f"已处理: {release.product_name} {release.version}")
-                    
-                    # 每处理10个保存一次检查点
-                    if processed_count % 10 == 0:
-                        self.save_checkpoint()
-                else:
-                    self.logger.error(f"保存失败: {release.product_name} {release.version}")
+                # 每处理10个保存一次检查点
+                if processed_count % 10 == 0:
+                    self.save_checkpoint()
                     
             except Exception as e:
-                self.logger.error(f"处理产品发布信息失败: {release_id}, 错误: {e}")
-                # 继续处理下一个，不中断整个过程
+                # 记录到死信集合，继续处理下一个，不中断整个过程
+                self.record_failure(item, e)
                 continue
         
         # 保存检查点
         self.save_checkpoint()
+        self.refresh_stats_if_changed()
         
         self.logger.info(f"处理完成，共处理 {processed_count} 个产品发布信息")
         
         return processed_count
     
-    def scrape(self, limit: int = 0) -> bool:
+    def refresh_stats(self, batch_size: int = 50, history: bool = False) -> int:
+        """
+        只分页获取列表，批量更新已入库发布的浏览/评论统计，不请求详情接口
+        
+        Args:
+            batch_size: 每批次获取的数量
+            history: 是否同时写入热度时间序列集合
+        
+        Returns:
+            int: 更新的发布数量
+        """
+        self.logger.info(f"开始刷新发布统计，批次大小: {batch_size}")
+        
+        offset = 0
+        seen_ids = set()
+        updated = 0
+        
+        while True:
+            items, success = self._fetch_releases_batch_with_retry(offset, batch_size)
+            if not success:
+                self.logger.error(f"获取产品发布列表失败，统计刷新在offset {offset} 中止")
+                break
+            
+            # 分页漂移可能返回重复条目，同一次刷新中只更新一次
+            rows = []
+            for item in items:
+                release_id = item.get("id")
+                if not release_id or release_id in seen_ids:
+                    continue
+                seen_ids.add(release_id)
+                views, comments = self.extract_stats(item)
+                rows.append({'release_id': release_id, 'views': views, 'comments': comments})
+            
+            with stage('db_write'):
+                updated += self.storage.update_release_stats(rows, history=history)
+            
+            if len(items) < batch_size:
+                break
+            offset += len(items)
+        
+        self.logger.info(f"统计刷新完成，列表共 {len(seen_ids)} 个发布，更新 {updated} 个")
+        return updated
+    
+    def build_release(self, item: Dict[str, Any]) -> UnifiRelease:
+        """
+        根据列表项获取详情并构建产品发布模型
+        
+        Args:
+            item: API返回的单个产品发布数据
+        
+        Returns:
+            UnifiRelease: 产品发布模型
+        
+        Raises:
+            ReleaseDetailError: 获取详情失败
+        """
+        with stage('transform'):
+            release = self.extract_release_info(item)
+        with stage('detail_fetch'):
+            detail = self.fetch_release_detail(item.get("id"))
+        with stage('transform'):
+            self.process_release_detail(release, detail)
+        return release
+    
+    def save_processed_release(self, release: UnifiRelease, resolve_failure: bool = False) -> str:
+        """
+        保存产品发布并标记为已处理
+        
+        Args:
+            release: 产品发布模型
+            resolve_failure: 是否从死信集合中移除该发布
+        
+        Returns:
+            str: 保存结果（SAVE_INSERTED/SAVE_CHANGED/SAVE_UNCHANGED）
+        
+        Raises:
+            SaveFailedError: 保存失败
+        """
+        with stage('db_write'):
+            saved = self.storage.save_release(release)
+        if not saved:
+            raise SaveFailedError(f"保存失败: {release.product_name} {release.version}")
+        
+        self.save_outcomes[saved] += 1
+        self.processed_ids.add(release.release_id)
+        if resolve_failure:
+            self.storage.resolve_failure(release.release_id)
+        self.logger.info(f"已处理: {release.product_name} {release.version}", extra={'aggregate': '已处理'})
+        return saved
+    
+    def refresh_stats_if_changed(self) -> None:
+        """本轮有新插入或内容变化的发布时，重新汇总时间轴统计（写入release_stats集合）"""
+        if self.save_outcomes[SAVE_INSERTED] or self.save_outcomes[SAVE_CHANGED]:
+            with stage('refresh_stats'):
+                self.storage.refresh_stats()
+    
+    def record_failure(self, item: Dict[str, Any], error: Exception) -> None:
+        """
+        把处理失败的发布记录到死信集合
+        
+        Args:
+            item: API返回的单个产品发布数据
+            error: 失败原因
+        """
+        release_id = item.get("id")
+        error_class = type(error).__name__
+        self.logger.error(f"处理产品发布信息失败: {release_id}, {error_class}: {error}")
+        self.storage.record_failure(release_id, error_class, str(error), to_builtins(item))
+    
+    def build_releases_concurrently(self, items: List[Dict[str, Any]], workers: int = 4):
+        """
+        并发获取详情并构建产品发布模型，按输入顺序逐个返回结果
+        
+        详情请求在线程池中执行，调用方在当前线程中写入数据库
+        
+        Args:
+            items: 发布列表项
+            workers: 并发获取详情的线程数
+        
+        Returns:
+            (列表项, 产品发布模型或None, 异常或None) 的迭代器
+        """
+        def fetch(item):
+            try:
+                return item, self.build_release(item), None
+            except Exception as e:
+                return item, None, e
+        
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            yield from executor.map(fetch, items)
+    
+    def enqueue_releases(self, queue, limit: int = 0, budget: int = 0, reverify_limit: int = 50) -> int:
+        """
+        获取列表并按调度优先级把需要获取详情的发布写入工作队列
+        
+        Args:
+            queue: MongoWorkQueue工作队列
+            limit: 最大获取数量，0表示不限制
+            budget: 本次入队的数量上限，0表示不限制
+            reverify_limit: 最多重新校验的已入库发布数量
+        
+        Returns:
+            int: 入队的数量
+        """
+        with stage('fetch_list'):
+            releases = self.fetch_all_releases(limit=limit)
+        if not releases:
+            self.logger.error("未获取到产品发布信息")
+            return 0
+        
+        # 工作进程不写本地检查点，已入库的发布同样视为已处理
+        crawl_state = self.storage.get_crawl_state()
+        scheduler = CrawlScheduler(budget=budget, reverify_limit=reverify_limit)
+        plan = scheduler.plan(releases, self.processed_ids | set(crawl_state), crawl_state)
+        
+        queue.ensure_indexes()
+        enqueued = 0
+        for reason in REASON_NAMES:
+            items = [item for item, item_reason in plan if item_reason == reason]
+            if items:
+                enqueued += queue.enqueue(items, priority=reason)
+        
+        self.save_checkpoint()
+        self.logger.info(f"已入队 {enqueued} 个发布，队列状态: {queue.counts()}")
+        return enqueued
+    
+    def work_queue(self, queue, worker_id: str, claim_batch: int = 10, workers: int = 4) -> Tuple[int, int]:
+        """
+        作为工作进程领取队列中的发布，获取并保存详情后确认，直到队列中没有可领取的发布
+        
+        Args:
+            queue: MongoWorkQueue工作队列
+            worker_id: 工作进程标识
+            claim_batch: 每次领取的数量
+            workers: 并发获取详情的线程数
+        
+        Returns:
+            Tuple[int, int]: (成功数量, 失败数量)
+        """
+        self.logger.info(f"工作进程 {worker_id} 开始领取队列，每次领取: {claim_batch}，并发数: {workers}")
+        failed_ids = self.storage.get_failed_release_ids()
+        succeeded = failed = 0
+        self.save_outcomes = Counter()
+        
+        while True:
+            claimed = queue.claim(worker_id, batch_size=claim_batch)
+            if not claimed:
+                break
+            
+            attempts = {doc['_id']: doc.get('attempts', 1) for doc in claimed}
+            items = [doc.get('item') or {'id': doc['_id']} for doc in claimed]
+            
+            for item, release, error in self.build_releases_concurrently(items, workers):
+                release_id = item.get("id")
+                if error is None:
+                    try:
+                        self.save_processed_release(release, resolve_failure=release_id in failed_ids)
+                        if not queue.ack(release_id, worker_id):
+                            self.logger.warning(f"确认失败，租约已过期或被其它工作进程接管: {release_id}")
+                        succeeded += 1
+                    except SaveFailedError as e:
+                        error = e
+                if error is not None:
+                    self.record_failure(item, error)
+                    queue.fail(release_id, worker_id, f"{type(error).__name__}: {error}", attempts[release_id])
+                    failed += 1
+
+                # 每处理一个发布续约一次，整批耗时超过租约时不会被重复领取
+                queue.renew(worker_id)
+        
+        self.refresh_stats_if_changed()
+        self.logger.info(f"工作进程 {worker_id} 完成，成功 {succeeded} 个，失败 {failed} 个")
+        return succeeded, failed
+    
+    def retry_failed(self, workers: int = 4, limit: int = 0) -> Tuple[int, int]:
+        """
+        重试死信集合中的发布，并发获取详情，无需重新获取列表
+        
+        Args:
+            workers: 并发获取详情的线程数
+            limit: 最大重试数量，0表示不限制
+        
+        Returns:
+            Tuple[int, int]: (成功数量, 仍然失败的数量)
+        """
+        failures = self.storage.get_failed_releases(limit=limit)
+        if not failures:
+            self.logger.info("没有需要重试的失败发布")
+            return 0, 0
+        
+        self.logger.info(f"开始重试 {len(failures)} 个失败的发布，并发数: {workers}")
+        
+        items = [failure.get('item') or {'id': failure['release_id']} for failure in failures]
+        succeeded = 0
+        self.save_outcomes = Counter()
+        
+        for item, release, error in self.build_releases_concurrently(items, workers):
+            if error is None:
+                try:
+                    self.save_processed_release(release, resolve_failure=True)
+                    succeeded += 1
+                    continue
+                except SaveFailedError as e:
+                    error = e
+            self.record_failure(item, error)
+        
+        self.save_checkpoint()
+        self.refresh_stats_if_changed()
+        
+        failed = len(items) - succeeded
+        self.logger.info(f"重试完成，成功 {succeeded} 个，仍然失败 {failed} 个")
+        return succeeded, failed
+    
+    def run_once(self, limit: int = 0, budget: int = 0, reverify_limit: int = 50, incremental: bool = False) -> Dict[str, int]:
+        """
+        执行一轮爬取，保持数据库连接和HTTP连接池，供守护进程重复调用
+        
+        Args:
+            limit: 最大处理数量，0表示不限制
+            budget: 本次运行的详情请求预算，0表示不限制
+            reverify_limit: 本次运行最多重新校验的已入库发布数量
+            incremental: 只获取列表开头的新发布
+        
+        Returns:
+            Dict[str, int]: 处理的数量（processed），以及其中新插入（inserted）和内容有变化（changed）的数量
+        """
+        self.save_outcomes = Counter()
+        try:
+            processed = self.process_releases(limit=limit, budget=budget, reverify_limit=reverify_limit, incremental=incremental)
+        except Exception as e:
+            self.logger.error(f"爬取失败: {e}")
+            # 尝试保存检查点
+            self.save_checkpoint()
+            processed = 0
+        # 出错前已保存的发布也计入
+        return {
+            'processed': processed,
+            'inserted': self.save_outcomes[SAVE_INSERTED],
+            'changed': self.save_outcomes[SAVE_CHANGED]
+        }
+    
+    def close(self) -> None:
+        """关闭HTTP连接池和数据库连接"""
+        self.session.close()
+        self.storage.close()
+    
+    def scrape(self, limit: int = 0, budget: int = 0, reverify_limit: int = 50) -> bool:
         """
         执行爬取
         
         Args:
             limit: 最大处理数量，0表示不限制
+            budget: 本次运行的详情请求预算，0表示不限制
+            reverify_limit: 本次运行最多重新校验的已入库发布数量
         
         Returns:
             bool: 是否成功
         """
         try:
             # 处理产品发布信息
-            processed_count = self.process_releases(limit=limit)
+            processed_count = self.process_releases(limit=limit, budget=budget, reverify_limit=reverify_limit)
             
-            # 关闭数据库连接
-            self.storage.close()
+            # 关闭HTTP连接池和数据库连接
+            self.close()
             
             return processed_count > 0
             
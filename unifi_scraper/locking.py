@@ -0,0 +1,332 @@
+"""
+运行锁模块
+防止同一任务的多个实例同时运行（例如爬取超过cron间隔时又启动了一次）。
+本地使用锁文件，多台主机共享时使用MongoDB中的租约文档；两者都能识别持有者已退出的过期锁
+"""
+import os
+import json
+import time
+import socket
+import logging
+import threading
+from typing import Dict, Any, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows没有fcntl
+    fcntl = None
+
+import pymongo
+from pymongo.errors import DuplicateKeyError
+
+
+# MongoDB锁集合
+RUN_LOCKS_COLLECTION = 'run_locks'
+
+
+def _owner_id() -> str:
+    """锁持有者标识：主机名-进程号"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def _pid_alive(pid: int) -> bool:
+    """判断本机进程是否仍在运行"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        # 进程存在但属于其它用户，或平台不支持信号0
+        return True
+    return True
+
+
+class RunLock:
+    """
+    运行锁基类
+
+    子类实现_try_acquire/release；acquire在wait为True时排队等待当前持有者结束，
+    获取失败时调用close()释放锁占用的连接等资源
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.owner = _owner_id()
+        self.acquired = False
+        self.logger = logging.getLogger(__name__)
+
+    def _try_acquire(self) -> bool:
+        raise NotImplementedError
+
+    def holder(self) -> Optional[Dict[str, Any]]:
+        """当前持有者信息，没有时返回None"""
+        raise NotImplementedError
+
+    def release(self) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """释放锁占用的资源（不影响锁本身），默认无需处理"""
+
+    def acquire(self, wait: bool = False, timeout: float = 0, poll_interval: float = 5) -> bool:
+        """
+        获取锁
+
+        Args:
+            wait: 锁被占用时是否排队等待
+            timeout: 最长等待时间（秒），0表示一直等待
+            poll_interval: 等待时的检查间隔（秒）
+
+        Returns:
+            bool: 是否获取成功
+        """
+        deadline = time.time() + timeout if timeout > 0 else None
+        waiting_logged = False
+
+        while True:
+            if self._try_acquire():
+                self.acquired = True
+                self.logger.info(f"已获取运行锁: {self.name}")
+                return True
+
+            holder = self.holder()
+            if not wait:
+                self.logger.warning(f"运行锁 {self.name} 被占用，持有者: {holder}")
+                self.close()
+                return False
+            if deadline is not None and time.time() >= deadline:
+                self.logger.warning(f"等待运行锁 {self.name} 超时，持有者: {holder}")
+                self.close()
+                return False
+            if not waiting_logged:
+                self.logger.info(f"运行锁 {self.name} 被占用，等待当前运行结束，持有者: {holder}")
+                waiting_logged = True
+            time.sleep(poll_interval)
+
+    def __enter__(self) -> 'RunLock':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.release()
+
+
+class FileRunLock(RunLock):
+    """
+    本地锁文件
+
+    锁文件中记录持有者的主机名、进程号和获取时间；同一主机上的持有者按进程是否存活判断
+    （长时间运行的守护进程不会被接管），其它主机的持有者在获取时间超过stale_seconds后视为过期锁并接管。
+    接管时在<path>.takeover上加flock，并在删除前重新确认锁文件仍是那条过期记录，
+    避免两个实例同时接管时后者删掉前者刚写入的新锁文件
+    """
+
+    def __init__(self, path: str, stale_seconds: float = 6 * 3600):
+        """
+        Args:
+            path: 锁文件路径
+            stale_seconds: 其它主机持有锁的最长时间（秒），超过后视为过期，0表示不按时间判断
+        """
+        super().__init__(path)
+        self.path = path
+        self.stale_seconds = stale_seconds
+
+    def holder(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            # 锁文件正在写入或已损坏
+            return {}
+
+    def _is_stale(self, holder: Dict[str, Any]) -> bool:
+        """判断锁文件是否已过期"""
+        if not holder:
+            # 无法解析的锁文件，按修改时间判断
+            try:
+                age = time.time() - os.path.getmtime(self.path)
+            except OSError:
+                return False
+            return age > 60
+
+        if holder.get('host') == socket.gethostname():
+            # 本机持有者只要进程还在就不是过期锁
+            return not _pid_alive(holder.get('pid', 0))
+
+        # 其它主机（如共享目录上的锁文件）无法检查进程，按持有时间判断
+        if self.stale_seconds > 0:
+            started = holder.get('started', 0)
+            return time.time() - started > self.stale_seconds
+        return False
+
+    def _try_acquire(self) -> bool:
+        for _ in range(3):
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                holder = self.holder()
+                if holder is None:
+                    # 锁文件刚被删除，再试一次
+                    continue
+                if not self._is_stale(holder):
+                    return False
+                if self._remove_stale(holder):
+                    self.logger.warning(f"发现过期的锁文件，持有者: {holder}，已接管")
+                continue
+
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'host': socket.gethostname(),
+                    'pid': os.getpid(),
+                    'owner': self.owner,
+                    'started': time.time()
+                }, f)
+            return True
+        return False
+
+    def _remove_stale(self, stale: Dict[str, Any]) -> bool:
+        """
+        在接管锁下删除过期的锁文件
+
+        Args:
+            stale: 判定为过期时读到的持有者记录
+
+        Returns:
+            bool: 是否删除了锁文件；锁文件已被其它实例接管或删除时返回False
+        """
+        guard = open(f"{self.path}.takeover", 'a')
+        try:
+            if fcntl is not None:
+                fcntl.flock(guard.fileno(), fcntl.LOCK_EX)
+            current = self.holder()
+            if current is None or current != stale or not self._is_stale(current):
+                return False
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                return False
+            return True
+        finally:
+            # 关闭文件即释放flock
+            guard.close()
+
+    def release(self) -> None:
+        if not self.acquired:
+            return
+        holder = self.holder()
+        if holder and holder.get('owner') == self.owner:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+        self.acquired = False
+        self.logger.info(f"已释放运行锁: {self.name}")
+
+
+class MongoRunLock(RunLock):
+    """
+    MongoDB租约锁，供多台主机共享
+
+    锁文档带有过期时间，持有期间由后台线程定期续约；持有者崩溃后租约过期，其它实例即可获取。
+    获取时间和过期时间都使用MongoDB服务器时钟（$$NOW，需要MongoDB 4.2+），不受各主机时区和时钟偏差影响
+    """
+
+    def __init__(self, name: str, mongo_uri: Optional[str] = None, mongo_db: Optional[str] = None,
+                 lease_seconds: int = 600):
+        """
+        Args:
+            name: 锁名称
+            mongo_uri: MongoDB连接字符串，默认读取MONGO_URI
+            mongo_db: 数据库名称，默认读取MONGO_DATABASE
+            lease_seconds: 租约时长（秒），续约间隔为其三分之一
+        """
+        super().__init__(name)
+        self.mongo_uri = mongo_uri or os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
+        self.mongo_db = mongo_db or os.getenv('MONGO_DATABASE', 'unifi_releases')
+        self.lease_seconds = lease_seconds
+        self.client = None
+        self._stop_renew = threading.Event()
+        self._renew_thread = None
+
+    @property
+    def collection(self):
+        """锁集合，首次使用时才连接MongoDB"""
+        if self.client is None:
+            self.client = pymongo.MongoClient(self.mongo_uri)
+        return self.client[self.mongo_db][RUN_LOCKS_COLLECTION]
+
+    def holder(self) -> Optional[Dict[str, Any]]:
+        return self.collection.find_one({'_id': self.name})
+
+    def _lease_expiry(self) -> Dict[str, Any]:
+        """以服务器当前时间计算的租约过期时间表达式"""
+        return {'$add': ['$$NOW', self.lease_seconds * 1000]}
+
+    def _try_acquire(self) -> bool:
+        try:
+            self.collection.update_one(
+                {'_id': self.name, '$or': [{'$expr': {'$lt': ['$expires', '$$NOW']}}, {'owner': self.owner}]},
+                [{'$set': {
+                    'owner': self.owner,
+                    'acquired_at': '$$NOW',
+                    'expires': self._lease_expiry()
+                }}],
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # 锁文档存在且租约未过期
+            return False
+
+        self._stop_renew.clear()
+        self._renew_thread = threading.Thread(target=self._renew, name=f"lock-renew-{self.name}", daemon=True)
+        self._renew_thread.start()
+        return True
+
+    def _renew(self) -> None:
+        """持有期间定期续约"""
+        while not self._stop_renew.wait(self.lease_seconds / 3):
+            result = self.collection.update_one(
+                {'_id': self.name, 'owner': self.owner},
+                [{'$set': {'expires': self._lease_expiry()}}]
+            )
+            if result.matched_count == 0:
+                self.logger.error(f"运行锁 {self.name} 已被其它实例接管")
+                return
+
+    def release(self) -> None:
+        self._stop_renew.set()
+        if self._renew_thread is not None:
+            self._renew_thread.join()
+            self._renew_thread = None
+        if self.acquired:
+            self.collection.delete_one({'_id': self.name, 'owner': self.owner})
+            self.acquired = False
+            self.logger.info(f"已释放运行锁: {self.name}")
+        self.close()
+
+    def close(self) -> None:
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+
+
+def create_run_lock(kind: str, name: str, lock_file: Optional[str] = None) -> Optional[RunLock]:
+    """
+    按类型创建运行锁
+
+    Args:
+        kind: file（本地锁文件）、mongo（MongoDB租约）或none（不加锁）
+        name: 锁名称，MongoDB锁直接使用，锁文件默认为<name>.lock
+        lock_file: 锁文件路径
+
+    Returns:
+        Optional[RunLock]: 运行锁，kind为none时返回None
+    """
+    if kind == 'none':
+        return None
+    if kind == 'mongo':
+        return MongoRunLock(name)
+    if kind == 'file':
+        return FileRunLock(lock_file or f"{name}.lock")
+    raise ValueError(f"未知的运行锁类型: {kind}")
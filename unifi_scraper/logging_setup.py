@@ -0,0 +1,213 @@
+"""
+日志配置模块
+爬取热路径上的日志通过队列交给后台线程写入文件和控制台，调用方只需把记录放入队列；
+带aggregate标记的高频日志（每个发布一条的“已处理”“更新已存在项目”等）按类型聚合，
+每个统计周期只输出前几条和可选的抽样，其余汇总为一条“共N条，省略M条”；可选输出JSON格式
+"""
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional
+
+
+# 默认日志格式
+LOG_FORMAT = '%(asctime)s [%(levelname)s] %(message)s'
+
+# LogRecord的标准属性，JSON输出时其余属性作为附加字段
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出一行JSON，extra传入的字段一并输出"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                data[key] = value
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class _AggregateState:
+    """一种日志在当前统计周期内的计数"""
+
+    __slots__ = ('started', 'count', 'suppressed', 'record')
+
+    def __init__(self, now: float):
+        self.started = now
+        self.count = 0
+        self.suppressed = 0
+        self.record: Optional[logging.LogRecord] = None
+
+
+class AggregatingQueueHandler(QueueHandler):
+    """
+    带聚合与抽样的队列处理器
+
+    记录带有aggregate属性（logger.info(..., extra={'aggregate': '类型'})）时按类型计数：
+    每个周期内前burst条照常输出，之后每sample_every条抽样输出一条，其余只计数；
+    周期结束时输出一条汇总。未带aggregate的日志不受影响
+    """
+
+    def __init__(self, log_queue, interval: float = 30.0, burst: int = 3, sample_every: int = 0):
+        """
+        Args:
+            log_queue: 日志队列
+            interval: 聚合周期（秒），0表示不聚合
+            burst: 每个周期内照常输出的条数
+            sample_every: 超过burst后每隔多少条抽样输出一条，0表示不抽样
+        """
+        super().__init__(log_queue)
+        self.interval = interval
+        self.burst = burst
+        self.sample_every = sample_every
+        self._states: Dict[str, _AggregateState] = {}
+        self._state_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._flusher = None
+        if interval > 0:
+            self._flusher = threading.Thread(target=self._flush_loop, name='log-aggregate', daemon=True)
+            self._flusher.start()
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        key = getattr(record, 'aggregate', None)
+        if key is None or self.interval <= 0:
+            return super().handle(record)
+
+        summary = None
+        with self._state_lock:
+            now = time.time()
+            state = self._states.get(key)
+            if state is not None and now - state.started >= self.interval:
+                summary = self._summary(key, state, now)
+                state = None
+            if state is None:
+                state = self._states[key] = _AggregateState(now)
+            state.count += 1
+            state.record = record
+            passed = state.count <= self.burst or (
+                self.sample_every > 0 and (state.count - self.burst) % self.sample_every == 0
+            )
+            if not passed:
+                state.suppressed += 1
+
+        if summary is not None:
+            super().handle(summary)
+        return super().handle(record) if passed else False
+
+    def _summary(self, key: str, state: _AggregateState, now: float) -> Optional[logging.LogRecord]:
+        """生成一个周期的汇总记录，没有省略任何日志时返回None"""
+        if not state.suppressed:
+            return None
+        template = state.record
+        record = logging.LogRecord(
+            template.name, template.levelno, template.pathname, template.lineno,
+            f"{key}: 最近 {now - state.started:.0f} 秒共 {state.count:,} 条，省略 {state.suppressed:,} 条"
+            f"（最后一条: {template.getMessage()}）",
+            None, None, template.funcName
+        )
+        record.aggregate = key
+        record.aggregate_count = state.count
+        record.aggregate_suppressed = state.suppressed
+        return record
+
+    def flush_summaries(self, force: bool = False) -> None:
+        """
+        输出已到期（force时为全部）的汇总
+
+        Args:
+            force: 是否不论周期是否结束都输出
+        """
+        summaries: List[logging.LogRecord] = []
+        with self._state_lock:
+            now = time.time()
+            for key, state in list(self._states.items()):
+                if force or now - state.started >= self.interval:
+                    summary = self._summary(key, state, now)
+                    if summary is not None:
+                        summaries.append(summary)
+                    del self._states[key]
+        for summary in summaries:
+            super().handle(summary)
+
+    def _flush_loop(self) -> None:
+        """周期性输出汇总，使安静下来的日志类型也能及时看到汇总"""
+        while not self._stop.wait(self.interval):
+            self.flush_summaries()
+
+    def close(self) -> None:
+        self._stop.set()
+        self.flush_summaries(force=True)
+        super().close()
+
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[AggregatingQueueHandler] = None
+
+
+def setup_logging(log_file: Optional[str] = 'unifi_scraper.log', level: int = logging.INFO,
+                  json_output: bool = False, interval: float = 30.0, burst: int = 3,
+                  sample_every: int = 0) -> None:
+    """
+    配置根日志：调用线程只把记录放入队列，后台线程写入文件和标准输出
+
+    Args:
+        log_file: 日志文件路径，None表示只输出到控制台
+        level: 日志级别
+        json_output: 是否每行输出一条JSON
+        interval: 高频日志的聚合周期（秒），0表示不聚合、逐条输出
+        burst: 每个周期内每种高频日志照常输出的条数
+        sample_every: 超过burst后每隔多少条抽样输出一条，0表示不抽样
+    """
+    global _listener, _queue_handler
+    shutdown_logging()
+
+    formatter = JsonFormatter() if json_output else logging.Formatter(LOG_FORMAT)
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if log_file:
+        handlers.insert(0, logging.FileHandler(log_file, encoding='utf-8'))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    _queue_handler = AggregatingQueueHandler(log_queue, interval=interval, burst=burst, sample_every=sample_every)
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
+
+
+def shutdown_logging() -> None:
+    """输出剩余的汇总，等待队列中的日志写完并停止后台线程"""
+    global _listener, _queue_handler
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler.close()
+        _queue_handler = None
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+# 进程退出时把队列中剩余的日志写完
+atexit.register(shutdown_logging)
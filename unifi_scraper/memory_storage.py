@@ -0,0 +1,232 @@
+"""
+内存存储模块
+用进程内字典实现与MongoStorage相同的保存、读取、投影查询、死信集合和统计操作，不持久化；
+适合回放爬取、基准测试和离线生成时间轴，db提供与离线备份相同的只读集合视图
+"""
+import threading
+from datetime import datetime
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .analytics import TimelineStats
+from .bson_dump import BsonDumpCollection
+from .models import UnifiRelease
+from .storage import BaseStorage, FAILED_RELEASES_COLLECTION, classify_document, save_outcome
+
+
+class MemoryCollection(BsonDumpCollection):
+    """内存中集合的只读视图，查询方式与离线备份相同（等值过滤、顶层字段投影、sort/limit）"""
+
+    def __init__(self, documents: Dict[str, Dict[str, Any]], name: str, lock: threading.Lock):
+        """
+        Args:
+            documents: {主键: 文档}
+            name: 集合名称
+            lock: 存储的写锁，读取时复制文档快照
+        """
+        super().__init__(None, name)
+        self.documents = documents
+        self.lock = lock
+
+    def _iter_documents(self) -> Iterator[Dict[str, Any]]:
+        # 返回副本，调用方修改结果不影响存储中的文档（与从MongoDB读取一致）
+        with self.lock:
+            snapshot = list(self.documents.values())
+        return (dict(doc) for doc in snapshot)
+
+
+class MemoryDatabase:
+    """内存存储的数据库视图，未知集合返回空集合"""
+
+    def __init__(self, storage: 'MemoryStorage'):
+        self.storage = storage
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        collections = {
+            self.storage.collection_name: self.storage.releases,
+            FAILED_RELEASES_COLLECTION: self.storage.failed,
+        }
+        return MemoryCollection(collections.get(name, {}), name, self.storage.lock)
+
+
+class MemoryStorage(BaseStorage):
+    """内存存储类"""
+
+    def __init__(self, documents: Optional[Iterable[Dict[str, Any]]] = None):
+        """
+        初始化内存存储
+
+        Args:
+            documents: 预先载入的发布文档（如合成数据或备份），缺少timeline字段时自动分类
+        """
+        super().__init__()
+        # {发布ID: 文档}，保持插入顺序
+        self.releases: Dict[str, Dict[str, Any]] = {}
+        # 死信集合 {发布ID: 失败记录}
+        self.failed: Dict[str, Dict[str, Any]] = {}
+        # 热度时间序列
+        self.popularity: List[Dict[str, Any]] = []
+        self.lock = threading.Lock()
+        self.db = MemoryDatabase(self)
+        if documents is not None:
+            self.load_documents(documents)
+
+    def connect(self) -> bool:
+        """内存存储无需连接"""
+        return True
+
+    def close(self) -> None:
+        """内存存储无需关闭，数据保留到对象被回收"""
+
+    def load_documents(self, documents: Iterable[Dict[str, Any]]) -> int:
+        """
+        批量载入发布文档（按release_id覆盖）
+
+        Args:
+            documents: 发布文档
+
+        Returns:
+            int: 载入的文档数量
+        """
+        count = 0
+        with self.lock:
+            for doc in documents:
+                doc = dict(doc)
+                doc.pop('_id', None)
+                if 'timeline' not in doc:
+                    doc['timeline'] = classify_document(doc)
+                self.releases[doc.get('release_id')] = doc
+                count += 1
+        return count
+
+    def save_release(self, release: UnifiRelease) -> Union[str, bool]:
+        """保存或更新产品发布信息，返回SAVE_INSERTED/SAVE_CHANGED/SAVE_UNCHANGED"""
+        release_dict = release.to_dict()
+        release_dict['timeline'] = classify_document(release_dict)
+        release_id = release_dict.get('release_id')
+
+        with self.lock:
+            existing = self.releases.get(release_id)
+            outcome = save_outcome(existing, release_dict)
+            if existing is not None:
+                # 与MongoStorage一致，创建时间只在首次插入时写入
+                release_dict.pop('created_at', None)
+                existing.update(release_dict)
+            else:
+                self.releases[release_id] = release_dict
+
+        if existing is not None:
+            self.logger.info(f"更新已存在项目: {release.product_name} {release.version}", extra={'aggregate': '更新已存在项目'})
+        else:
+            self.logger.info(f"添加新项目: {release.product_name} {release.version}", extra={'aggregate': '添加新项目'})
+        return outcome
+
+    def get_release(self, release_id: str) -> Optional[UnifiRelease]:
+        """根据ID获取产品发布信息"""
+        with self.lock:
+            doc = self.releases.get(release_id)
+            doc = dict(doc) if doc is not None else None
+        return UnifiRelease.from_dict(doc) if doc is not None else None
+
+    def get_all_releases(self, limit: int = 100) -> list:
+        """获取所有产品发布信息"""
+        docs = self.find_releases(sort=[('created_at', -1)], limit=limit)
+        return [UnifiRelease.from_dict(doc) for doc in docs]
+
+    def get_crawl_state(self) -> Dict[str, Tuple[Any, str]]:
+        """
+        获取调度所需的入库状态
+
+        Returns:
+            Dict[str, Tuple[Any, str]]: {发布ID: (上次入库时间, 入库时的最后活动时间)}
+        """
+        with self.lock:
+            return {
+                release_id: (doc.get('last_updated'), doc.get('last_activity_at') or '')
+                for release_id, doc in self.releases.items()
+                if release_id
+            }
+
+    def update_release_stats(self, rows: List[Dict[str, Any]], history: bool = False) -> int:
+        """
+        批量更新已入库发布的浏览/评论统计
+
+        Args:
+            rows: 统计行，包含release_id、views、comments
+            history: 是否同时写入热度时间序列
+
+        Returns:
+            int: 匹配到的发布数量（未入库的发布不会被创建）
+        """
+        now = datetime.now()
+        matched = 0
+        with self.lock:
+            for row in rows:
+                doc = self.releases.get(row['release_id'])
+                if doc is None:
+                    continue
+                doc.update(views=row['views'], comments=row['comments'], stats_updated_at=now)
+                matched += 1
+            if history:
+                self.popularity.extend(
+                    {'timestamp': now, 'release_id': row['release_id'], 'views': row['views'], 'comments': row['comments']}
+                    for row in rows
+                )
+        return matched
+
+    def record_failure(self, release_id: str, error_class: str, message: str, item: Dict[str, Any]) -> bool:
+        """把处理失败的发布记录到死信集合，重复失败时累加尝试次数"""
+        now = datetime.now()
+        with self.lock:
+            record = self.failed.setdefault(release_id, {'release_id': release_id, 'first_failed_at': now, 'attempts': 0})
+            record.update(error_class=error_class, error=message, item=item, last_failed_at=now)
+            record['attempts'] += 1
+        return True
+
+    def resolve_failure(self, release_id: str) -> None:
+        """处理成功后从死信集合中移除"""
+        with self.lock:
+            self.failed.pop(release_id, None)
+
+    def get_failed_releases(self, limit: int = 0) -> list:
+        """获取死信集合中的失败记录，最早失败的在前"""
+        return list(self.db[FAILED_RELEASES_COLLECTION].find().sort('first_failed_at', 1).limit(limit))
+
+    def get_failed_release_ids(self) -> set:
+        """获取死信集合中的全部发布ID"""
+        with self.lock:
+            return set(self.failed)
+
+    def get_stats(self) -> Optional[Tuple[Dict[str, Any], Dict[str, Dict[str, int]]]]:
+        """
+        按入库时保存的时间轴分类计算统计
+
+        Returns:
+            (stats, product_line_stats)
+        """
+        counter = TimelineStats()
+        with self.lock:
+            timelines = [doc['timeline'] for doc in self.releases.values()]
+        for timeline in timelines:
+            counter.add((timeline['product_line'], timeline['version_type'], timeline['year'], timeline['merge_key']))
+        return counter.result()
+
+    def refresh_stats(self) -> Optional[Tuple[Dict[str, Any], Dict[str, Dict[str, int]]]]:
+        """内存存储读取时直接计算统计，无需汇总"""
+        return self.get_stats()
+
+    def rebuild_stats(self, batch_size: int = 500) -> Optional[Tuple[Dict[str, Any], Dict[str, Dict[str, int]]]]:
+        """
+        重新分类所有发布，回填timeline字段
+
+        Args:
+            batch_size: 与MongoStorage保持一致，内存存储不分批
+
+        Returns:
+            (stats, product_line_stats)
+        """
+        with self.lock:
+            for doc in self.releases.values():
+                doc['timeline'] = classify_document(doc)
+        stats = self.get_stats()
+        self.logger.info(f"已重建统计，共 {stats[0]['total_releases']} 条发布")
+        return stats
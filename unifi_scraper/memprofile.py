@@ -0,0 +1,311 @@
+"""
+内存剖析模块
+在各流水线阶段的开始和结束时记录tracemalloc快照，统计每个阶段的内存增量、峰值、进程峰值RSS
+和主要分配位置，输出可在多次运行之间对比的JSON报告
+"""
+import os
+import sys
+import json
+import time
+import logging
+import platform
+import threading
+import tracemalloc
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from .metrics import METRICS
+
+
+MB = 1024 * 1024
+
+# 快照中排除剖析器自身、阶段指标记录和导入机制的分配
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, os.path.join(os.path.dirname(__file__), 'metrics.py')),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+
+def peak_rss_mb() -> Optional[float]:
+    """进程峰值RSS（MB），平台不支持时返回None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux单位为KB，macOS为字节
+    if sys.platform == 'darwin':
+        return peak / MB
+    return peak / 1024
+
+
+def _site_name(filename: str, lineno: int) -> str:
+    """分配位置名称，使用相对路径，使不同机器和目录下的报告可以对比"""
+    if 'site-packages' in filename:
+        filename = filename.split('site-packages' + os.sep, 1)[-1]
+    else:
+        try:
+            relative = os.path.relpath(filename)
+        except ValueError:
+            relative = filename
+        if not relative.startswith('..'):
+            filename = relative
+    return f"{filename}:{lineno}"
+
+
+class MemoryProfiler:
+    """
+    按阶段的内存剖析器
+
+    通过metrics.stage()的阶段钩子工作：每个阶段记录调用次数、耗时、tracemalloc内存增量和峰值、
+    阶段结束时的进程峰值RSS；每个阶段名的前max_snapshots次调用在开始和结束时各取一次快照，
+    累计两者之差得到该阶段的主要分配位置（快照开销较大，详情获取等高频阶段只采样前几次）
+    """
+
+    def __init__(self, output_path: str, top: int = 10, max_snapshots: int = 5,
+                 baseline_path: Optional[str] = None):
+        """
+        初始化内存剖析器
+
+        Args:
+            output_path: JSON报告路径
+            top: 每个阶段报告的分配位置数量
+            max_snapshots: 每个阶段名最多取快照对比的调用次数
+            baseline_path: 之前运行的报告路径，指定时结束后输出对比
+        """
+        self.output_path = output_path
+        self.baseline_path = baseline_path
+        self.top = top
+        self.max_snapshots = max_snapshots
+        self.logger = logging.getLogger(__name__)
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._active = 0
+        self._peak = 0
+        self._started_tracing = False
+        self._started_at = None
+        self._stages: Dict[str, Dict[str, Any]] = defaultdict(lambda: {
+            'calls': 0,
+            'seconds': 0.0,
+            'snapshots': 0,
+            'traced_delta': 0,
+            'traced_peak': 0,
+            'rss_mb': None,
+            'sizes': Counter(),
+            'counts': Counter(),
+        })
+
+    def _stack(self) -> List:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _stage_hook(self, name: str, phase: str, elapsed: float) -> None:
+        if phase == 'start':
+            self._stage_start(name)
+        else:
+            self._stage_end(name, elapsed)
+
+    def _stage_start(self, name: str) -> None:
+        with self._lock:
+            self._active += 1
+            if self._active == 1:
+                # 峰值从最外层阶段开始时重新计算，嵌套或并发的阶段共享同一个峰值
+                self._peak = max(self._peak, tracemalloc.get_traced_memory()[1])
+                tracemalloc.reset_peak()
+            stats = self._stages[name]
+            take_snapshot = stats['snapshots'] < self.max_snapshots
+            if take_snapshot:
+                stats['snapshots'] += 1
+
+        snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS) if take_snapshot else None
+        self._stack().append((name, snapshot, tracemalloc.get_traced_memory()[0]))
+
+    def _stage_end(self, name: str, elapsed: float) -> None:
+        stack = self._stack()
+        if not stack or stack[-1][0] != name:
+            return
+        _, before, traced_before = stack.pop()
+        current, peak = tracemalloc.get_traced_memory()
+
+        diff = []
+        if before is not None:
+            after = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+            diff = after.compare_to(before, 'lineno')
+
+        with self._lock:
+            self._active = max(self._active - 1, 0)
+            stats = self._stages[name]
+            stats['calls'] += 1
+            stats['seconds'] += elapsed
+            stats['traced_delta'] += current - traced_before
+            stats['traced_peak'] = max(stats['traced_peak'], peak)
+            stats['rss_mb'] = peak_rss_mb()
+            for stat in diff:
+                if stat.size_diff <= 0:
+                    continue
+                frame = stat.traceback[0]
+                site = _site_name(frame.filename, frame.lineno)
+                stats['sizes'][site] += stat.size_diff
+                stats['counts'][site] += stat.count_diff
+
+    def start(self) -> 'MemoryProfiler':
+        """开始跟踪内存分配"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._started_at = time.time()
+        METRICS.add_stage_hook(self._stage_hook)
+        self.logger.info("开始内存剖析（tracemalloc），运行速度会明显变慢")
+        return self
+
+    def stop(self) -> Dict[str, Any]:
+        """
+        停止剖析并写入JSON报告
+
+        Returns:
+            Dict[str, Any]: 报告内容
+        """
+        METRICS.remove_stage_hook(self._stage_hook)
+        current, peak = tracemalloc.get_traced_memory()
+        self._peak = max(self._peak, peak)
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+        report = self.build_report(current)
+        directory = os.path.dirname(self.output_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.output_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+        self.logger.info(f"内存剖析结果:\n{format_report(report)}")
+        self.logger.info(f"已写入内存剖析报告: {self.output_path}")
+
+        if self.baseline_path:
+            try:
+                baseline = load_report(self.baseline_path)
+            except (OSError, ValueError) as e:
+                self.logger.error(f"读取基准内存报告失败: {e}")
+            else:
+                self.logger.info(f"与基准报告 {self.baseline_path} 对比:\n{compare_reports(baseline, report)}")
+        return report
+
+    def build_report(self, traced_current: int = 0) -> Dict[str, Any]:
+        """
+        生成报告，各阶段按名称排序，数值统一为MB/KB并保留固定小数位，便于对比
+
+        Args:
+            traced_current: 结束时tracemalloc跟踪的内存（字节）
+
+        Returns:
+            Dict[str, Any]: 报告内容
+        """
+        stages = {}
+        with self._lock:
+            for name, stats in self._stages.items():
+                top_sites = [
+                    {
+                        'site': site,
+                        'size_kb': round(size / 1024, 1),
+                        'count': stats['counts'][site]
+                    }
+                    for site, size in stats['sizes'].most_common(self.top)
+                ]
+                stages[name] = {
+                    'calls': stats['calls'],
+                    'seconds': round(stats['seconds'], 3),
+                    'snapshots': stats['snapshots'],
+                    'traced_delta_mb': round(stats['traced_delta'] / MB, 2),
+                    'traced_peak_mb': round(stats['traced_peak'] / MB, 2),
+                    'rss_mb': round(stats['rss_mb'], 1) if stats['rss_mb'] is not None else None,
+                    'top_allocations': top_sites
+                }
+
+        rss = peak_rss_mb()
+        return {
+            'command': ' '.join(os.path.basename(arg) if index == 0 else arg for index, arg in enumerate(sys.argv)),
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self._started_at or time.time())),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'peak_rss_mb': round(rss, 1) if rss is not None else None,
+            'traced_peak_mb': round(self._peak / MB, 2),
+            'traced_end_mb': round(traced_current / MB, 2),
+            'stages': stages
+        }
+
+
+def format_report(report: Dict[str, Any], top: int = 3) -> str:
+    """
+    把报告格式化为文本表格
+
+    Args:
+        report: 内存剖析报告
+        top: 每个阶段显示的分配位置数量
+
+    Returns:
+        str: 文本表格
+    """
+    header = f"{'阶段':<16}{'次数':>8}{'耗时(s)':>10}{'增量(MB)':>11}{'峰值(MB)':>11}{'RSS(MB)':>10}"
+    lines = [header, '-' * len(header)]
+    for name, stats in sorted(report['stages'].items(), key=lambda entry: -entry[1]['traced_peak_mb']):
+        rss = stats['rss_mb'] if stats['rss_mb'] is not None else float('nan')
+        lines.append(
+            f"{name:<18}{stats['calls']:>8}{stats['seconds']:>10.2f}"
+            f"{stats['traced_delta_mb']:>11.2f}{stats['traced_peak_mb']:>11.2f}{rss:>10.1f}"
+        )
+        for site in stats['top_allocations'][:top]:
+            lines.append(f"    {site['size_kb']:>10.1f} KB  {site['count']:>7} 块  {site['site']}")
+    lines.append('-' * len(header))
+    lines.append(
+        f"进程峰值RSS: {report['peak_rss_mb']} MB，tracemalloc峰值: {report['traced_peak_mb']} MB，"
+        f"结束时: {report['traced_end_mb']} MB"
+    )
+    return '\n'.join(lines)
+
+
+def load_report(path: str) -> Dict[str, Any]:
+    """读取内存剖析报告"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any]) -> str:
+    """
+    对比两次运行的内存剖析报告
+
+    Args:
+        baseline: 基准报告
+        current: 本次报告
+
+    Returns:
+        str: 各项指标的基准值、本次值和变化
+    """
+    def row(label, old, new):
+        if old is None or new is None:
+            return f"{label:<36}{str(old):>10}{str(new):>10}"
+        change = f"{(new - old) / old * 100:+.1f}%" if old else ''
+        return f"{label:<36}{old:>10.2f}{new:>10.2f}{new - old:>+10.2f}{change:>9}"
+
+    lines = [f"{'指标(MB)':<34}{'基准':>10}{'本次':>10}{'变化':>10}"]
+    lines.append(row('peak_rss', baseline.get('peak_rss_mb'), current.get('peak_rss_mb')))
+    lines.append(row('traced_peak', baseline.get('traced_peak_mb'), current.get('traced_peak_mb')))
+
+    old_stages = baseline.get('stages', {})
+    new_stages = current.get('stages', {})
+    for name in sorted(set(old_stages) | set(new_stages)):
+        old = old_stages.get(name, {})
+        new = new_stages.get(name, {})
+        for key in ('traced_peak_mb', 'traced_delta_mb'):
+            lines.append(row(f"{name}.{key[:-3]}", old.get(key), new.get(key)))
+    return '\n'.join(lines)
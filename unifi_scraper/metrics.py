@@ -0,0 +1,265 @@
+"""
+流水线指标模块
+记录各阶段（列表分页、详情获取、数据转换、数据库写入、检查点保存）的耗时直方图、
+进行中数量和错误数，以及请求数、接收字节数、重试次数等计数器；
+可导出为Prometheus文本格式（node_exporter textfile或本地/metrics接口），并在运行结束时输出汇总表
+"""
+import os
+import time
+import logging
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+# 指标名前缀
+PREFIX = 'unifi_scraper'
+
+# 耗时直方图的桶上限（秒）
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# 阶段钩子：callback(阶段名, 'start'/'end', 耗时秒数，开始时为0)
+StageHook = Callable[[str, str, float], None]
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in pairs) + '}'
+
+
+class Histogram:
+    """固定桶的耗时直方图"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """按桶估算分位数（返回所在桶的上限，不超过观测到的最大值）"""
+        if self.count == 0:
+            return 0.0
+        target = q * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= target:
+                return min(self.buckets[index], self.max) if index < len(self.buckets) else self.max
+        return self.max
+
+
+class MetricsRegistry:
+    """线程安全的指标注册表"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.counters: Dict[str, Dict[LabelKey, float]] = defaultdict(lambda: defaultdict(float))
+        self.gauges: Dict[str, Dict[LabelKey, float]] = defaultdict(lambda: defaultdict(float))
+        self.histograms: Dict[str, Dict[LabelKey, Histogram]] = defaultdict(dict)
+        self.help: Dict[str, str] = {}
+        self._hooks: List[StageHook] = []
+
+    def reset(self) -> None:
+        """清空所有指标（钩子保留）"""
+        with self._lock:
+            self.started = time.time()
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+
+    def inc(self, name: str, value: float = 1, help: str = '', **labels) -> None:
+        """计数器累加"""
+        with self._lock:
+            self.counters[name][_label_key(labels)] += value
+            if help:
+                self.help.setdefault(name, help)
+
+    def add_gauge(self, name: str, value: float, help: str = '', **labels) -> None:
+        """仪表值增减"""
+        with self._lock:
+            self.gauges[name][_label_key(labels)] += value
+            if help:
+                self.help.setdefault(name, help)
+
+    def observe(self, name: str, value: float, help: str = '', **labels) -> None:
+        """记录一次直方图观测值"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self.histograms[name]
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+            if help:
+                self.help.setdefault(name, help)
+
+    def add_stage_hook(self, hook: StageHook) -> None:
+        """注册阶段钩子，在每个阶段开始和结束时调用（如性能剖析）"""
+        self._hooks.append(hook)
+
+    def remove_stage_hook(self, hook: StageHook) -> None:
+        """移除阶段钩子"""
+        if hook in self._hooks:
+            self._hooks.remove(hook)
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        统计一个流水线阶段：进行中数量、耗时直方图和错误数
+
+        Args:
+            name: 阶段名称
+        """
+        for hook in self._hooks:
+            hook(name, 'start', 0.0)
+        self.add_gauge(f'{PREFIX}_stage_in_flight', 1, help='正在执行的阶段数量', stage=name)
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.inc(f'{PREFIX}_stage_errors_total', help='阶段执行出错次数', stage=name)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.add_gauge(f'{PREFIX}_stage_in_flight', -1, stage=name)
+            self.observe(f'{PREFIX}_stage_duration_seconds', elapsed, help='阶段耗时（秒）', stage=name)
+            for hook in self._hooks:
+                hook(name, 'end', elapsed)
+
+    def render_prometheus(self) -> str:
+        """输出Prometheus文本格式"""
+        lines = []
+        with self._lock:
+            for kind, series_map in (('counter', self.counters), ('gauge', self.gauges)):
+                for name in sorted(series_map):
+                    if name in self.help:
+                        lines.append(f'# HELP {name} {self.help[name]}')
+                    lines.append(f'# TYPE {name} {kind}')
+                    for key, value in sorted(series_map[name].items()):
+                        lines.append(f'{name}{_format_labels(key)} {value:g}')
+
+            for name in sorted(self.histograms):
+                if name in self.help:
+                    lines.append(f'# HELP {name} {self.help[name]}')
+                lines.append(f'# TYPE {name} histogram')
+                for key, histogram in sorted(self.histograms[name].items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{_format_labels(key, ("le", f"{bound:g}"))} {cumulative}')
+                    lines.append(f'{name}_bucket{_format_labels(key, ("le", "+Inf"))} {histogram.count}')
+                    lines.append(f'{name}_sum{_format_labels(key)} {histogram.sum:.6f}')
+                    lines.append(f'{name}_count{_format_labels(key)} {histogram.count}')
+
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path: str) -> None:
+        """
+        写入node_exporter textfile收集器读取的文件（先写临时文件再替换，避免读到一半）
+
+        Args:
+            path: 输出文件路径，应以.prom结尾
+        """
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+    def start_http_server(self, port: int, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+        """
+        在后台线程中启动/metrics接口
+
+        Args:
+            port: 监听端口
+            host: 监听地址，默认只监听本机
+
+        Returns:
+            ThreadingHTTPServer: HTTP服务，调用shutdown()停止
+        """
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        thread = threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True)
+        thread.start()
+        logging.getLogger(__name__).info(f"指标接口已启动: http://{host}:{port}/metrics")
+        return server
+
+    def _counter_total(self, name: str, **labels) -> float:
+        """按标签过滤后的计数器合计"""
+        wanted = set(_label_key(labels))
+        return sum(value for key, value in self.counters.get(name, {}).items() if wanted <= set(key))
+
+    def summary_table(self) -> str:
+        """各阶段耗时及请求统计的汇总表"""
+        elapsed = max(time.time() - self.started, 1e-9)
+        rows = []
+        with self._lock:
+            for key, histogram in sorted(self.histograms.get(f'{PREFIX}_stage_duration_seconds', {}).items()):
+                stage = dict(key).get('stage', '')
+                rows.append((
+                    stage,
+                    histogram.count,
+                    histogram.sum,
+                    histogram.sum / histogram.count * 1000 if histogram.count else 0.0,
+                    histogram.quantile(0.5) * 1000,
+                    histogram.quantile(0.95) * 1000,
+                    histogram.max * 1000,
+                    self._counter_total(f'{PREFIX}_stage_errors_total', stage=stage),
+                ))
+            requests_total = self._counter_total(f'{PREFIX}_http_requests_total')
+            bytes_total = self._counter_total(f'{PREFIX}_http_response_bytes_total')
+            retries_total = self._counter_total(f'{PREFIX}_retries_total')
+
+        header = f"{'阶段':<16}{'次数':>8}{'总耗时(s)':>12}{'平均(ms)':>11}{'p50(ms)':>10}{'p95(ms)':>10}{'最大(ms)':>11}{'错误':>7}"
+        lines = [header, '-' * len(header)]
+        for stage, count, total, mean, p50, p95, maximum, errors in sorted(rows, key=lambda row: -row[2]):
+            lines.append(f"{stage:<18}{count:>8}{total:>12.2f}{mean:>12.1f}{p50:>10.1f}{p95:>10.1f}{maximum:>12.1f}{errors:>8.0f}")
+        lines.append('-' * len(header))
+        lines.append(
+            f"请求 {requests_total:.0f} 次（{requests_total / elapsed:.2f} 次/秒），"
+            f"接收 {bytes_total / 1024 / 1024:.2f} MB，重试 {retries_total:.0f} 次，运行 {elapsed:.1f} 秒"
+        )
+        return '\n'.join(lines)
+
+
+# 全局指标注册表
+METRICS = MetricsRegistry()
+
+# 便捷入口
+stage = METRICS.stage
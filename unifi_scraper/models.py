@@ -2,30 +2,72 @@
 数据模型定义
 """
 from datetime import datetime
-from typing import Dict, Any, Optional
-import json
+from typing import Dict, Any
+
+
+def _parse_datetime(value: Any, default: datetime) -> datetime:
+    """把字符串解析为datetime，非字符串原样返回，解析失败时使用默认值"""
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except (ValueError, TypeError):
+            return default
+    return value
 
 
 class UnifiRelease:
-    """Ubiquiti产品发布模型"""
-    
+    """
+    Ubiquiti产品发布模型
+
+    使用__slots__减少每个实例的内存占用；tags/download_links以JSON字符串存储
+    """
+
+    # 持久化字段，顺序即to_dict输出顺序
+    FIELDS = (
+        'product_name',
+        'version',
+        'release_date',
+        'release_id',
+        'download_url',
+        'release_notes',
+        'firmware_type',
+        'is_beta',
+        'created_at',
+        'stage',           # 发布阶段：GA, RC, BETA等
+        'slug',            # 发布标识
+        'tags',            # 标签，JSON格式
+        'download_links',  # 所有下载链接，JSON格式
+        'group_id',        # 发布分组ID，统一固件的多个发布共享同一分组
+        'views',           # 浏览次数
+        'comments',        # 评论数
+        'last_activity_at',  # 获取详情时的社区最后活动时间，调度器据此发现有新活动的发布
+        'last_updated',    # 最后更新时间
+    )
+
+    __slots__ = FIELDS
+
     def __init__(self):
-        self.product_name: str = ""
-        self.version: str = ""
-        self.release_date: str = ""
-        self.release_id: str = ""
-        self.download_url: str = ""
-        self.release_notes: str = ""
-        self.firmware_type: str = "Unknown"
-        self.is_beta: bool = False
-        self.created_at: datetime = datetime.now()
-        # 新增字段
-        self.stage: str = ""  # 发布阶段：GA, RC, BETA等
-        self.slug: str = ""   # 发布标识
-        self.tags: str = "[]" # 标签，JSON格式
-        self.download_links: str = "[]" # 所有下载链接，JSON格式
-        self.last_updated: datetime = datetime.now() # 最后更新时间
-    
+        # 两个时间字段共用一次datetime.now()
+        now = datetime.now()
+        self.product_name = ''
+        self.version = ''
+        self.release_date = ''
+        self.release_id = ''
+        self.download_url = ''
+        self.release_notes = ''
+        self.firmware_type = 'Unknown'
+        self.is_beta = False
+        self.created_at = now
+        self.stage = ''
+        self.slug = ''
+        self.tags = '[]'
+        self.download_links = '[]'
+        self.group_id = ''
+        self.views = 0
+        self.comments = 0
+        self.last_activity_at = ''
+        self.last_updated = now
+
     def set_data(self, data: Dict[str, Any]) -> 'UnifiRelease':
         """从字典设置数据"""
         self.product_name = data.get('product_name', '')
@@ -36,37 +78,31 @@ class UnifiRelease:
         self.release_notes = data.get('release_notes', '')
         self.firmware_type = data.get('firmware_type', 'Unknown')
         self.is_beta = data.get('is_beta', False)
-        
-        # 设置新字段
         self.stage = data.get('stage', '')
         self.slug = data.get('slug', '')
         self.tags = data.get('tags', '[]')
         self.download_links = data.get('download_links', '[]')
-        
-        # 处理日期时间字段
+        self.group_id = data.get('group_id') or ''
+        self.views = data.get('views') or 0
+        self.comments = data.get('comments') or 0
+        self.last_activity_at = data.get('last_activity_at') or ''
+
+        # 处理日期时间字段，只有缺失或无法解析时才取当前时间
+        created_at = data.get('created_at')
+        last_updated = data.get('last_updated')
+        now = None
+        if created_at is None or last_updated is None or isinstance(created_at, str) or isinstance(last_updated, str):
+            now = datetime.now()
+
         if 'created_at' in data:
-            if isinstance(data['created_at'], str):
-                # 如果是字符串，尝试解析为datetime
-                try:
-                    self.created_at = datetime.fromisoformat(data['created_at'].replace('Z', '+00:00'))
-                except (ValueError, TypeError):
-                    self.created_at = datetime.now()
-            else:
-                self.created_at = data['created_at']
-        
-        if 'last_updated' in data:
-            if isinstance(data['last_updated'], str):
-                try:
-                    self.last_updated = datetime.fromisoformat(data['last_updated'].replace('Z', '+00:00'))
-                except (ValueError, TypeError):
-                    self.last_updated = datetime.now()
-            else:
-                self.last_updated = data['last_updated']
-        else:
-            self.last_updated = datetime.now()
-            
+            self.created_at = _parse_datetime(created_at, now)
+        elif getattr(self, 'created_at', None) is None:
+            self.created_at = now
+
+        self.last_updated = _parse_datetime(last_updated, now) if 'last_updated' in data else now
+
         return self
-    
+
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典"""
         return {
@@ -83,14 +119,20 @@ class UnifiRelease:
             'slug': self.slug,
             'tags': self.tags,
             'download_links': self.download_links,
+            'group_id': self.group_id,
+            'views': self.views,
+            'comments': self.comments,
+            'last_activity_at': self.last_activity_at,
             'last_updated': self.last_updated
         }
-    
+
     def __str__(self) -> str:
         return f"{self.product_name} {self.version} ({self.stage}) - {self.release_date}"
-    
+
     @staticmethod
     def from_dict(data: Dict[str, Any]) -> 'UnifiRelease':
         """从字典创建实例"""
-        instance = UnifiRelease()
-        return instance.set_data(data) 
\ No newline at end of file
+        # 跳过__init__，避免为即将被覆盖的字段生成默认值
+        instance = UnifiRelease.__new__(UnifiRelease)
+        instance.created_at = None
+        return instance.set_data(data)
@@ -0,0 +1,229 @@
+"""
+CPU性能剖析模块
+在cProfile下运行整个流水线（或只剖析指定的阶段/方法），同时由后台线程定期采样调用栈，
+输出.pstats文件和可直接交给flamegraph.pl/speedscope的折叠栈（collapsed stack）文件
+"""
+import os
+import io
+import sys
+import pstats
+import cProfile
+import inspect
+import logging
+import functools
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .metrics import METRICS
+
+
+def _frame_label(frame) -> str:
+    """折叠栈中的帧名称：函数名 (文件名:行号)"""
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Profiler:
+    """
+    CPU性能剖析器
+
+    不指定stages时剖析start()到stop()之间的全部执行；指定stages时只剖析这些范围，
+    名称可以是metrics.stage()的阶段名（如render、detail_fetch），也可以是attach()传入对象上的方法名
+    （如determine_product_line）
+    """
+
+    def __init__(self, output_prefix: str, stages: Iterable[str] = (), interval: float = 0.005):
+        """
+        初始化剖析器
+
+        Args:
+            output_prefix: 输出文件前缀，生成<prefix>.pstats和<prefix>.collapsed
+            stages: 只剖析的阶段或方法名，为空表示剖析全部
+            interval: 调用栈采样间隔（秒）
+        """
+        self.output_prefix = output_prefix
+        self.stages = set(stages)
+        self.interval = interval
+        self.logger = logging.getLogger(__name__)
+
+        self._profiles: Dict[int, cProfile.Profile] = {}
+        self._depth: Dict[int, int] = {}
+        self._active: set = set()
+        self._lock = threading.Lock()
+        self._wrapped: List[Tuple[Any, str, Any, bool]] = []
+        self._samples: Counter = Counter()
+        self._stop_sampler = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    @property
+    def scoped(self) -> bool:
+        """是否只剖析指定的范围"""
+        return bool(self.stages)
+
+    def _enter(self) -> None:
+        """当前线程进入剖析范围（可嵌套）"""
+        thread_id = threading.get_ident()
+        with self._lock:
+            depth = self._depth.get(thread_id, 0)
+            self._depth[thread_id] = depth + 1
+            if depth:
+                return
+            profile = self._profiles.get(thread_id)
+            if profile is None:
+                profile = self._profiles[thread_id] = cProfile.Profile()
+            self._active.add(thread_id)
+        profile.enable()
+
+    def _exit(self) -> None:
+        """当前线程离开剖析范围"""
+        thread_id = threading.get_ident()
+        with self._lock:
+            depth = self._depth.get(thread_id, 0) - 1
+            self._depth[thread_id] = max(depth, 0)
+            if depth > 0:
+                return
+            self._active.discard(thread_id)
+            profile = self._profiles.get(thread_id)
+        if profile is not None:
+            profile.disable()
+
+    def _stage_hook(self, name: str, phase: str, elapsed: float) -> None:
+        if name not in self.stages:
+            return
+        if phase == 'start':
+            self._enter()
+        else:
+            self._exit()
+
+    def attach(self, *targets: Any) -> None:
+        """
+        把stages中与对象方法同名的项包装为剖析范围
+
+        Args:
+            *targets: 对象（如时间轴生成器、爬虫实例）或模块
+        """
+        for target in targets:
+            for name in self.stages:
+                if isinstance(target, type):
+                    # 类上直接读取原始描述符，保留staticmethod/classmethod语义
+                    original = inspect.getattr_static(target, name, None)
+                    if isinstance(original, staticmethod):
+                        wrapped = staticmethod(self._wrap(original.__func__))
+                    elif isinstance(original, classmethod):
+                        wrapped = classmethod(self._wrap(original.__func__))
+                    elif callable(original):
+                        wrapped = self._wrap(original)
+                    else:
+                        continue
+                else:
+                    original = getattr(target, name, None)
+                    if not callable(original):
+                        continue
+                    wrapped = self._wrap(original)
+                own = name in getattr(target, '__dict__', {})
+                setattr(target, name, wrapped)
+                self._wrapped.append((target, name, original, own))
+                owner = getattr(target, '__name__', type(target).__name__)
+                self.logger.info(f"剖析范围: {owner}.{name}")
+
+    def _wrap(self, function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            self._enter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self._exit()
+        return wrapper
+
+    def _sample_loop(self) -> None:
+        """定期采样其它线程的调用栈"""
+        own_id = threading.get_ident()
+        while not self._stop_sampler.wait(self.interval):
+            active = self._active if self.scoped else None
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or (active is not None and thread_id not in active):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                self._samples[';'.join(reversed(stack))] += 1
+
+    def start(self) -> 'Profiler':
+        """开始剖析"""
+        if self.scoped:
+            METRICS.add_stage_hook(self._stage_hook)
+            self.logger.info(f"开始剖析指定范围: {', '.join(sorted(self.stages))}")
+        else:
+            self._enter()
+            self.logger.info("开始剖析整个运行过程")
+
+        self._stop_sampler.clear()
+        self._sampler = threading.Thread(target=self._sample_loop, name='profiler-sampler', daemon=True)
+        self._sampler.start()
+        return self
+
+    def stop(self) -> Dict[str, str]:
+        """
+        停止剖析并写入结果文件
+
+        Returns:
+            Dict[str, str]: {'pstats': 路径, 'collapsed': 路径}，没有剖析数据时为空
+        """
+        if self.scoped:
+            METRICS.remove_stage_hook(self._stage_hook)
+        else:
+            self._exit()
+        for target, name, original, own in reversed(self._wrapped):
+            if own:
+                setattr(target, name, original)
+            else:
+                delattr(target, name)
+        self._wrapped.clear()
+
+        self._stop_sampler.set()
+        if self._sampler is not None:
+            self._sampler.join()
+
+        outputs = {}
+        directory = os.path.dirname(self.output_prefix)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        stats = None
+        for profile in self._profiles.values():
+            try:
+                profile.create_stats()
+            except Exception:
+                continue
+            if not profile.stats:
+                continue
+            if stats is None:
+                stats = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+
+        if stats is not None:
+            path = f"{self.output_prefix}.pstats"
+            stats.dump_stats(path)
+            outputs['pstats'] = path
+
+            report = io.StringIO()
+            stats.stream = report
+            stats.sort_stats('cumulative').print_stats(15)
+            self.logger.info(f"剖析结果（按累计耗时前15）:\n{report.getvalue()}")
+        else:
+            self.logger.warning("没有剖析数据，指定的阶段或方法可能没有执行")
+
+        if self._samples:
+            path = f"{self.output_prefix}.collapsed"
+            with open(path, 'w', encoding='utf-8') as f:
+                for stack, count in sorted(self._samples.items()):
+                    f.write(f"{stack} {count}\n")
+            outputs['collapsed'] = path
+
+        for kind, path in outputs.items():
+            self.logger.info(f"已写入剖析结果({kind}): {path}")
+        return outputs
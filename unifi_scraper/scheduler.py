@@ -0,0 +1,143 @@
+"""
+爬取调度模块
+按优先级安排详情请求：新发布优先，其次是有新活动的发布，最后按衰减间隔重新校验旧发布，
+并限制每次运行的请求预算，使重新校验分散到多次运行中
+"""
+import logging
+from datetime import datetime
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+
+# 调度原因，同时也是优先级（数值越小越优先）
+NEW = 0
+ACTIVE = 1
+REVERIFY = 2
+
+REASON_NAMES = {NEW: 'new', ACTIVE: 'active', REVERIFY: 'reverify'}
+
+
+def _parse_time(value: Any) -> Optional[datetime]:
+    """把API返回的ISO时间字符串解析为本地无时区时间，无法解析时返回None"""
+    if isinstance(value, datetime):
+        return value
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+class CrawlScheduler:
+    """
+    详情请求调度器
+
+    - 新发布：未处理过的发布，按创建时间从新到旧
+    - 有新活动：已入库但lastActivityAt与入库时不同的发布，按最后活动时间从新到旧
+    - 重新校验：距上次校验超过校验间隔的发布，间隔随发布年龄按倍数增长（越旧越少校验），
+      按逾期程度排序，每次运行最多reverify_limit个
+    """
+
+    def __init__(self, budget: int = 0, reverify_limit: int = 50,
+                 reverify_base_days: float = 1.0, reverify_max_days: float = 90.0,
+                 age_step_days: float = 30.0):
+        """
+        初始化调度器
+
+        Args:
+            budget: 每次运行的详情请求预算，0表示不限制
+            reverify_limit: 每次运行最多重新校验的发布数量，0表示不重新校验
+            reverify_base_days: 新发布的校验间隔（天）
+            reverify_max_days: 校验间隔上限（天）
+            age_step_days: 发布年龄每增加该天数，校验间隔翻倍
+        """
+        self.budget = budget
+        self.reverify_limit = reverify_limit
+        self.reverify_base_days = reverify_base_days
+        self.reverify_max_days = reverify_max_days
+        self.age_step_days = age_step_days
+        self.logger = logging.getLogger(__name__)
+
+    def reverify_interval(self, created_at: Optional[datetime], now: datetime) -> float:
+        """
+        计算发布的重新校验间隔
+
+        Args:
+            created_at: 发布创建时间
+            now: 当前时间
+
+        Returns:
+            float: 校验间隔（天）
+        """
+        if created_at is None:
+            return self.reverify_max_days
+        age_days = max((now - created_at).total_seconds() / 86400, 0)
+        interval = self.reverify_base_days * 2 ** int(age_days / self.age_step_days)
+        return min(interval, self.reverify_max_days)
+
+    def plan(self, items: Iterable[Dict[str, Any]], processed_ids: set,
+             crawl_state: Dict[str, Tuple[Any, str]], now: Optional[datetime] = None) -> List[Tuple[Dict[str, Any], int]]:
+        """
+        生成本次运行的详情请求计划
+
+        Args:
+            items: 发布列表项
+            processed_ids: 已处理的发布ID
+            crawl_state: {发布ID: (上次入库时间, 入库时的最后活动时间)}
+            now: 当前时间，默认取系统时间
+
+        Returns:
+            List[Tuple[Dict[str, Any], int]]: 按优先级排序的(列表项, 调度原因)
+        """
+        now = now or datetime.now()
+        new, active, due = [], [], []
+
+        for item in items:
+            release_id = item.get("id")
+            if release_id not in processed_ids:
+                new.append(item)
+                continue
+
+            state = crawl_state.get(release_id)
+            if state is None:
+                # 已处理但不在库中（如只保存了检查点），与原先一样跳过
+                continue
+
+            verified_at, stored_activity = state
+            activity = item.get("lastActivityAt") or ""
+            # 入库时没有记录活动时间的旧文档交给重新校验处理
+            if activity and stored_activity and activity != stored_activity:
+                active.append(item)
+                continue
+
+            verified_at = _parse_time(verified_at)
+            if verified_at is None or self.reverify_limit <= 0:
+                continue
+            interval = self.reverify_interval(_parse_time(item.get("createdAt")), now)
+            overdue = (now - verified_at).total_seconds() / 86400 / interval
+            if overdue >= 1:
+                due.append((overdue, item))
+
+        new.sort(key=lambda item: item.get("createdAt") or "", reverse=True)
+        active.sort(key=lambda item: item.get("lastActivityAt") or "", reverse=True)
+        due.sort(key=lambda entry: entry[0], reverse=True)
+
+        plan = [(item, NEW) for item in new]
+        plan += [(item, ACTIVE) for item in active]
+        plan += [(item, REVERIFY) for _, item in due[:self.reverify_limit]]
+
+        if self.budget > 0:
+            plan = plan[:self.budget]
+
+        counts = {name: 0 for name in REASON_NAMES.values()}
+        for _, reason in plan:
+            counts[REASON_NAMES[reason]] += 1
+        self.logger.info(
+            f"调度计划: 新发布 {counts['new']} 个，有新活动 {counts['active']} 个，"
+            f"重新校验 {counts['reverify']} 个（到期 {len(due)} 个），"
+            f"预算: {'不限制' if self.budget <= 0 else self.budget}"
+        )
+        return plan
@@ -1,75 +1,601 @@
 """
-数据存储模块，负责管理MongoDB连接和数据存储
+数据存储模块，定义存储后端接口，负责管理MongoDB连接和数据存储
+内存后端见memory_storage.py
 """
 import os
 import logging
-from typing import Dict, Any, Optional
+from collections import defaultdict
+from typing import Dict, Any, List, Optional, Tuple, Union
 import pymongo
+from pymongo import ReturnDocument, UpdateOne
 from datetime import datetime
 
 from .models import UnifiRelease
+from .analytics import TIMELINE_FIELDS
+from .classification import classify_release
+from .mongo_monitor import COMMAND_MONITOR
 
 
-class MongoStorage:
+# 时间轴统计集合及其中的统计文档ID
+RELEASE_STATS_COLLECTION = 'release_stats'
+STATS_DOCUMENT_ID = 'timeline'
+
+# 详情获取失败的发布（死信集合），供 run.py --retry-failed 重试
+FAILED_RELEASES_COLLECTION = 'failed_releases'
+
+# 发布热度（浏览/评论）时间序列集合
+POPULARITY_COLLECTION = 'release_popularity'
+
+# save_release的结果：新插入、内容有变化、内容未变化；保存失败时返回False
+SAVE_INSERTED = 'inserted'
+SAVE_CHANGED = 'changed'
+SAVE_UNCHANGED = 'unchanged'
+
+# 判断内容是否变化时忽略的字段：时间戳以及时间轴不展示的浏览/评论等活动字段
+VOLATILE_FIELDS = frozenset(('created_at', 'last_updated', 'views', 'comments', 'last_activity_at'))
+
+
+def classify_document(release: Dict[str, Any]) -> Dict[str, Any]:
+    """计算发布文档的时间轴分类，保存在文档的timeline字段中"""
+    product_line, version_type, year, merge_key = classify_release(release)
+    return {
+        'product_line': product_line,
+        'version_type': version_type,
+        'year': year,
+        'merge_key': merge_key
+    }
+
+
+def save_outcome(before: Optional[Dict[str, Any]], release_dict: Dict[str, Any]) -> str:
+    """
+    比较写入前后的发布文档，得到save_release的结果
+
+    Args:
+        before: 写入前的文档，新插入时为None
+        release_dict: 写入的发布字段
+
+    Returns:
+        str: SAVE_INSERTED、SAVE_CHANGED或SAVE_UNCHANGED
+    """
+    if before is None:
+        return SAVE_INSERTED
+    for field, value in release_dict.items():
+        if field in VOLATILE_FIELDS:
+            continue
+        if field == 'timeline' and field not in before:
+            # 引入timeline字段之前保存的文档，本次只是回填分类，内容并未变化
+            continue
+        if before.get(field) != value:
+            return SAVE_CHANGED
+    return SAVE_UNCHANGED
+
+
+def stats_from_document(doc: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Dict[str, int]]]:
+    """
+    把统计文档转换为时间轴使用的统计结构
+
+    Args:
+        doc: release_stats集合中的统计文档
+
+    Returns:
+        (stats, product_line_stats)
+    """
+    def positive(counts):
+        return {key: count for key, count in (counts or {}).items() if count > 0}
+
+    # MongoDB文档的键只能是字符串，年份还原为整数
+    years = {int(year) if year.isdigit() else year: count for year, count in positive(doc.get('years')).items()}
+    stats = {
+        'total_releases': doc.get('total_releases', 0),
+        'product_lines': positive(doc.get('product_lines')),
+        'version_types': positive(doc.get('version_types')),
+        'years': years
+    }
+    product_line_stats = {
+        product_line: positive(counts)
+        for product_line, counts in (doc.get('product_line_stats') or {}).items()
+        if positive(counts)
+    }
+    return stats, product_line_stats
+
+
+def stats_to_document(stats: Dict[str, Any], product_line_stats: Dict[str, Dict[str, int]]) -> Dict[str, Any]:
+    """把时间轴统计转换为release_stats集合中的统计文档（键转换为字符串）"""
+    return {
+        '_id': STATS_DOCUMENT_ID,
+        'total_releases': stats['total_releases'],
+        'product_lines': dict(stats['product_lines']),
+        'version_types': dict(stats['version_types']),
+        'years': {str(year): count for year, count in stats['years'].items()},
+        'product_line_stats': {pl: dict(counts) for pl, counts in product_line_stats.items()},
+        'updated_at': datetime.now()
+    }
+
+
+def aggregate_timeline_stats(collection) -> Optional[Tuple[Dict[str, Any], Dict[str, Dict[str, int]]]]:
+    """
+    按入库时保存的timeline字段在MongoDB中聚合时间轴统计，与时间轴生成时的统计一致
+    
+    先按合并键分组（合并为同一条的发布只计入一次分类统计），再用$facet在服务端完成各维度计数，
+    只把汇总结果传回客户端
+    
+    Args:
+        collection: 发布集合
+    
+    Returns:
+        (stats, product_line_stats)，存在尚未回填timeline字段的发布时返回None
+    """
+    classified = {'_id': {'$ne': None}}
+    pipeline = [
+        {'$group': {
+            '_id': '$timeline.merge_key',
+            'product_line': {'$first': '$timeline.product_line'},
+            'version_type': {'$first': '$timeline.version_type'},
+            'year': {'$first': '$timeline.year'},
+            'count': {'$sum': 1}
+        }},
+        {'$facet': {
+            'total': [{'$group': {'_id': None, 'count': {'$sum': '$count'}}}],
+            'unclassified': [{'$match': {'_id': None}}],
+            'product_line_stats': [
+                {'$match': classified},
+                {'$group': {'_id': {'product_line': '$product_line', 'version_type': '$version_type'}, 'count': {'$sum': 1}}}
+            ],
+            'years': [{'$match': classified}, {'$group': {'_id': '$year', 'count': {'$sum': 1}}}]
+        }}
+    ]
+    result = next(collection.aggregate(pipeline, allowDiskUse=True), {})
+    if result.get('unclassified'):
+        return None
+    
+    product_lines = defaultdict(int)
+    version_types = defaultdict(int)
+    product_line_stats = defaultdict(lambda: defaultdict(int))
+    for row in result.get('product_line_stats', []):
+        product_line, version_type = row['_id']['product_line'], row['_id']['version_type']
+        product_lines[product_line] += row['count']
+        version_types[version_type] += row['count']
+        product_line_stats[product_line][version_type] += row['count']
+    
+    total = result.get('total', [])
+    stats = {
+        'total_releases': total[0]['count'] if total else 0,
+        'product_lines': product_lines,
+        'version_types': version_types,
+        'years': defaultdict(int, {row['_id']: row['count'] for row in result.get('years', [])})
+    }
+    return stats, product_line_stats
+
+
+class BaseStorage:
+    """
+    存储后端基类
+    
+    子类实现发布的保存/读取、按条件和投影查询、死信集合以及时间轴统计；
+    db为类似pymongo Database的对象（db[集合名].find(...)），供时间轴生成器和分析器直接读取
+    """
+    
+    # 是否支持把统计下推到聚合管道
+    supports_aggregation = False
+    
+    def __init__(self):
+        self.collection_name = 'unifi_releases'
+        self.db = None
+        self.logger = logging.getLogger(__name__)
+    
+    def connect(self) -> bool:
+        raise NotImplementedError
+    
+    def close(self) -> None:
+        raise NotImplementedError
+    
+    def save_release(self, release: UnifiRelease) -> Union[str, bool]:
+        """保存或更新产品发布信息，返回SAVE_INSERTED/SAVE_CHANGED/SAVE_UNCHANGED，失败时返回False"""
+        raise NotImplementedError
+    
+    def get_release(self, release_id: str) -> Optional[UnifiRelease]:
+        """根据ID获取产品发布信息"""
+        raise NotImplementedError
+    
+    def get_all_releases(self, limit: int = 100) -> list:
+        """按入库时间倒序获取产品发布信息"""
+        raise NotImplementedError
+    
+    def find_releases(self, filter: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None,
+                      sort: Optional[List[Tuple[str, int]]] = None, limit: int = 0) -> List[Dict[str, Any]]:
+        """
+        按条件查询发布文档，只返回投影中的字段
+        
+        Args:
+            filter: 过滤条件（内存后端只支持等值过滤）
+            projection: 字段投影，None表示全部字段
+            sort: [(字段, 方向), ...]
+            limit: 最大数量，0表示不限制
+        
+        Returns:
+            List[Dict[str, Any]]: 发布文档
+        """
+        if self.db is None:
+            self.logger.error("未连接到存储，无法查询数据")
+            return []
+        
+        try:
+            cursor = self.db[self.collection_name].find(filter or {}, projection)
+            if sort:
+                cursor = cursor.sort(sort)
+            if limit:
+                cursor = cursor.limit(limit)
+            return list(cursor)
+        except Exception as e:
+            self.logger.error(f"查询数据失败: {e}")
+            return []
+    
+    def get_crawl_state(self) -> Dict[str, Tuple[Any, str]]:
+        """获取调度所需的入库状态：{发布ID: (上次入库时间, 入库时的最后活动时间)}"""
+        raise NotImplementedError
+    
+    def update_release_stats(self, rows: List[Dict[str, Any]], history: bool = False) -> int:
+        """批量更新已入库发布的浏览/评论统计，返回匹配到的发布数量"""
+        raise NotImplementedError
+    
+    def record_failure(self, release_id: str, error_class: str, message: str, item: Dict[str, Any]) -> bool:
+        """把处理失败的发布记录到死信集合"""
+        raise NotImplementedError
+    
+    def resolve_failure(self, release_id: str) -> None:
+        """处理成功后从死信集合中移除"""
+        raise NotImplementedError
+    
+    def get_failed_releases(self, limit: int = 0) -> list:
+        """获取死信集合中的失败记录，最早失败的在前"""
+        raise NotImplementedError
+    
+    def get_failed_release_ids(self) -> set:
+        """获取死信集合中的全部发布ID"""
+        raise NotImplementedError
+    
+    def get_stats(self) -> Optional[Tuple[Dict[str, Any], Dict[str, Dict[str, int]]]]:
+        """读取时间轴统计(stats, product_line_stats)，尚未建立时返回None"""
+        raise NotImplementedError
+    
+    def refresh_stats(self) -> Optional[Tuple[Dict[str, Any], Dict[str, Dict[str, int]]]]:
+        """按已保存的时间轴分类重新汇总统计，存在未分类的发布时返回None"""
+        raise NotImplementedError
+    
+    def rebuild_stats(self, batch_size: int = 500) -> Optional[Tuple[Dict[str, Any], Dict[str, Dict[str, int]]]]:
+        """重新分类所有发布并回填timeline字段"""
+        raise NotImplementedError
+
+
+class MongoStorage(BaseStorage):
     """MongoDB存储类"""
     
+    supports_aggregation = True
+    
     def __init__(self):
         """初始化MongoDB连接"""
+        super().__init__()
         self.mongo_uri = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
         self.mongo_db = os.getenv('MONGO_DATABASE', 'unifi_releases')
-        self.collection_name = 'unifi_releases'
+        self.stats_collection_name = RELEASE_STATS_COLLECTION
+        self.failed_collection_name = FAILED_RELEASES_COLLECTION
+        self.popularity_collection_name = POPULARITY_COLLECTION
         self.client = None
-        self.db = None
-        self.logger = logging.getLogger(__name__)
     
     def connect(self):
         """连接到MongoDB"""
         try:
-            self.client = pymongo.MongoClient(self.mongo_uri)
+            self.client = pymongo.MongoClient(self.mongo_uri, **COMMAND_MONITOR.client_options())
             self.db = self.client[self.mongo_db]
             self.logger.info(f"已连接到MongoDB: {self.mongo_uri}")
+            self.ensure_indexes()
             return True
         except Exception as e:
             self.logger.error(f"MongoDB连接失败: {e}")
             return False
     
+    def ensure_indexes(self) -> None:
+        """创建查询所需的索引（已存在时不会重复创建）"""
+        if self.db is None:
+            return
+        
+        collection = self.db[self.collection_name]
+        try:
+            collection.create_index('release_id')
+            # 时间轴按分组ID合并统一固件
+            collection.create_index('group_id')
+            # 时间轴按发布日期倒序读取
+            collection.create_index([('release_date', pymongo.DESCENDING)])
+            # 聚合时间轴统计时按合并键分组
+            collection.create_index('timeline.merge_key')
+            self.db[self.failed_collection_name].create_index('release_id', unique=True)
+        except Exception as e:
+            self.logger.warning(f"创建索引失败: {e}")
+    
+    def get_stats(self) -> Optional[Tuple[Dict[str, Any], Dict[str, Dict[str, int]]]]:
+        """
+        读取release_stats集合中汇总好的时间轴统计（单个文档）
+        
+        Returns:
+            (stats, product_line_stats)，统计尚未建立时返回None
+        """
+        if self.db is None:
+            self.logger.error("未连接到MongoDB，无法获取统计")
+            return None
+        
+        doc = self.db[self.stats_collection_name].find_one({'_id': STATS_DOCUMENT_ID})
+        if doc is None:
+            return None
+        return stats_from_document(doc)
+    
+    def refresh_stats(self) -> Optional[Tuple[Dict[str, Any], Dict[str, Dict[str, int]]]]:
+        """
+        按已保存的timeline字段聚合时间轴统计，写入release_stats集合
+        
+        每轮爬取结束时调用一次，统计文档整体替换，多个工作进程并发写入也不会出现计数漂移
+        
+        Returns:
+            (stats, product_line_stats)，存在尚未回填timeline字段的发布或失败时返回None
+        """
+        if self.db is None:
+            self.logger.error("未连接到MongoDB，无法汇总统计")
+            return None
+        
+        try:
+            result = aggregate_timeline_stats(self.db[self.collection_name])
+            if result is None:
+                self.logger.warning("部分发布缺少timeline字段，未更新统计，请运行 run.py --rebuild-stats 回填")
+                return None
+            self.db[self.stats_collection_name].replace_one(
+                {'_id': STATS_DOCUMENT_ID}, stats_to_document(*result), upsert=True
+            )
+            return result
+        except Exception as e:
+            self.logger.error(f"汇总统计失败: {e}")
+            return None
+    
+    def rebuild_stats(self, batch_size: int = 500) -> Optional[Tuple[Dict[str, Any], Dict[str, Dict[str, int]]]]:
+        """
+        重新分类所有发布并回填timeline字段，之后按该字段汇总统计写入release_stats集合
+        
+        Args:
+            batch_size: 每批回填的文档数
+        
+        Returns:
+            (stats, product_line_stats)，失败时返回None
+        """
+        if self.db is None:
+            self.logger.error("未连接到MongoDB，无法重建统计")
+            return None
+        
+        collection = self.db[self.collection_name]
+        projection = {field: 1 for field in TIMELINE_FIELDS + ('release_date',)}
+        updates = []
+        
+        try:
+            for doc in collection.find({}, projection):
+                updates.append(pymongo.UpdateOne({'_id': doc['_id']}, {'$set': {'timeline': classify_document(doc)}}))
+                if len(updates) >= batch_size:
+                    collection.bulk_write(updates, ordered=False)
+                    updates = []
+            if updates:
+                collection.bulk_write(updates, ordered=False)
+            
+            result = self.refresh_stats()
+            if result is not None:
+                self.logger.info(f"已重建统计，共 {result[0]['total_releases']} 条发布")
+            return result
+        except Exception as e:
+            self.logger.error(f"重建统计失败: {e}")
+            return None
+    
     def close(self):
         """关闭MongoDB连接"""
         if self.client is not None:
             self.client.close()
             self.logger.info("已关闭MongoDB连接")
     
-    def save_release(self, release: UnifiRelease) -> bool:
-        """保存或更新产品发布信息"""
+    def save_release(self, release: UnifiRelease) -> Union[str, bool]:
+        """保存或更新产品发布信息，返回SAVE_INSERTED/SAVE_CHANGED/SAVE_UNCHANGED，失败时返回False"""
         if self.db is None:
             self.logger.error("未连接到MongoDB，无法保存数据")
             return False
         
         release_dict = release.to_dict()
         release_id = release_dict.get('release_id')
+        release_dict['timeline'] = classify_document(release_dict)
+        collection = self.db[self.collection_name]
+        
+        # 创建时间只在首次插入时写入，重新验证时不覆盖（get_all_releases按它排序）
+        created_at = release_dict.pop('created_at', None)
         
         try:
-            # 检查是否已存在该版本
-            existing = self.db[self.collection_name].find_one({'release_id': release_id})
+            # 取回写入前的文档，供守护进程判断是否有内容变化需要重新生成时间轴
+            before = collection.find_one_and_update(
+                {'release_id': release_id},
+                {'$set': release_dict, '$setOnInsert': {'created_at': created_at}},
+                upsert=True,
+                return_document=ReturnDocument.BEFORE
+            )
             
-            if existing is not None:
-                # 如果已存在记录，则更新
-                result = self.db[self.collection_name].update_one(
-                    {'release_id': release_id},
-                    {'$set': release_dict}
-                )
-                self.logger.info(f"更新已存在项目: {release.product_name} {release.version}")
-                return result.modified_count > 0
+            if before is None:
+                self.logger.info(f"添加新项目: {release.product_name} {release.version}", extra={'aggregate': '添加新项目'})
             else:
-                # 如果不存在，则插入新记录
-                result = self.db[self.collection_name].insert_one(release_dict)
-                self.logger.info(f"添加新项目: {release.product_name} {release.version}")
-                return result.acknowledged
+                self.logger.info(f"更新已存在项目: {release.product_name} {release.version}", extra={'aggregate': '更新已存在项目'})
+            return save_outcome(before, release_dict)
             
         except Exception as e:
             self.logger.error(f"保存数据失败: {e}")
             return False
     
+    def update_release_stats(self, rows: List[Dict[str, Any]], history: bool = False) -> int:
+        """
+        批量更新已入库发布的浏览/评论统计
+        
+        Args:
+            rows: 统计行，包含release_id、views、comments
+            history: 是否同时写入热度时间序列集合
+        
+        Returns:
+            int: 匹配到的发布数量（未入库的发布不会被创建）
+        """
+        if self.db is None:
+            self.logger.error("未连接到MongoDB，无法更新统计")
+            return 0
+        if not rows:
+            return 0
+        
+        now = datetime.now()
+        operations = [
+            UpdateOne(
+                {'release_id': row['release_id']},
+                {'$set': {
+                    'views': row['views'],
+                    'comments': row['comments'],
+                    'stats_updated_at': now
+                }}
+            )
+            for row in rows
+        ]
+        
+        try:
+            result = self.db[self.collection_name].bulk_write(operations, ordered=False)
+            if history:
+                self._ensure_popularity_collection()
+                self.db[self.popularity_collection_name].insert_many([
+                    {
+                        'timestamp': now,
+                        'release_id': row['release_id'],
+                        'views': row['views'],
+                        'comments': row['comments']
+                    }
+                    for row in rows
+                ], ordered=False)
+            return result.matched_count
+        except Exception as e:
+            self.logger.error(f"更新统计失败: {e}")
+            return 0
+    
+    def _ensure_popularity_collection(self) -> None:
+        """创建热度时间序列集合，MongoDB 5.0以下退回普通集合加索引"""
+        if self.popularity_collection_name in self.db.list_collection_names():
+            return
+        
+        try:
+            self.db.create_collection(
+                self.popularity_collection_name,
+                timeseries={'timeField': 'timestamp', 'metaField': 'release_id', 'granularity': 'hours'}
+            )
+            self.logger.info(f"已创建时间序列集合: {self.popularity_collection_name}")
+        except Exception as e:
+            self.logger.warning(f"创建时间序列集合失败，使用普通集合: {e}")
+            self.db[self.popularity_collection_name].create_index([('release_id', pymongo.ASCENDING), ('timestamp', pymongo.ASCENDING)])
+    
+    def get_crawl_state(self) -> Dict[str, Tuple[Any, str]]:
+        """
+        获取调度所需的入库状态
+        
+        Returns:
+            Dict[str, Tuple[Any, str]]: {发布ID: (上次入库时间, 入库时的最后活动时间)}
+        """
+        if self.db is None:
+            return {}
+        
+        try:
+            cursor = self.db[self.collection_name].find(
+                {}, {'_id': 0, 'release_id': 1, 'last_updated': 1, 'last_activity_at': 1}
+            )
+            return {
+                doc['release_id']: (doc.get('last_updated'), doc.get('last_activity_at') or '')
+                for doc in cursor
+                if doc.get('release_id')
+            }
+        except Exception as e:
+            self.logger.warning(f"获取入库状态失败: {e}")
+            return {}
+    
+    def record_failure(self, release_id: str, error_class: str, message: str, item: Dict[str, Any]) -> bool:
+        """
+        把处理失败的发布记录到死信集合，重复失败时累加尝试次数
+        
+        Args:
+            release_id: 产品发布ID
+            error_class: 错误类型名称
+            message: 错误信息
+            item: 发布列表项，重试时无需重新获取列表
+        
+        Returns:
+            bool: 是否记录成功
+        """
+        if self.db is None:
+            self.logger.error("未连接到MongoDB，无法记录失败的发布")
+            return False
+        
+        now = datetime.now()
+        try:
+            self.db[self.failed_collection_name].update_one(
+                {'release_id': release_id},
+                {
+                    '$set': {
+                        'error_class': error_class,
+                        'error': message,
+                        'item': item,
+                        'last_failed_at': now
+                    },
+                    '$setOnInsert': {'first_failed_at': now},
+                    '$inc': {'attempts': 1}
+                },
+                upsert=True
+            )
+            return True
+        except Exception as e:
+            self.logger.error(f"记录失败的发布失败: {release_id}, 错误: {e}")
+            return False
+    
+    def resolve_failure(self, release_id: str) -> None:
+        """处理成功后从死信集合中移除"""
+        if self.db is None:
+            return
+        
+        try:
+            self.db[self.failed_collection_name].delete_one({'release_id': release_id})
+        except Exception as e:
+            self.logger.warning(f"移除失败记录失败: {release_id}, 错误: {e}")
+    
+    def get_failed_releases(self, limit: int = 0) -> list:
+        """
+        获取死信集合中的失败记录，最早失败的在前
+        
+        Args:
+            limit: 最大数量，0表示不限制
+        
+        Returns:
+            list: 失败记录（包含release_id、error_class、attempts、item等字段）
+        """
+        if self.db is None:
+            self.logger.error("未连接到MongoDB，无法获取失败的发布")
+            return []
+        
+        try:
+            return list(self.db[self.failed_collection_name]
+                        .find({}, {'_id': 0})
+                        .sort('first_failed_at', pymongo.ASCENDING)
+                        .limit(limit))
+        except Exception as e:
+            self.logger.error(f"获取失败的发布失败: {e}")
+            return []
+    
+    def get_failed_release_ids(self) -> set:
+        """获取死信集合中的全部发布ID"""
+        if self.db is None:
+            return set()
+        
+        try:
+            return set(self.db[self.failed_collection_name].distinct('release_id'))
+        except Exception as e:
+            self.logger.warning(f"获取失败的发布ID失败: {e}")
+            return set()
+    
     def get_release(self, release_id: str) -> Optional[UnifiRelease]:
         """根据ID获取产品发布信息"""
         if self.db is None:
@@ -117,10 +117,11 @@ def clean_crawl_data(checkpoint_file: str, cache_dir: Optional[str] = None) -> N
     """
     logger = logging.getLogger(__name__)
     
-    # 清除检查点文件
-    if os.path.exists(checkpoint_file):
-        os.remove(checkpoint_file)
-        logger.info("已清除检查点文件")
+    # 清除检查点文件及其列表文件（未完成的列表分页）
+    for path in (checkpoint_file, f"{checkpoint_file}.list"):
+        if os.path.exists(path):
+            os.remove(path)
+            logger.info(f"已清除检查点文件: {path}")
     
     # 清除缓存目录
     if cache_dir and os.path.exists(cache_dir):
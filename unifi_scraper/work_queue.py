@@ -0,0 +1,233 @@
+"""
+分布式爬取工作队列
+一个进程把待获取详情的发布写入MongoDB队列集合，任意数量的工作进程（可以在不同主机上）
+通过find_one_and_update领取带过期时间的租约，处理期间逐项续约，完成后确认；工作进程崩溃时租约过期，
+发布会被重新领取，多次过期的发布标记为失败并记录到死信集合。时间均取自MongoDB服务器，不受各主机时区和时钟偏差影响
+"""
+import os
+import socket
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Any, Iterable, List, Optional
+
+import pymongo
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+
+
+# 队列集合
+CRAWL_QUEUE_COLLECTION = 'crawl_queue'
+
+# 队列项状态
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def default_worker_id() -> str:
+    """默认的工作进程标识：主机名-进程号"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class MongoWorkQueue:
+    """基于MongoDB租约的发布详情工作队列"""
+
+    def __init__(self, db, collection_name: str = CRAWL_QUEUE_COLLECTION,
+                 lease_seconds: int = 300, max_attempts: int = 3, storage: Optional[Any] = None):
+        """
+        初始化工作队列
+
+        Args:
+            db: MongoDB数据库
+            collection_name: 队列集合名称
+            lease_seconds: 租约时长（秒），超时未确认的发布会被其它工作进程重新领取
+            max_attempts: 最大尝试次数，超过后标记为失败，不再领取
+            storage: 存储实例，租约多次过期的发布通过其record_failure记录到死信集合，供--retry-failed重试
+        """
+        self.collection = db[collection_name]
+        self.storage = storage
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.logger = logging.getLogger(__name__)
+
+    def ensure_indexes(self) -> None:
+        """创建领取租约所需的索引"""
+        # 领取时按状态过滤、按优先级和入队时间排序
+        self.collection.create_index([
+            ('status', pymongo.ASCENDING), ('priority', pymongo.ASCENDING), ('enqueued_at', pymongo.ASCENDING)
+        ])
+        self.collection.create_index([('status', pymongo.ASCENDING), ('lease_expires', pymongo.ASCENDING)])
+
+    def _now(self) -> datetime:
+        """MongoDB服务器的当前时间（UTC），各主机的工作进程使用同一个时钟"""
+        return self.collection.database.command('hello')['localTime']
+
+    def enqueue(self, items: Iterable[Dict[str, Any]], priority: int = 0) -> int:
+        """
+        把发布列表项加入队列，已在队列中的发布重新置为待处理（正被领取的除外）
+
+        Args:
+            items: 发布列表项
+            priority: 优先级，数值越小越先被领取
+
+        Returns:
+            int: 加入或重新置为待处理的数量
+        """
+        now = self._now()
+        operations = [
+            UpdateOne(
+                {'_id': item.get('id'), 'status': {'$ne': LEASED}},
+                {
+                    '$set': {
+                        'item': item,
+                        'status': PENDING,
+                        'priority': priority,
+                        'attempts': 0,
+                        'enqueued_at': now
+                    },
+                    '$unset': {'error': ''}
+                },
+                upsert=True
+            )
+            for item in items
+            if item.get('id')
+        ]
+        if not operations:
+            return 0
+
+        try:
+            result = self.collection.bulk_write(operations, ordered=False)
+            return result.upserted_count + result.modified_count
+        except BulkWriteError as e:
+            # 正被领取的发布不匹配过滤条件，upsert会因_id重复失败，忽略即可
+            details = e.details
+            others = [error for error in details.get('writeErrors', []) if error.get('code') != 11000]
+            if others:
+                raise
+            return details.get('nUpserted', 0) + details.get('nModified', 0)
+
+    def claim(self, worker_id: str, batch_size: int = 10) -> List[Dict[str, Any]]:
+        """
+        领取一批待处理（或租约已过期）的发布
+
+        Args:
+            worker_id: 工作进程标识
+            batch_size: 最多领取的数量
+
+        Returns:
+            List[Dict[str, Any]]: 领取到的队列项，包含_id、item、attempts等字段
+        """
+        now = self._now()
+        self._fail_exhausted(now)
+        claimed = []
+        for _ in range(batch_size):
+            doc = self.collection.find_one_and_update(
+                {
+                    '$or': [
+                        {'status': PENDING},
+                        {'status': LEASED, 'lease_expires': {'$lt': now}, 'attempts': {'$lt': self.max_attempts}}
+                    ]
+                },
+                {
+                    '$set': {
+                        'status': LEASED,
+                        'lease_owner': worker_id,
+                        'lease_expires': now + timedelta(seconds=self.lease_seconds)
+                    },
+                    '$inc': {'attempts': 1}
+                },
+                sort=[('priority', pymongo.ASCENDING), ('enqueued_at', pymongo.ASCENDING)],
+                return_document=ReturnDocument.AFTER
+            )
+            if doc is None:
+                break
+            claimed.append(doc)
+        return claimed
+
+    def _fail_exhausted(self, now: datetime) -> None:
+        """
+        租约已过期且尝试次数用尽的发布（工作进程多次崩溃或卡住）标记为失败，不再领取，并记录到死信集合
+
+        逐项按原条件更新，多个工作进程同时检查时每个发布只由更新成功的一方记录一次
+        """
+        exhausted = {'status': LEASED, 'lease_expires': {'$lt': now}, 'attempts': {'$gte': self.max_attempts}}
+        error = f"租约过期 {self.max_attempts} 次，处理未完成"
+        failed = 0
+        for doc in self.collection.find(exhausted, {'item': 1}):
+            result = self.collection.update_one(
+                {'_id': doc['_id'], **exhausted},
+                {
+                    '$set': {'status': FAILED, 'error': error},
+                    '$unset': {'lease_owner': '', 'lease_expires': ''}
+                }
+            )
+            if not result.modified_count:
+                continue
+            failed += 1
+            if self.storage is not None:
+                self.storage.record_failure(doc['_id'], 'LeaseExpired', error, doc.get('item') or {})
+        if failed:
+            self.logger.warning(f"{failed} 个发布的租约多次过期，已标记为失败")
+
+    def renew(self, worker_id: str) -> int:
+        """
+        续约工作进程持有的全部租约，处理一批发布期间逐项调用，避免批次耗时超过租约被其它进程重复领取
+
+        Args:
+            worker_id: 工作进程标识
+
+        Returns:
+            int: 续约的队列项数量
+        """
+        result = self.collection.update_many(
+            {'status': LEASED, 'lease_owner': worker_id},
+            {'$set': {'lease_expires': self._now() + timedelta(seconds=self.lease_seconds)}}
+        )
+        return result.modified_count
+
+    def ack(self, release_id: str, worker_id: str) -> bool:
+        """
+        确认发布处理完成
+
+        Args:
+            release_id: 产品发布ID
+            worker_id: 工作进程标识，租约已被其它进程接管时确认无效
+
+        Returns:
+            bool: 是否确认成功
+        """
+        result = self.collection.update_one(
+            {'_id': release_id, 'status': LEASED, 'lease_owner': worker_id},
+            {
+                '$set': {'status': DONE, 'completed_at': self._now()},
+                '$unset': {'lease_owner': '', 'lease_expires': ''}
+            }
+        )
+        return result.modified_count > 0
+
+    def fail(self, release_id: str, worker_id: str, error: str, attempts: int) -> None:
+        """
+        释放处理失败的发布，未超过最大尝试次数时重新置为待处理
+
+        Args:
+            release_id: 产品发布ID
+            worker_id: 工作进程标识
+            error: 错误信息
+            attempts: 已尝试次数
+        """
+        status = FAILED if attempts >= self.max_attempts else PENDING
+        self.collection.update_one(
+            {'_id': release_id, 'status': LEASED, 'lease_owner': worker_id},
+            {
+                '$set': {'status': status, 'error': error},
+                '$unset': {'lease_owner': '', 'lease_expires': ''}
+            }
+        )
+
+    def counts(self) -> Dict[str, int]:
+        """各状态的队列项数量"""
+        counts = {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        for row in self.collection.aggregate([{'$group': {'_id': '$status', 'count': {'$sum': 1}}}]):
+            counts[row['_id']] = row['count']
+        return counts